@@ -0,0 +1,197 @@
+"""
+Benchmark harness for sql_to_odata export throughput and memory use.
+
+Generates synthetic SQLite databases of configurable size and shape, times the main export functions
+against them, and reports rows per second, megabytes per second and peak resident memory as JSON, so
+that results can be compared between releases. Each measurement runs in a freshly spawned process so
+that its peak memory is not inflated by earlier measurements.
+
+Example:
+
+    python benchmarks/benchmark.py --rows 1000 100000 --shapes narrow wide --output results.json
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+
+import sql_to_odata
+from sql_to_odata.cli import add_tuning_arguments, get_tuning_options
+
+
+_text_expression = "printf('%d lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor', x)"
+
+# Each shape is a list of (column definition, expression of the row number x that fills it)
+_shapes = {
+    'narrow': [
+        ('Value INTEGER', '(x * 2654435761) % 1000003'),
+        ('Label TEXT', "printf('label-%08d', (x * 7919) % 100000000)"),
+    ],
+    'wide': [
+        (f'Column{i} {t}', e) for i, (t, e) in enumerate([
+            ('INTEGER', '(x * 2654435761) % 1000003'),
+            ('REAL', '((x * 40503) % 100000) / 100.0'),
+            ('TEXT', "printf('value-%d', x % 1000)"),
+        ] * 10)
+    ],
+    'text': [(f'Text{i} TEXT', _text_expression) for i in range(4)],
+    'blob': [('Data BLOB', "CAST(printf('%0256d', x) AS BLOB)")],
+    'numeric': [
+        ('Price NUMERIC(10,2)', 'round(((x * 40503) % 1000000) * 0.01, 2)'),
+        ('Ratio REAL', '((x * 2654435761) % 1000003) / 1000003.0'),
+        ('Quantity INTEGER', 'x % 100'),
+        ('Created DATETIME', "datetime(1262304000 + x * 37, 'unixepoch')"),
+    ],
+}
+
+_operations = ['get_table_rows', 'get_table_json', 'get_database_schema_xml', 'dump_database']
+
+
+def create_database(sqlite_filename, shape, row_count):
+    """
+    Create a synthetic database holding a single table named after its shape.
+
+    Values are derived from the row number rather than random, so that the same arguments always produce
+    the same database, and rows are generated inside SQLite so that very large tables are quick to build.
+
+    :param sqlite_filename: Location of the database to be created
+    :param shape: Name of the shape of the table: narrow, wide, text, blob or numeric
+    :param row_count: Number of rows in the table
+    """
+    columns = _shapes[shape]
+    column_definitions = ', '.join(['Id INTEGER PRIMARY KEY'] + [c[0] for c in columns])
+    column_expressions = ', '.join(['x'] + [c[1] for c in columns])
+    connection = sqlite3.connect(sqlite_filename)
+    connection.execute(f'CREATE TABLE {shape} ({column_definitions})')
+    connection.execute(f'''WITH RECURSIVE seq(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM seq WHERE x < ?)
+                           INSERT INTO {shape} SELECT {column_expressions} FROM seq''', [row_count])
+    connection.commit()
+    connection.close()
+
+
+def _get_peak_rss():
+    """Peak resident memory of the current process in bytes."""
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes while macOS reports bytes
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+
+def _run_operation(sqlite_filename, shape, operation, options):
+    """
+    Time a single operation; runs in its own process.
+
+    :return: Tuple of (seconds, output size in bytes, peak resident memory in bytes)
+    """
+    odata_interface = sql_to_odata.ODataInterface(sqlite_filename=sqlite_filename, **options['interface_options'])
+    with tempfile.TemporaryDirectory() as output_folder:
+        start_time = time.perf_counter()
+        if operation == 'get_table_rows':
+            odata_interface.get_table_rows(shape)
+            # There is no serialized output, so throughput is measured against the size of the database
+            output_size = os.path.getsize(sqlite_filename)
+        elif operation == 'get_table_json':
+            output_size = len(odata_interface.get_table_json(shape))
+        elif operation == 'get_database_schema_xml':
+            output_size = len(odata_interface.get_database_schema_xml())
+        else:
+            odata_interface.dump_database(output_folder, batch_size=options['batch_size'],
+                                          workers=options['workers'])
+            output_size = sum(os.path.getsize(os.path.join(output_folder, f)) for f in os.listdir(output_folder))
+        seconds = time.perf_counter() - start_time
+    return seconds, output_size, _get_peak_rss()
+
+
+def _get_baseline_rss(sqlite_filename, options):
+    """Peak resident memory of a process that only opens the database, to compare the measurements against."""
+    sql_to_odata.ODataInterface(sqlite_filename=sqlite_filename, **options['interface_options']).get_table_names()
+    return _get_peak_rss()
+
+
+def run_benchmarks(row_counts, shapes, operations, work_folder, options):
+    """
+    Run every combination of row count, shape and operation.
+
+    :param row_counts: List of table sizes in rows
+    :param shapes: List of table shapes
+    :param operations: List of operations to be timed
+    :param work_folder: Location for the generated databases
+    :param options: Dictionary of repeat, batch_size and workers options, and interface_options passed on
+                    to ODataInterface (e.g. {"mmap_size": 268435456})
+    :return: List of result dictionaries
+    """
+    results = []
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        for row_count in row_counts:
+            for shape in shapes:
+                sqlite_filename = os.path.join(work_folder, f'{shape}-{row_count}.db')
+                if not os.path.exists(sqlite_filename):
+                    create_database(sqlite_filename, shape, row_count)
+                baseline_rss = pool.apply(_get_baseline_rss, (sqlite_filename, options))
+                for operation in operations:
+                    result = {'shape': shape, 'rows': row_count, 'operation': operation,
+                              'database_bytes': os.path.getsize(sqlite_filename), 'baseline_rss_bytes': baseline_rss}
+                    try:
+                        runs = [pool.apply(_run_operation, (sqlite_filename, shape, operation, options))
+                                for _ in range(options['repeat'])]
+                    except Exception as error:
+                        result['error'] = f'{type(error).__name__}: {error}'
+                    else:
+                        seconds = min(r[0] for r in runs)
+                        result['seconds'] = seconds
+                        result['output_bytes'] = runs[0][1]
+                        result['rows_per_second'] = row_count / seconds if seconds else None
+                        result['megabytes_per_second'] = runs[0][1] / 1e6 / seconds if seconds else None
+                        result['peak_rss_bytes'] = max(r[2] for r in runs)
+                    results.append(result)
+    return results
+
+
+def main(args=None):
+    """Run the benchmarks from the command line and emit the results as JSON."""
+    parser = argparse.ArgumentParser(description='Benchmark sql_to_odata export throughput and memory use.')
+    parser.add_argument('--rows', type=lambda v: int(float(v)), nargs='+', default=[1000, 10000, 100000],
+                        help='table sizes in rows, e.g. 1e6 (default: %(default)s)')
+    parser.add_argument('--shapes', nargs='+', choices=sorted(_shapes), default=sorted(_shapes),
+                        help='table shapes (default: all)')
+    parser.add_argument('--operations', nargs='+', choices=_operations, default=_operations,
+                        help='operations to be timed (default: all)')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per measurement, fastest is kept')
+    parser.add_argument('--batch-size', type=int, help='batch size passed to dump_database')
+    parser.add_argument('--workers', type=int, help='workers passed to dump_database')
+    add_tuning_arguments(parser)
+    parser.add_argument('--work-folder', help='location to keep generated databases for reuse (default: temporary)')
+    parser.add_argument('--output', help='file to write the JSON results to (default: standard output)')
+    parsed_args = parser.parse_args(args)
+    options = {'repeat': parsed_args.repeat, 'batch_size': parsed_args.batch_size, 'workers': parsed_args.workers,
+               'interface_options': get_tuning_options(parsed_args)}
+    with tempfile.TemporaryDirectory() as temp_folder:
+        work_folder = parsed_args.work_folder or temp_folder
+        os.makedirs(work_folder, exist_ok=True)
+        results = run_benchmarks(parsed_args.rows, parsed_args.shapes, parsed_args.operations, work_folder, options)
+    report = {
+        'version': sql_to_odata.__version__,
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'options': options,
+        'results': results,
+    }
+    report_json = json.dumps(report, indent=4)
+    if parsed_args.output:
+        with open(parsed_args.output, 'w') as output_file:
+            output_file.write(report_json)
+    else:
+        print(report_json)
+
+
+if __name__ == '__main__':
+    main()
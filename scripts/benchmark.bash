@@ -0,0 +1,4 @@
+#!/usr/bin/env bash
+set -e
+
+python benchmarks/benchmark.py "$@"
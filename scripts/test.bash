@@ -5,6 +5,7 @@ pytest -vv --cov=sql_to_odata --cov-report=term --cov-report=xml
 
 flake8 --max-line-length=120 --statistics sql_to_odata
 flake8 --max-line-length=120 --statistics tests
+flake8 --max-line-length=120 --statistics benchmarks
 
 bandit -r sql_to_odata
 bandit -s B101 -r tests
@@ -1,9 +1,24 @@
+import base64
+import contextlib
+import datetime
+import functools
+import gzip
+import html
 import logging
 import os
-import sqlite3
+import tempfile
+import time
+import uuid
 
 import ujson
 
+from sql_to_odata.backends import ConnectionPool, SQLiteBackend, create_backend
+from sql_to_odata.converters import get_converters, get_default_value
+from sql_to_odata.delta import DeltaState
+from sql_to_odata.metrics import MetricsBuffer, MetricsSink, Profile, replay
+from sql_to_odata.query import (compile_apply, compile_count, compile_expand, compile_filter,
+                                compile_non_negative_integer, compile_orderby, compile_select, quote_identifier)
+
 
 __version__ = '0.0.0'
 
@@ -11,6 +26,109 @@ __version__ = '0.0.0'
 _log = logging.getLogger(__name__)
 _log.addHandler(logging.NullHandler())
 
+_default_batch_size = 1000
+
+_default_pool_size = 4
+
+_default_pool_timeout = 30
+
+# Constructor arguments that configure the interface itself rather than the backend
+_interface_options = ('pool_size', 'pool_timeout', 'arraysize', 'metrics_sink', 'profile_folder', 'strict_types',
+                      'navigation_properties')
+
+_null_metrics_sink = MetricsSink()
+
+_table_names_cache_labels = {'cache': 'table_names'}
+
+_table_schemas_cache_labels = {'cache': 'table_schemas'}
+
+_navigation_properties_cache_labels = {'cache': 'navigation_properties'}
+
+_manifest_filename = '.manifest.json'
+
+_delta_state_filename = '.delta.db'
+
+# Temporary copies of the database taken by snapshot dumps are named with this prefix
+_snapshot_filename_prefix = 'sql-to-odata-snapshot-'
+
+# Number of snapshots of each table that delta tokens can refer to, older tokens become invalid
+_delta_snapshots_to_keep = 5
+
+_compression_extensions = {'gzip': '.gz', 'zstd': '.zst'}
+
+_columnar_extensions = {'arrow': '.arrow', 'parquet': '.parquet'}
+
+# Record batches are gathered into row groups of this size, since small row groups make Parquet files
+# larger and slower to scan
+_parquet_row_group_size = 65536
+
+# Arrow type names by OData type, where the decimals of SQLite are floating point numbers
+_arrow_types = {
+    'Edm.Boolean': ('bool_',),
+    'Edm.Byte': ('uint8',),
+    'Edm.SByte': ('int8',),
+    'Edm.Int16': ('int16',),
+    'Edm.Int32': ('int32',),
+    'Edm.Int64': ('int64',),
+    'Edm.Single': ('float32',),
+    'Edm.Double': ('float64',),
+    'Edm.Decimal': ('float64',),
+    'Edm.String': ('string',),
+    'Edm.Guid': ('string',),
+    'Edm.Binary': ('binary',),
+    'Edm.Date': ('date32',),
+    'Edm.TimeOfDay': ('time64', 'us'),
+    'Edm.DateTimeOffset': ('timestamp', 'us', 'UTC'),
+}
+
+
+def _instrumented(method):
+    """Time every call of a public method through the instance's metrics sink, and profile it in profile mode."""
+    name = method.__name__
+    labels = {'method': name}
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        profile = Profile(self._profile_folder, name)
+        with self._metrics_sink.span('call', labels), profile:
+            result = method(self, *args, **kwargs)
+        profile.save()
+        return result
+    return wrapper
+
+
+def _instrumented_generator(method):
+    """
+    Time every call of a public method that returns a generator through the instance's metrics sink, covering
+    the generation of all of its chunks, and profile it in profile mode.
+    """
+    name = method.__name__
+    labels = {'method': name}
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        profile = Profile(self._profile_folder, name)
+        # Arguments are still checked on the call rather than on the first chunk
+        with profile:
+            chunks = method(self, *args, **kwargs)
+        return _iter_instrumented(chunks, self._metrics_sink, labels, profile)
+    return wrapper
+
+
+def _iter_instrumented(chunks, metrics_sink, labels, profile):
+    """Pass on the chunks of a generator within a call span, profiling only while the generator runs."""
+    try:
+        with metrics_sink.span('call', labels):
+            while True:
+                with profile:
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                yield chunk
+        profile.save()
+    finally:
+        chunks.close()
+
 
 class ODataInterface():
     """OData interface to a SQL database."""
@@ -23,46 +141,229 @@ class ODataInterface():
         :param type_name: SQLite datatype
         :return: OData type name
         """
-        if type_name == 'INTEGER':
-            return 'Edm.Int64'
-        elif type_name == 'REAL':
-            return 'Edm.Double'
-        elif type_name.startswith('NUMERIC'):
-            return 'Edm.Decimal'
-        elif type_name == 'TEXT':
-            return 'Edm.String'
-        elif type_name.startswith('NVARCHAR'):
-            return 'Edm.String'
-        elif type_name == 'BLOB':
-            return 'Edm.Binary'
-        elif type_name == 'DATETIME':
-            return 'Edm.DateTimeOffset'
+        return SQLiteBackend.datatype_to_odata(type_name)
+
+    def clear_schema_cache(self):
+        """Discard all cached table names and schemas so they are fetched again on next use."""
+        _log.debug('Clearing schema cache')
+        self._schema_version = None
+        self._table_names = None
+        self._table_name_set = None
+        self._table_schemas = {}
+        self._table_field_names = {}
+        self._table_key_names = {}
+        self._table_row_key_names = {}
+        self._table_navigation_properties = None
+
+    def _check_schema_cache(self):
+        """Invalidate the schema cache if the database schema has changed since it was filled."""
+        schema_version = self._backend.get_schema_version(self._connection)
+        if schema_version != self._schema_version:
+            self.clear_schema_cache()
+            self._schema_version = schema_version
+
+    def _get_cached_table_names(self):
+        """Fetch the sorted tuple of table names, querying the database only when the cache is empty."""
+        self._check_schema_cache()
+        if self._table_names is None:
+            self._metrics_sink.add_count('cache_misses', 1, _table_names_cache_labels)
+            _log.debug('Fetching all table names')
+            self._table_names = tuple(sorted(self._backend.get_table_names(self._connection)))
+            self._table_name_set = frozenset(self._table_names)
         else:
-            raise ValueError(f'Unknown data type: {type_name}')
+            self._metrics_sink.add_count('cache_hits', 1, _table_names_cache_labels)
+        return self._table_names
+
+    def _get_cached_table_schema(self, table_name):
+        """Fetch the tuple of schema tuples for a table, querying the database only when not yet cached."""
+        self._get_cached_table_names()
+        schema = self._table_schemas.get(table_name)
+        if schema is not None:
+            self._metrics_sink.add_count('cache_hits', 1, _table_schemas_cache_labels)
+        else:
+            self._metrics_sink.add_count('cache_misses', 1, _table_schemas_cache_labels)
+            _log.debug('Fetching table schema from %s', table_name)
+            rows = self._backend.get_table_columns(self._connection, table_name)
+            schema = tuple((r[1], self._backend.datatype_to_odata(r[2]), r[3] == 1, r[4], r[5] == 1) for r in rows)
+            self._table_schemas[table_name] = schema
+            self._table_field_names[table_name] = tuple(f[0] for f in schema)
+            # Composite primary keys are ordered by their position in the key, not in the table
+            self._table_key_names[table_name] = tuple(r[1] for r in sorted(rows, key=lambda r: r[5]) if r[5] > 0)
+        return schema
+
+    def _get_cached_navigation_properties(self):
+        """
+        Derive the navigation properties of all tables from their foreign keys, querying the database only when
+        not yet cached. Each foreign key gives the referencing table a property leading to the referenced row,
+        named after the referenced table, and the referenced table a collection of the referencing rows, named
+        after the referencing table. Names that a table would have twice, or that clash with one of its columns,
+        have the columns of the foreign key appended (e.g. "employees_ReportsTo" and "employees_by_ReportsTo").
+
+        :return: Dictionary where the keys are table names and the values are dictionaries whose keys are
+                 navigation property names and whose values are tuples of navigation info:
+                 (target_table, is_collection, field_names, target_field_names, partner_name)
+        """
+        table_names = self._get_cached_table_names()
+        if self._table_navigation_properties is not None:
+            self._metrics_sink.add_count('cache_hits', 1, _navigation_properties_cache_labels)
+            return self._table_navigation_properties
+        self._metrics_sink.add_count('cache_misses', 1, _navigation_properties_cache_labels)
+        _log.debug('Fetching all foreign keys')
+        candidates = {t: [] for t in table_names}
+        for table_name in table_names:
+            foreign_keys = {}
+            for row in self._backend.get_foreign_keys(self._connection, table_name):
+                foreign_keys.setdefault(row[0], []).append(row)
+            for rows in foreign_keys.values():
+                target_name = rows[0][2]
+                if target_name not in self._table_name_set:
+                    _log.debug('Skipping foreign key of %s to missing table %s', table_name, target_name)
+                    continue
+                self._get_cached_table_schema(target_name)
+                field_names = tuple(r[3] for r in rows)
+                target_field_names = tuple(r[4] for r in rows)
+                if None in target_field_names:
+                    target_field_names = self._table_key_names[target_name]
+                if len(target_field_names) != len(field_names):
+                    _log.debug('Skipping foreign key of %s to %s without a matching key', table_name, target_name)
+                    continue
+                suffix = '_'.join(field_names)
+                reference = {'names': (target_name, f'{target_name}_{suffix}'), 'target': target_name,
+                             'collection': False, 'fields': field_names, 'target_fields': target_field_names}
+                collection = {'names': (table_name, f'{table_name}_by_{suffix}'), 'target': table_name,
+                              'collection': True, 'fields': target_field_names, 'target_fields': field_names}
+                reference['partner'], collection['partner'] = collection, reference
+                candidates[table_name].append(reference)
+                candidates[target_name].append(collection)
+        for table_name, table_candidates in candidates.items():
+            column_names = {f[0] for f in self._get_cached_table_schema(table_name)}
+            short_names = [c['names'][0] for c in table_candidates]
+            for candidate in table_candidates:
+                short_name = candidate['names'][0]
+                unique = short_names.count(short_name) == 1 and short_name not in column_names
+                candidate['name'] = short_name if unique else candidate['names'][1]
+        self._table_navigation_properties = {t: {} for t in table_names}
+        for table_name, table_candidates in candidates.items():
+            for candidate in table_candidates:
+                # The rare names that are still taken twice, by two foreign keys on the same columns, keep the first
+                self._table_navigation_properties[table_name].setdefault(candidate['name'], (
+                    candidate['target'], candidate['collection'], candidate['fields'], candidate['target_fields'],
+                    candidate['partner']['name']))
+        return self._table_navigation_properties
+
+    def _validate_table_name(self, table_name):
+        """
+        Ensure a table exists, which also makes the name safe to interpolate into a query.
 
+        :param table_name: Name of the table to be validated
+        :return: Tuple of the table's field names
+        """
+        self._get_cached_table_names()
+        if table_name not in self._table_name_set:
+            raise ValueError(f'Table not found: {table_name}')
+        self._get_cached_table_schema(table_name)
+        return self._table_field_names[table_name]
+
+    def _check_table_read(self, table_name, page_size=None, after_key=None):
+        """
+        Ensure the arguments of a read of a table's rows are valid, so that errors are raised before any output.
+
+        :return: Tuple of the table's field names
+        """
+        field_names = self._validate_table_name(table_name)
+        if page_size is not None and page_size < 1:
+            raise ValueError(f'Invalid page size: {page_size}')
+        if after_key is not None and len(after_key) != len(self._get_row_key(table_name)):
+            raise ValueError(f'Invalid key for table {table_name}: {after_key}')
+        return field_names
+
+    @_instrumented
     def get_table_names(self):
         """
-        Fetch the names of all tables in the database.
+        Fetch the names of all tables in the database. Results are cached until the schema changes.
 
         :return: List of table names in sorted order
         """
-        _log.debug('Fetching all table names')
-        query = '''SELECT name FROM sqlite_schema WHERE type ='table' AND name NOT LIKE 'sqlite_%';'''
-        rows = self._connection.execute(query)
-        return sorted(r[0] for r in rows)
+        return list(self._get_cached_table_names())
 
+    @_instrumented
     def get_table_schema(self, table_name):
         """
-        Fetch a single table's schema.
+        Fetch a single table's schema. Results are cached until the schema changes.
 
         :param table_name: Name of the table whose schema should be fetched
-        :return: List of tuples of schema info: (name, odata_type, is_nullable, default_value, is_primary_key)
+        :return: List of tuples of schema info: (name, odata_type, is_not_null, default_value, is_primary_key)
+        """
+        return list(self._get_cached_table_schema(table_name))
+
+    @_instrumented
+    def get_table_key(self, table_name):
+        """
+        Fetch the fields that uniquely identify and order the rows of a single table.
+
+        :param table_name: Name of the table whose key should be fetched
+        :return: List of primary key field names in key order, or the row identifier of the database
+                 (['rowid'] in SQLite) if the table has no primary key
+        """
+        self._validate_table_name(table_name)
+        return list(self._table_key_names[table_name] or (self._backend.row_id_name,))
+
+    def _get_row_key(self, table_name):
+        """
+        Fetch the fields that page through and tell apart the rows of a table that is known to exist: the row
+        identifier where the database has one, since no comparison matches a primary key value of NULL,
+        and otherwise the primary key.
+
+        :return: List of field names
+        """
+        key_names = self._table_row_key_names.get(table_name)
+        if key_names is None:
+            row_id_name = self._backend.get_row_id_name(self._connection, table_name)
+            key_names = (row_id_name,) if row_id_name else tuple(self.get_table_key(table_name))
+            self._table_row_key_names[table_name] = key_names
+        return list(key_names)
+
+    @_instrumented
+    def get_table_navigation_properties(self, table_name):
+        """
+        Fetch the navigation properties of a single table, derived from the foreign keys of the database:
+        one leading to the referenced row for each foreign key of the table, and one leading to the collection
+        of referencing rows for each foreign key of another table that refers to it.
+
+        :param table_name: Name of the table whose navigation properties should be fetched
+        :return: List of tuples of navigation info: (name, target_table, is_collection, field_names,
+                 target_field_names, partner_name), where rows are related if the values of their fields match
+        """
+        self._validate_table_name(table_name)
+        return [(n, *p) for n, p in self._get_cached_navigation_properties()[table_name].items()]
+
+    def _get_navigation_property_xml(self, table_name):
         """
-        _log.debug(f'Fetching table schema from {table_name}')
-        query = '''SELECT * FROM pragma_table_info(?);'''
-        rows = self._connection.execute(query, [table_name])
-        return [(r[1], ODataInterface.datatype_to_odata(r[2]), r[3] == 1, r[4], r[5] == 1) for r in rows]
+        Create the NavigationProperty elements of a table's OData metadata, if they are enabled.
 
+        :return: List of XML lines
+        """
+        if not self._navigation_properties:
+            return []
+        schema = self._get_cached_table_schema(table_name)
+        not_null_names = {f[0] for f in schema if f[2]} | set(self._table_key_names[table_name])
+        xml_lines = []
+        for name, navigation_property in self._get_cached_navigation_properties()[table_name].items():
+            target_name, is_collection, field_names, target_field_names, partner_name = navigation_property
+            if is_collection:
+                xml_lines.append(f'<NavigationProperty Name="{name}" Type="Collection(DCT.{target_name})" '
+                                 f'Partner="{partner_name}" />')
+                continue
+            facets = ' Nullable="false"' if all(n in not_null_names for n in field_names) else ''
+            xml_lines.append(f'<NavigationProperty Name="{name}" Type="DCT.{target_name}"{facets} '
+                             f'Partner="{partner_name}">')
+            for field_name, target_field_name in zip(field_names, target_field_names):
+                xml_lines.append(f'<ReferentialConstraint Property="{field_name}" '
+                                 f'ReferencedProperty="{target_field_name}" />')
+            xml_lines.append('</NavigationProperty>')
+        return xml_lines
+
+    @_instrumented
     def get_table_schema_xml(self, table_name):
         """
         Create an OData metadata fragment for the given table in XML format.
@@ -70,32 +371,54 @@ class ODataInterface():
         :param table_name: Name of the table whose schema should be fetched
         :return: OData metadata fragment as an XML string
         """
-        _log.debug(f'Creating table schema XML from {table_name}')
+        _log.debug('Creating table schema XML from %s', table_name)
         schema = self.get_table_schema(table_name)
         xml_lines = []
         xml_lines.append(f'<EntityType Name="{table_name}">')
+        if not self._strict_types:
+            for field in schema:
+                xml_lines.append(f'<Property Name="{field[0]}" Type="{field[1]}" />')
+            xml_lines.extend(self._get_navigation_property_xml(table_name))
+            xml_lines.append('</EntityType>')
+            return '\n'.join(xml_lines)
+        key_names = self._table_key_names[table_name]
+        if key_names:
+            xml_lines.append('<Key>')
+            for key_name in key_names:
+                xml_lines.append(f'<PropertyRef Name="{key_name}" />')
+            xml_lines.append('</Key>')
         for field in schema:
-            xml_lines.append(f'<Property Name="{field[0]}" Type="{field[1]}" />')
+            facets = ' Nullable="false"' if field[2] or field[0] in key_names else ''
+            default_value = get_default_value(field[3], field[1])
+            if default_value is not None:
+                facets += f' DefaultValue="{html.escape(default_value, quote=True)}"'
+            xml_lines.append(f'<Property Name="{field[0]}" Type="{field[1]}"{facets} />')
+        xml_lines.extend(self._get_navigation_property_xml(table_name))
         xml_lines.append('</EntityType>')
         return '\n'.join(xml_lines)
 
-    def get_database_service_json(self, tables_to_include=None, formatted=False):
+    @_instrumented
+    def get_database_service_json(self, tables_to_include=None, formatted=False, aggregations=None):
         """
         Create an OData service document for the database.
 
         :param tables_to_include: Optional list of tables to include in the document, defaults to all
         :param formatted: JSON output is formatted with indentation, defaults to false
+        :param aggregations: Optional dictionary of pre-aggregated entity sets to include after the tables,
+                             as for dump_database
         :return: OData service document in JSON format
         """
         _log.debug('Creating OData service document for database')
         table_names = self.get_table_names() if tables_to_include is None else tables_to_include
         service_json = {'@context': '$metadata'}
-        service_json['value'] = [{'name': t, 'kind': 'EntitySet', 'url': t} for t in table_names]
+        entity_set_names = [*table_names, *(aggregations or {})]
+        service_json['value'] = [{'name': n, 'kind': 'EntitySet', 'url': n} for n in entity_set_names]
         if formatted:
             return ujson.dumps(service_json, indent=4)
         else:
             return ujson.dumps(service_json, separators=(',', ':'))
 
+    @_instrumented
     def get_database_schema(self, tables_to_include=None):
         """
         Fetch the schemas for all tables in the database.
@@ -108,11 +431,25 @@ class ODataInterface():
         table_names = self.get_table_names() if tables_to_include is None else tables_to_include
         return {t: self.get_table_schema(t) for t in table_names}
 
-    def get_database_schema_xml(self, tables_to_include=None):
+    @_instrumented
+    def get_aggregation_schema(self, table_name, expression):
+        """
+        Derive the schema of the rows that an OData $apply expression turns the rows of a single table into.
+
+        :param table_name: Name of the aggregated table
+        :param expression: Value of the $apply system query option, e.g. "groupby((Country),aggregate($count as Count))"
+        :return: List of (name, odata_type) tuples of the fields of the aggregated rows
+        """
+        return list(self._compile_table_query(table_name, {'$apply': expression})[5].items())
+
+    @_instrumented
+    def get_database_schema_xml(self, tables_to_include=None, aggregations=None):
         """
         Create an OData metadata file for the database in XML format.
 
         :param tables_to_include: Optional list of tables to include in schema, defaults to all
+        :param aggregations: Optional dictionary of pre-aggregated entity sets to describe after the tables,
+                             as for dump_database
         :return: OData metadata as an XML string
         """
         _log.debug('Creating OData metadata XML for database')
@@ -124,11 +461,313 @@ class ODataInterface():
         xml_lines.append('<Schema Namespace="DCT" xmlns="http://docs.oasis-open.org/odata/ns/edm">')
         for table_name in table_names:
             xml_lines.append(self.get_table_schema_xml(table_name))
+        for aggregation_name, (table_name, expression) in (aggregations or {}).items():
+            xml_lines.append(f'<EntityType Name="{aggregation_name}">')
+            for field_name, odata_type in self.get_aggregation_schema(table_name, expression):
+                xml_lines.append(f'<Property Name="{field_name}" Type="{odata_type}" />')
+            xml_lines.append('</EntityType>')
         xml_lines.append('</Schema>')
         xml_lines.append('</edmx:DataServices>')
         xml_lines.append('</edmx:Edmx>')
         return '\n'.join(xml_lines)
 
+    def _iter_table_row_batches(self, table_name, batch_size=None, page_size=None, after_key=None, page_state=None,
+                                media_threshold=None, write_media=None, convert=False):
+        """
+        Fetch the rows of a single table in batches from the database cursor.
+
+        When paging, rows are read in the order of their row identifier, or of the primary key in tables that
+        have none, starting after the given key, so that fetching a page is an index seek that costs the same
+        no matter how deep into the table it is.
+
+        :param table_name: Name of the table to be fetched
+        :param batch_size: Number of rows fetched per batch, defaults to 1000
+        :param page_size: Optional maximum number of rows to fetch, defaults to all rows
+        :param after_key: Optional list of key values that fetched rows must come after
+        :param page_state: Dictionary that receives the 'next_key' of the following page, if there is one
+        :param media_threshold: Optional size in bytes above which binary values are left out of the fetched
+                                rows and passed to write_media instead, defaults to fetching all values
+        :param write_media: Function that writes a binary value above the media threshold to a media resource,
+                            given the column name, the row's key values and the value, and returns its URL
+        :param convert: Convert the values to the form of their OData type in strict types mode, defaults to false
+        :return: Generator of lists of rows each of which is a dictionary of field name / value pairs
+        """
+        # Prevents SQL injection by validating parameter against list of table names
+        field_names = self._check_table_read(table_name, page_size, after_key)
+        batch_size = batch_size or self._arraysize
+        binary_names = []
+        if media_threshold is not None:
+            binary_names = [f[0] for f in self._get_cached_table_schema(table_name) if f[1] == 'Edm.Binary']
+        if page_size is None and after_key is None and not binary_names:
+            query = f'''SELECT * FROM {quote_identifier(table_name)}'''  # nosec - safe because of the prior check
+            yield from self._iter_query_row_batches(table_name, query, [], field_names, batch_size, convert)
+            return
+        if binary_names:
+            yield from self._iter_table_media_row_batches(table_name, field_names, binary_names, batch_size,
+                                                          page_size, after_key, page_state, media_threshold,
+                                                          write_media, convert)
+            return
+        key_names = self._get_row_key(table_name)
+        key_length = len(key_names)
+        key_columns = ', '.join(quote_identifier(k) for k in key_names)
+        if after_key is None:
+            condition = ''
+            parameters = []
+        else:
+            condition = f'WHERE ({key_columns}) > ({", ".join("?" * key_length)})'
+            parameters = list(after_key)
+        limit = ''
+        if page_size is not None:
+            # One row beyond the page reveals whether another page follows
+            limit = ' LIMIT ?'
+            parameters.append(page_size + 1)
+        query = f'''SELECT {key_columns}, * FROM {quote_identifier(table_name)} {condition}
+                    ORDER BY {key_columns}{limit}'''  # nosec - safe because of the prior check
+        build_rows = self._get_timed_row_builder(table_name, field_names, key_length, convert)
+        remaining = page_size
+        last_row = None
+        batches = self._iter_query_batches(table_name, query, parameters, batch_size)
+        with contextlib.closing(batches):
+            for rows in batches:
+                if remaining is not None and len(rows) > remaining:
+                    rows = rows[:remaining]
+                    last_row = rows[-1] if rows else last_row
+                    page_state['next_key'] = list(last_row[:key_length])
+                    if rows:
+                        yield build_rows(rows)
+                    break
+                if remaining is not None:
+                    remaining -= len(rows)
+                last_row = rows[-1]
+                yield build_rows(rows)
+
+    def _iter_table_media_row_batches(self, table_name, field_names, binary_names, batch_size, page_size, after_key,
+                                      page_state, media_threshold, write_media, convert):
+        """
+        Fetch the rows of a single table as _iter_table_row_batches does, with the binary values above the media
+        threshold replaced by @odata.mediaReadLink annotations. Only the sizes of those values are queried
+        along with the rows, so that large values are read one at a time rather than a batch at a time.
+
+        :param binary_names: List of the names of the table's binary fields
+        :return: Generator of lists of rows each of which is a dictionary of field name / value pairs
+        """
+        key_names = self._get_row_key(table_name)
+        key_length = len(key_names)
+        key_columns = ', '.join(quote_identifier(k) for k in key_names)
+        length_function = self._backend.binary_length_function
+        length_columns = ', '.join(f'{length_function}({quote_identifier(n)})' for n in binary_names)
+        columns = ', '.join(f'CASE WHEN {length_function}({quote_identifier(n)}) > ? THEN NULL '
+                            f'ELSE {quote_identifier(n)} END' if n in binary_names else quote_identifier(n)
+                            for n in field_names)
+        parameters = [media_threshold] * len(binary_names)
+        condition = ''
+        if after_key is not None:
+            condition = f' WHERE ({key_columns}) > ({", ".join("?" * key_length)})'
+            parameters += list(after_key)
+        limit = ''
+        if page_size is not None:
+            # One row beyond the page reveals whether another page follows
+            limit = f' ORDER BY {key_columns} LIMIT ?'
+            parameters.append(page_size + 1)
+        elif after_key is not None:
+            limit = f' ORDER BY {key_columns}'
+        query = f'''SELECT {key_columns}, {length_columns}, {columns}
+                    FROM {quote_identifier(table_name)}{condition}{limit}'''  # nosec - safe because of the prior check
+        key_condition = f'({key_columns}) = ({", ".join("?" * key_length)})'
+        value_queries = {n: f'''SELECT {quote_identifier(n)} FROM {quote_identifier(table_name)}
+                                WHERE {key_condition}''' for n in binary_names}  # nosec - safe as above
+        prefix_length = key_length + len(binary_names)
+        build_rows = self._get_timed_row_builder(table_name, field_names, prefix_length, convert)
+
+        def build_media_rows(rows):
+            built_rows = build_rows(rows)
+            for i, row in enumerate(rows):
+                lengths = row[key_length:prefix_length]
+                large_names = {n for n, v in zip(binary_names, lengths) if v is not None and v > media_threshold}
+                if large_names:
+                    key = list(row[:key_length])
+                    # The annotation takes the place of the value, keeping the order of the fields
+                    built_rows[i] = {(f'{n}@odata.mediaReadLink' if n in large_names else n):
+                                     (write_value(n, key) if n in large_names else v) for n, v in built_rows[i].items()}
+            return built_rows
+
+        def write_value(field_name, key):
+            # Read over this instance's own connection, since the batches hold one taken from the pool
+            value_rows = self._backend.fetch_all(self._connection, value_queries[field_name], key)
+            return write_media(field_name, key, value_rows[0][0])
+        remaining = page_size
+        last_row = None
+        batches = self._iter_query_batches(table_name, query, parameters, batch_size)
+        with contextlib.closing(batches):
+            for rows in batches:
+                if remaining is not None and len(rows) > remaining:
+                    rows = rows[:remaining]
+                    last_row = rows[-1] if rows else last_row
+                    page_state['next_key'] = list(last_row[:key_length])
+                    if rows:
+                        yield build_media_rows(rows)
+                    break
+                if remaining is not None:
+                    remaining -= len(rows)
+                last_row = rows[-1]
+                yield build_media_rows(rows)
+
+    def _iter_query_batches(self, table_name, query, parameters, batch_size):
+        """
+        Fetch the rows of a query in batches over a connection of its own taken from the pool,
+        so that a partly consumed stream is not disturbed by other queries.
+
+        :param table_name: Name of the queried table, which labels the query timings and row counts
+        :return: Generator of lists of row tuples
+        """
+        labels = {'table': table_name}
+        with self._pool.connection() as connection:
+            start = time.perf_counter()
+            cursor = self._backend.open_cursor(connection, query, parameters, batch_size)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                self._metrics_sink.add_timing('query', time.perf_counter() - start, labels)
+                if not rows:
+                    break
+                self._metrics_sink.add_count('rows', len(rows), labels)
+                yield rows
+                start = time.perf_counter()
+
+    def _get_timed_row_builder(self, table_name, field_names, skip=0, convert=False, odata_types=None):
+        """
+        Compile a row builder as _get_row_builder does, which also times the conversion of each batch.
+
+        :param convert: Convert the values to the form of their OData type in strict types mode
+        :param odata_types: Optional dictionary of the OData types of fields that are not columns of the table,
+                            such as aggregated values, defaults to the types in the table schema
+        :return: Function that takes a list of row tuples and returns a list of dictionaries
+        """
+        converters = None
+        if convert and self._strict_types:
+            if odata_types is None:
+                odata_types = {f[0]: f[1] for f in self._get_cached_table_schema(table_name)}
+            converters = get_converters([odata_types[n] for n in field_names])
+        build_rows = _get_row_builder(tuple(field_names), skip, converters)
+        metrics_sink = self._metrics_sink
+        labels = {'table': table_name}
+
+        def build_timed_rows(rows):
+            start = time.perf_counter()
+            built_rows = build_rows(rows)
+            metrics_sink.add_timing('conversion', time.perf_counter() - start, labels)
+            return built_rows
+        return build_timed_rows
+
+    def _iter_query_row_batches(self, table_name, query, parameters, field_names, batch_size, convert=False,
+                                odata_types=None, expansions=None, hidden_names=()):
+        """
+        Fetch the rows of a query in batches over a connection of its own taken from the pool.
+
+        :param convert: Convert the values to the form of their OData type in strict types mode, defaults to false
+        :param odata_types: Optional dictionary of the OData types of the fields, defaults to the table schema's
+        :param expansions: Optional dictionary of expanded navigation properties, as returned by _compile_expand
+        :param hidden_names: Names of fields fetched only to match related rows, which are left out of the rows
+        :return: Generator of lists of rows each of which is a dictionary of field name / value pairs
+        """
+        build_rows = self._get_timed_row_builder(table_name, field_names, convert=convert, odata_types=odata_types)
+        for rows in self._iter_query_batches(table_name, query, parameters, batch_size):
+            if expansions:
+                yield self._expand_rows(field_names, rows, build_rows, expansions, hidden_names, convert)
+            else:
+                yield build_rows(rows)
+
+    def _compile_expand(self, table_name, query_options, required_names=()):
+        """
+        Split $expand off of OData system query options on a single table, adding the fields that related rows
+        are matched on to $select where it leaves them out.
+
+        :param required_names: Names of other fields that have to be fetched whatever $select holds
+        :return: Tuple of (other query options, dictionary where the keys are the expanded navigation property
+                 names and the values are (navigation info, nested query options) tuples, names of the fields
+                 added to $select)
+        """
+        field_names = self._validate_table_name(table_name)
+        query_options = dict(query_options)
+        expansions = {}
+        if '$expand' in query_options:
+            if '$apply' in query_options:
+                raise ValueError('Unsupported query option with $apply: $expand')
+            navigation_properties = self._get_cached_navigation_properties()[table_name]
+            expansions = {n: (navigation_properties[n], o)
+                          for n, o in compile_expand(query_options.pop('$expand'), navigation_properties).items()}
+        hidden_names = []
+        if '$select' in query_options:
+            selected_names = compile_select(query_options['$select'], field_names)
+            match_names = [*required_names, *(n for e in expansions.values() for n in e[0][2])]
+            hidden_names = [n for n in dict.fromkeys(match_names) if n not in selected_names]
+            if hidden_names:
+                query_options['$select'] = ','.join(selected_names + hidden_names)
+        return query_options, expansions, hidden_names
+
+    def _expand_rows(self, field_names, rows, build_rows, expansions, hidden_names, convert):
+        """
+        Build a batch of rows with the related rows of their expanded navigation properties. The related rows of
+        each navigation property are fetched for the whole batch at once, rather than with a query per row.
+
+        :param field_names: Names of the fields of the row tuples
+        :param rows: List of row tuples
+        :param build_rows: Function that turns the row tuples into dictionaries
+        :param expansions: Dictionary of expanded navigation properties, as returned by _compile_expand
+        :param hidden_names: Names of fields fetched only to match related rows, which are left out of the rows
+        :param convert: Convert the values to the form of their OData type in strict types mode
+        :return: List of rows each of which is a dictionary of field name / value pairs
+        """
+        built_rows = build_rows(rows)
+        for name, (navigation_property, options) in expansions.items():
+            target_name, is_collection, match_names, target_match_names, _ = navigation_property
+            positions = [field_names.index(n) for n in match_names]
+            # Keys are taken from the values as the database returns them, before any conversion
+            row_keys = [tuple(r[p] for p in positions) for r in rows]
+            keys = list(dict.fromkeys(k for k in row_keys if None not in k))
+            related_rows = self._get_related_rows(target_name, target_match_names, keys, options, convert)
+            for built_row, row_key in zip(built_rows, row_keys):
+                matching_rows = related_rows.get(row_key, [])
+                built_row[name] = matching_rows if is_collection else (matching_rows[0] if matching_rows else None)
+        for built_row in built_rows:
+            for hidden_name in hidden_names:
+                del built_row[hidden_name]
+        return built_rows
+
+    def _get_related_rows(self, table_name, key_names, keys, query_options, convert):
+        """
+        Fetch the rows of a table related to a batch of rows through a navigation property, with a single
+        query for the whole batch, along with their own expanded navigation properties.
+
+        :param key_names: Names of the fields that the rows are matched on
+        :param keys: List of the tuples of values to be matched
+        :param query_options: Dictionary of the system query options nested within the expansion
+        :return: Dictionary where the keys are tuples of values and the values are lists of the matching rows
+        """
+        related_rows = {}
+        if not keys:
+            return related_rows
+        query_options, expansions, hidden_names = self._compile_expand(table_name, query_options, key_names)
+        if '$orderby' not in query_options and self._table_key_names[table_name]:
+            # Collections are listed in key order unless the expansion orders them otherwise
+            query_options['$orderby'] = ','.join(self._table_key_names[table_name])
+        # Keys are matched in chunks that keep each query within the parameter limit of the database,
+        # which the parameters of the nested $filter count towards as well
+        first_parameters = self._compile_table_query(table_name, query_options, (key_names, keys[:1]))[1]
+        filter_parameter_count = len(first_parameters) - len(key_names)
+        parameter_limit = self._backend.get_parameter_limit(self._connection) - filter_parameter_count
+        keys_per_query = max(parameter_limit // len(key_names), 1)
+        for start in range(0, len(keys), keys_per_query):
+            query, parameters, field_names, _, _, _ = self._compile_table_query(
+                table_name, query_options, (key_names, keys[start:start + keys_per_query]))
+            rows = self._backend.fetch_all(self._connection, query, parameters)
+            build_rows = self._get_timed_row_builder(table_name, field_names, convert=convert)
+            positions = [field_names.index(n) for n in key_names]
+            built_rows = self._expand_rows(field_names, rows, build_rows, expansions, hidden_names, convert)
+            for row, built_row in zip(rows, built_rows):
+                related_rows.setdefault(tuple(row[p] for p in positions), []).append(built_row)
+        return related_rows
+
+    @_instrumented
     def get_table_rows(self, table_name):
         """
         Fetch all rows of a single table.
@@ -136,63 +775,1211 @@ class ODataInterface():
         :param table_name: Name of the table to be fetched
         :return: List of rows each of which is a dictionary of field name / value pairs
         """
-        _log.debug(f'Fetching all rows of table {table_name}')
-        table_names = self.get_table_names()
-        # Prevents SQL injection by validating parameter against list of table names
-        if table_name not in table_names:
-            raise ValueError(f'Table not found: {table_name}')
-        query = f'''SELECT * FROM {table_name}'''  # nosec - this is safe because of the prior check
-        rows = self._connection.execute(query)
-        schema = self.get_table_schema(table_name)
-        field_names = [f[0] for f in schema]
-        return [dict(zip(field_names, r)) for r in rows]
+        _log.debug('Fetching all rows of table %s', table_name)
+        return [r for b in self._iter_table_row_batches(table_name) for r in b]
+
+    def _iter_table_json(self, table_name, formatted, batch_size, page_size, after_key, next_link, page_state,
+                         delta_link=None, media_threshold=None, write_media=None):
+        """
+        Generate rows of a single table in OData-compatible JSON format, one chunk at a time.
+
+        :param next_link: Function that creates the URL of the following page from its starting key
+        :param delta_link: Optional @odata.deltaLink placed at the end of the last page
+        :param media_threshold: Optional size in bytes above which binary values are written by write_media
+        :param write_media: Function that writes a binary value to a media resource and returns its URL
+        :return: Generator of JSON fragments
+        """
+        # The rows are only fetched once the start of the document has been generated, so they're checked now
+        self._check_table_read(table_name, page_size, after_key)
+        batches = self._iter_table_row_batches(table_name, batch_size, page_size, after_key, page_state,
+                                               media_threshold, write_media, convert=True)
+
+        def trailing_annotations():
+            next_key = page_state.get('next_key')
+            if next_key is not None:
+                return {'@odata.nextLink': next_link(next_key)}
+            return {} if delta_link is None else {'@odata.deltaLink': delta_link}
+        return _iter_odata_json(f'$metadata#{table_name}', batches, formatted, {}, trailing_annotations,
+                                self._metrics_sink, {'table': table_name})
+
+    @_instrumented_generator
+    def iter_table_json(self, table_name, formatted=False, batch_size=None, page_size=None, skip_token=None):
+        """
+        Generate all rows of a single table in OData-compatible JSON format, one chunk at a time.
+        Rows are pulled from the database in batches so memory use stays flat regardless of table size.
+
+        :param table_name: Name of the table to be fetched
+        :param formatted: JSON output is formatted with indentation, defaults to false
+        :param batch_size: Number of rows fetched and serialized per chunk, defaults to 1000
+        :param page_size: Optional maximum number of rows in the document, which then ends with an
+                          @odata.nextLink to the following page if there is one; defaults to all rows
+        :param skip_token: Optional $skiptoken taken from a previous page's @odata.nextLink, defaults to the first page
+        :return: Generator of JSON fragments that concatenate to the output of get_table_json
+        """
+        _log.debug('Streaming rows of table %s in JSON format', table_name)
+        after_key = None if skip_token is None else _decode_skip_token(skip_token)
+
+        def next_link(next_key):
+            return f'{table_name}?$skiptoken={_encode_skip_token(next_key)}'
+        return self._iter_table_json(table_name, formatted, batch_size, page_size, after_key, next_link, {})
 
-    def get_table_json(self, table_name, formatted=False):
+    @_instrumented
+    def write_table_json(self, table_name, output_file, formatted=False, batch_size=None, page_size=None,
+                         skip_token=None):
+        """
+        Write all rows of a single table in OData-compatible JSON format to a file as they are fetched.
+
+        :param table_name: Name of the table to be fetched
+        :param output_file: Writable text file object that receives the JSON output
+        :param formatted: JSON output is formatted with indentation, defaults to false
+        :param batch_size: Number of rows fetched and serialized per chunk, defaults to 1000
+        :param page_size: Optional maximum number of rows in the document, defaults to all rows
+        :param skip_token: Optional $skiptoken taken from a previous page's @odata.nextLink, defaults to the first page
+        """
+        chunks = self.iter_table_json(table_name, formatted, batch_size, page_size, skip_token)
+        self._write_chunks(table_name, chunks, output_file)
+
+    @_instrumented
+    def get_table_json(self, table_name, formatted=False, page_size=None, skip_token=None):
         """
         Fetch all rows of a single table in OData-compatible JSON format.
 
         :param table_name: Name of the table to be fetched
         :param formatted: JSON output is formatted with indentation, defaults to false
+        :param page_size: Optional maximum number of rows in the document, which then ends with an
+                          @odata.nextLink to the following page if there is one; defaults to all rows
+        :param skip_token: Optional $skiptoken taken from a previous page's @odata.nextLink, defaults to the first page
         :return: JSON-formatted rows and an OData context header pointing to metadata
         """
-        _log.debug(f'Fetching all rows of table {table_name} in JSON format')
+        _log.debug('Fetching rows of table %s in JSON format', table_name)
+        return ''.join(self.iter_table_json(table_name, formatted, page_size=page_size, skip_token=skip_token))
+
+    def _iter_table_delta_row_batches(self, table_name, delta_state, delta_token, batch_size, snapshots_to_keep,
+                                      delta_result):
+        """
+        Fetch the rows of a single table that were added or changed since the snapshot that a delta token
+        refers to, followed by entries for the rows that were removed, while taking a new snapshot.
+        Without a token, all rows are fetched. If nothing changed, the token is kept instead.
+
+        :param delta_state: DeltaState holding the snapshots
+        :param delta_token: Optional token of the snapshot to compare with
+        :param snapshots_to_keep: Number of the table's most recent snapshots that are kept
+        :param delta_result: Dictionary that receives the 'token' of the table's current state
+        :return: Generator of lists of rows each of which is a dictionary of field name / value pairs
+        """
+        import hashlib
+        # Prevents SQL injection by validating parameter against list of table names
+        field_names = self._validate_table_name(table_name)
+        batch_size = batch_size or self._arraysize
+        previous_snapshot_id = None if delta_token is None else delta_state.get_snapshot_id(table_name, delta_token)
+        key_names = self.get_table_key(table_name)
+        # Rows are told apart by their row identifier where there is one, since primary keys may hold NULL values,
+        # followed by the primary key that removed rows are reported by
+        id_names = self._get_row_key(table_name)
+        if id_names != key_names:
+            id_names += key_names
+        id_length = len(id_names)
+        key_start = id_length - len(key_names)
+        id_columns = ', '.join(quote_identifier(k) for k in id_names)
+        query = f'''SELECT {id_columns}, * FROM {quote_identifier(table_name)}'''  # nosec - safe because of the check
+        build_rows = self._get_timed_row_builder(table_name, field_names, id_length, convert=True)
+        snapshot_id = delta_state.create_snapshot(table_name)
+        is_changed = previous_snapshot_id is None
+        try:
+            for rows in self._iter_query_batches(table_name, query, [], batch_size):
+                keys = [ujson.dumps(r[:id_length], default=_json_default) for r in rows]
+                hashes = [hashlib.blake2b(repr(r[id_length:]).encode(), digest_size=16).digest() for r in rows]
+                delta_state.add_rows(snapshot_id, keys, hashes)
+                if previous_snapshot_id is not None:
+                    previous_hashes = delta_state.get_hashes(previous_snapshot_id, keys)
+                    rows = [r for r, k, h in zip(rows, keys, hashes) if previous_hashes.get(k) != h]
+                if rows:
+                    is_changed = True
+                    yield build_rows(rows)
+            if previous_snapshot_id is not None:
+                for removed_keys in delta_state.iter_removed_keys(previous_snapshot_id, snapshot_id, batch_size):
+                    is_changed = True
+                    yield [{'@removed': {'reason': 'deleted'},
+                            '@id': _format_entity_id(table_name, key_names, ujson.loads(k)[key_start:])}
+                           for k in removed_keys]
+        except BaseException:
+            delta_state.delete_snapshot(snapshot_id)
+            raise
+        if is_changed:
+            delta_result['token'] = delta_state.complete_snapshot(snapshot_id, snapshots_to_keep)
+        else:
+            delta_state.delete_snapshot(snapshot_id)
+            delta_result['token'] = delta_token
+
+    def _iter_table_delta_json(self, table_name, delta_state, delta_token, formatted, batch_size, snapshots_to_keep,
+                               delta_link, delta_result):
+        """
+        Generate the rows of a single table that changed since a delta token in OData delta JSON format.
+
+        :param delta_link: Function that creates the @odata.deltaLink from the token of the table's current state
+        :param delta_result: Dictionary that receives the 'token' of the table's current state
+        :return: Generator of JSON fragments
+        """
+        batches = self._iter_table_delta_row_batches(table_name, delta_state, delta_token, batch_size,
+                                                     snapshots_to_keep, delta_result)
+        odata_context_url = f'$metadata#{table_name}' if delta_token is None else f'$metadata#{table_name}/$delta'
+
+        def trailing_annotations():
+            return {'@odata.deltaLink': delta_link(delta_result['token'])}
+        return _iter_odata_json(odata_context_url, batches, formatted, {}, trailing_annotations,
+                                self._metrics_sink, {'table': table_name})
+
+    @_instrumented_generator
+    def iter_table_delta_json(self, table_name, state_filename, delta_token=None, formatted=False, batch_size=None):
+        """
+        Generate the changes to a single table since an earlier request in OData delta JSON format,
+        one chunk at a time. Changes are found by comparing row hashes with a snapshot of the table's
+        keys and hashes, so the database itself needs no change tracking.
+
+        :param table_name: Name of the table to be fetched
+        :param state_filename: Location of a SQLite file that holds the snapshots, created if it doesn't exist
+        :param delta_token: Optional $deltatoken taken from an earlier response's @odata.deltaLink;
+                            defaults to fetching all rows, as the starting point for later deltas
+        :param formatted: JSON output is formatted with indentation, defaults to false
+        :param batch_size: Number of rows fetched and serialized per chunk, defaults to 1000
+        :return: Generator of JSON fragments, where added and changed rows are included whole, removed rows
+                 as @removed entries, and the document ends with an @odata.deltaLink for the next request
+        """
+        _log.debug('Streaming changes to table %s in JSON format', table_name)
+        delta_state = DeltaState(state_filename)
+
+        def delta_link(token):
+            return f'{table_name}?$deltatoken={token}'
+        try:
+            yield from self._iter_table_delta_json(table_name, delta_state, delta_token, formatted, batch_size,
+                                                   _delta_snapshots_to_keep, delta_link, {})
+        finally:
+            delta_state.close()
+
+    @_instrumented
+    def get_table_delta_json(self, table_name, state_filename, delta_token=None, formatted=False):
+        """
+        Fetch the changes to a single table since an earlier request in OData delta JSON format.
+
+        :param table_name: Name of the table to be fetched
+        :param state_filename: Location of a SQLite file that holds the snapshots, created if it doesn't exist
+        :param delta_token: Optional $deltatoken taken from an earlier response's @odata.deltaLink;
+                            defaults to fetching all rows, as the starting point for later deltas
+        :param formatted: JSON output is formatted with indentation, defaults to false
+        :return: JSON-formatted changes, ending with an @odata.deltaLink for the next request
+        """
+        return ''.join(self.iter_table_delta_json(table_name, state_filename, delta_token, formatted))
+
+    def _compile_table_query(self, table_name, query_options, keys=None):
+        """
+        Compile OData system query options into parameterized queries on a single table.
+
+        :param table_name: Name of the table to be queried
+        :param query_options: Dictionary of system query options, e.g. {'$filter': 'Total gt 10', '$top': 5}
+        :param keys: Optional tuple of (field names, list of value tuples) that limits the query to the rows whose
+                     fields hold one of the tuples of values, on top of any $filter
+        :return: Tuple of (query, parameters, selected field names, count query, count parameters, OData types),
+                 where the count query is None unless a count was requested, and the OData types are a dictionary
+                 of the types of the fields that the query options apply to
+        """
+        # Prevents SQL injection by validating parameter against list of table names
+        field_names = self._validate_table_name(table_name)
+        unsupported_options = sorted(set(query_options) - {'$apply', '$filter', '$select', '$orderby', '$top', '$skip',
+                                                           '$count'})
+        if unsupported_options:
+            raise ValueError(f'Unsupported query option: {unsupported_options[0]}')
+        source = quote_identifier(table_name)
+        source_parameters = []
+        odata_types = {f[0]: f[1] for f in self._get_cached_table_schema(table_name)}
+        if '$apply' in query_options:
+            # The other query options apply to the result of the transformations, as the extension defines
+            apply_query, source_parameters, odata_types = compile_apply(query_options['$apply'], source, odata_types,
+                                                                        self._backend.filter_functions)
+            source = f'({apply_query}) AS {quote_identifier("_apply")}'
+            field_names = tuple(odata_types)
+        selected_names = list(field_names)
+        if '$select' in query_options:
+            selected_names = compile_select(query_options['$select'], field_names)
+        conditions = []
+        condition_parameters = []
+        if '$filter' in query_options:
+            filter_sql, condition_parameters = compile_filter(query_options['$filter'], field_names,
+                                                              self._backend.filter_functions)
+            conditions.append(filter_sql)
+        if keys is not None:
+            key_names, key_values = keys
+            if len(key_names) == 1:
+                conditions.append(f'{quote_identifier(key_names[0])} IN ({", ".join("?" * len(key_values))})')
+            else:
+                key_columns = ', '.join(quote_identifier(n) for n in key_names)
+                key_row = f'({", ".join("?" * len(key_names))})'
+                conditions.append(f'({key_columns}) IN (VALUES {", ".join([key_row] * len(key_values))})')
+            condition_parameters = condition_parameters + [v for k in key_values for v in k]
+        condition = f' WHERE {" AND ".join(conditions)}' if conditions else ''
+        ordering = ''
+        if '$orderby' in query_options:
+            ordering = f' ORDER BY {compile_orderby(query_options["$orderby"], field_names)}'
+        limit = ''
+        limit_parameters = []
+        if '$top' in query_options or '$skip' in query_options:
+            top = self._backend.no_limit
+            if '$top' in query_options:
+                top = compile_non_negative_integer('$top', query_options['$top'])
+            skip = compile_non_negative_integer('$skip', query_options.get('$skip', 0))
+            limit = ' LIMIT ? OFFSET ?'
+            limit_parameters = [top, skip]
+        columns = ', '.join(quote_identifier(n) for n in selected_names)
+        query = f'''SELECT {columns} FROM {source}{condition}{ordering}{limit}'''  # nosec - validated
+        count_query = None
+        if compile_count(query_options.get('$count', False)):
+            count_query = f'''SELECT count(*) FROM {source}{condition}'''  # nosec - validated
+        return (query, source_parameters + condition_parameters + limit_parameters, selected_names, count_query,
+                source_parameters + condition_parameters, odata_types)
+
+    @_instrumented
+    def query_table_rows(self, table_name, query_options):
+        """
+        Fetch the rows of a single table that match OData system query options, with the filtering,
+        projection, ordering and limits all carried out by the database.
+
+        :param table_name: Name of the table to be queried
+        :param query_options: Dictionary of system query options: $apply, $filter, $select, $orderby, $top, $skip
+                              and $expand
+        :return: List of rows each of which is a dictionary of field name / value pairs
+        """
+        _log.debug('Querying rows of table %s', table_name)
+        query_options, expansions, hidden_names = self._compile_expand(table_name, query_options)
+        query, parameters, selected_names, _, _, _ = self._compile_table_query(table_name, query_options)
+        batches = self._iter_query_row_batches(table_name, query, parameters, selected_names, self._arraysize,
+                                               expansions=expansions, hidden_names=hidden_names)
+        return [r for b in batches for r in b]
+
+    @_instrumented_generator
+    def iter_query_json(self, table_name, query_options, formatted=False, batch_size=None):
+        """
+        Generate the rows of a single table that match OData system query options in OData-compatible
+        JSON format, one chunk at a time.
+
+        :param table_name: Name of the table to be queried
+        :param query_options: Dictionary of system query options: $apply, $filter, $select, $orderby, $top, $skip,
+                              $count and $expand
+        :param formatted: JSON output is formatted with indentation, defaults to false
+        :param batch_size: Number of rows fetched and serialized per chunk, defaults to 1000
+        :return: Generator of JSON fragments
+        """
+        _log.debug('Streaming query of table %s in JSON format', table_name)
+        query_options, expansions, hidden_names = self._compile_expand(table_name, query_options)
+        query, parameters, selected_names, count_query, count_parameters, odata_types = self._compile_table_query(
+            table_name, query_options)
         odata_context_url = f'$metadata#{table_name}'
-        table_rows = self.get_table_rows(table_name)
-        table_json = {'@odata.context': odata_context_url, 'value': table_rows}
-        if formatted:
-            return ujson.dumps(table_json, indent=4)
+        if '$select' in query_options or '$apply' in query_options:
+            odata_context_url += f'({",".join(n for n in selected_names if n not in hidden_names)})'
+        annotations = {}
+        if count_query is not None:
+            count_rows = self._backend.fetch_all(self._connection, count_query, count_parameters)
+            annotations['@odata.count'] = count_rows[0][0]
+        batches = self._iter_query_row_batches(table_name, query, parameters, selected_names,
+                                               batch_size or self._arraysize, convert=True, odata_types=odata_types,
+                                               expansions=expansions, hidden_names=hidden_names)
+        return _iter_odata_json(odata_context_url, batches, formatted, annotations, dict, self._metrics_sink,
+                                {'table': table_name})
+
+    @_instrumented
+    def query_table_json(self, table_name, query_options, formatted=False):
+        """
+        Fetch the rows of a single table that match OData system query options in OData-compatible JSON format.
+
+        :param table_name: Name of the table to be queried
+        :param query_options: Dictionary of system query options: $apply, $filter, $select, $orderby, $top, $skip,
+                              $count and $expand
+        :param formatted: JSON output is formatted with indentation, defaults to false
+        :return: JSON-formatted rows and an OData context header pointing to metadata
+        """
+        return ''.join(self.iter_query_json(table_name, query_options, formatted))
+
+    @_instrumented
+    def get_table_arrow_schema(self, table_name):
+        """
+        Create an Arrow schema for a single table, with column types derived from the same OData types as the
+        metadata document. Requires the pyarrow package.
+
+        :param table_name: Name of the table whose schema should be created
+        :return: pyarrow.Schema of the table
+        """
+        import pyarrow
+        fields = []
+        for field in self.get_table_schema(table_name):
+            type_name, *type_arguments = _arrow_types[field[1]]
+            fields.append(pyarrow.field(field[0], getattr(pyarrow, type_name)(*type_arguments)))
+        return pyarrow.schema(fields)
+
+    def _iter_table_record_batches(self, table_name, batch_size):
+        """
+        Fetch the rows of a single table as Arrow record batches, converted column by column from the cursor batches.
+
+        :return: Generator of pyarrow.RecordBatch objects
+        """
+        import pyarrow
+        # Prevents SQL injection by validating parameter against list of table names
+        self._validate_table_name(table_name)
+        arrow_schema = self.get_table_arrow_schema(table_name)
+        query = f'''SELECT * FROM {quote_identifier(table_name)}'''  # nosec - safe because of the prior check
+        labels = {'table': table_name}
+        for rows in self._iter_query_batches(table_name, query, [], batch_size or self._arraysize):
+            start = time.perf_counter()
+            columns = []
+            for values, arrow_field in zip(zip(*rows), arrow_schema):
+                column, invalid_count = _to_arrow_array(values, arrow_field.type)
+                if invalid_count:
+                    _log.warning('Wrote %s values of column %s of table %s that are not of type %s as nulls',
+                                 invalid_count, arrow_field.name, table_name, arrow_field.type)
+                columns.append(column)
+            record_batch = pyarrow.RecordBatch.from_arrays(columns, schema=arrow_schema)
+            self._metrics_sink.add_timing('conversion', time.perf_counter() - start, labels)
+            yield record_batch
+
+    @_instrumented
+    def write_table_columnar(self, table_name, output_file, columnar_format='parquet', batch_size=None):
+        """
+        Write all rows of a single table in a columnar format to a file as they are fetched, for loading
+        straight into dataframes. Requires the pyarrow package.
+
+        :param table_name: Name of the table to be fetched
+        :param output_file: Writable binary file object that receives the output
+        :param columnar_format: Either "parquet" or "arrow" (Arrow IPC file format), defaults to "parquet"
+        :param batch_size: Number of rows fetched and converted per record batch, defaults to 1000
+        """
+        _log.debug('Writing rows of table %s in %s format', table_name, columnar_format)
+        _check_columnar_format(columnar_format)
+        import pyarrow.ipc
+        import pyarrow.parquet
+        arrow_schema = self.get_table_arrow_schema(table_name)
+        record_batches = self._iter_table_record_batches(table_name, batch_size)
+        labels = {'table': table_name}
+        if columnar_format == 'arrow':
+            with pyarrow.ipc.new_file(output_file, arrow_schema) as writer:
+                for record_batch in record_batches:
+                    start = time.perf_counter()
+                    writer.write_batch(record_batch)
+                    self._metrics_sink.add_timing('write', time.perf_counter() - start, labels)
+            return
+        with pyarrow.parquet.ParquetWriter(output_file, arrow_schema) as writer:
+            row_group = []
+            row_group_size = 0
+            for record_batch in record_batches:
+                row_group.append(record_batch)
+                row_group_size += record_batch.num_rows
+                if row_group_size >= _parquet_row_group_size:
+                    start = time.perf_counter()
+                    writer.write_table(pyarrow.Table.from_batches(row_group), row_group_size)
+                    self._metrics_sink.add_timing('write', time.perf_counter() - start, labels)
+                    row_group = []
+                    row_group_size = 0
+            if row_group:
+                start = time.perf_counter()
+                writer.write_table(pyarrow.Table.from_batches(row_group), row_group_size)
+                self._metrics_sink.add_timing('write', time.perf_counter() - start, labels)
+
+    @_instrumented
+    def get_data_version(self):
+        """
+        Fetch the data version of this instance's connection, which changes whenever another
+        connection commits a change to the database. Values are only comparable within one instance.
+
+        :return: Data version as an integer, or None if the database offers no way of telling
+        """
+        return self._backend.get_data_version(self._connection)
+
+    @_instrumented
+    def get_table_size_estimate(self, table_name):
+        """
+        Cheaply estimate the size of a single table, used to schedule the largest tables first.
+
+        :param table_name: Name of the table to be estimated
+        :return: Approximate number of rows in the table
+        """
+        _log.debug('Estimating size of table %s', table_name)
+        # Prevents SQL injection by validating parameter against list of table names
+        self._validate_table_name(table_name)
+        return self._backend.get_table_size_estimate(self._connection, table_name) or 0
+
+    @_instrumented
+    def get_table_fingerprint(self, table_name, batch_size=None):
+        """
+        Compute a fingerprint of a single table's schema and contents, used to detect changed tables.
+        Rows are hashed as fetched without being converted to JSON, which is much cheaper than exporting them.
+
+        :param table_name: Name of the table to be fingerprinted
+        :param batch_size: Number of rows fetched per batch, defaults to 1000
+        :return: Dictionary of the table's schema, row count and SHA-256 hash of its raw rows
+        """
+        import hashlib
+        _log.debug('Fingerprinting table %s', table_name)
+        # Prevents SQL injection by validating parameter against list of table names
+        self._validate_table_name(table_name)
+        query = f'''SELECT * FROM {quote_identifier(table_name)}'''  # nosec - safe because of the prior check
+        batch_size = batch_size or self._arraysize
+        row_count = 0
+        content_hash = hashlib.sha256()
+        for rows in self._iter_query_batches(table_name, query, [], batch_size):
+            row_count += len(rows)
+            # Trailing separator keeps the hash independent of how rows are split into batches
+            content_hash.update(repr(rows)[1:-1].encode())
+            content_hash.update(b', ')
+        schema = [list(f) for f in self._get_cached_table_schema(table_name)]
+        return {'schema': schema, 'rows': row_count, 'sha256': content_hash.hexdigest()}
+
+    def _write_chunks(self, table_name, chunks, output_file):
+        """Write generated chunks to a file, timing only the writes themselves."""
+        labels = {'table': table_name}
+        for chunk in chunks:
+            start = time.perf_counter()
+            output_file.write(chunk)
+            self._metrics_sink.add_timing('write', time.perf_counter() - start, labels)
+
+    def _write_table_files(self, table_name, table_filename, dump_options, write_file, delta_link=None):
+        """
+        Write a table file, or when paging a file per page, where pages after the first are named
+        after the table with the page number appended and linked to from the preceding page.
+
+        :param dump_options: Dictionary of the formatted, batch_size and page_size options of the dump
+        :param write_file: Function that writes a file given its name and a function writing its content
+        :param delta_link: Optional @odata.deltaLink placed at the end of the last page
+        :return: Number of files written
+        """
+        formatted = dump_options['formatted']
+        batch_size = dump_options['batch_size']
+        page_size = dump_options['page_size']
+        media_threshold = dump_options['media_threshold']
+        labels = {'table': table_name}
+
+        def write_media(field_name, key, value):
+            media_name = f'{table_name}.media.{field_name}.{_encode_skip_token(key)}'
+            start = time.perf_counter()
+            _write_binary_file(os.path.join(os.path.dirname(table_filename), media_name),
+                               lambda media_file: media_file.write(value), dump_options['incremental'])
+            self._metrics_sink.add_timing('write', time.perf_counter() - start, labels)
+            return media_name
+        page_number = 1
+        after_key = None
+        while True:
+            page_state = {}
+
+            def next_link(next_key):
+                return f'{table_name}.{page_number + 1}'
+
+            def write_page(page_file):
+                chunks = self._iter_table_json(table_name, formatted, batch_size, page_size, after_key, next_link,
+                                               page_state, delta_link, media_threshold, write_media)
+                self._write_chunks(table_name, chunks, page_file)
+            write_file(_get_page_filename(table_filename, page_number), write_page)
+            after_key = page_state.get('next_key')
+            if after_key is None:
+                return page_number
+            page_number += 1
+
+    def _write_table_delta_files(self, table_name, table_filename, dump_options, write_file):
+        """
+        Write the changes to a table since the previous delta dump into a file named after the table and
+        the delta token of that dump (e.g. "people.delta.<token>"), which the previous dump's files link to.
+        A new token also gets an empty delta file, so links to it are valid until the next dump fills it.
+
+        :param dump_options: Dictionary of the options of the dump
+        :param write_file: Function that writes a file given its name and a function writing its content
+        :return: Delta token of the table's current state
+        """
+        formatted = dump_options['formatted']
+        batch_size = dump_options['batch_size']
+        delta_state = DeltaState(dump_options['delta_state_filename'])
+        delta_result = {}
+
+        def delta_link(token):
+            return f'{table_name}.delta.{token}'
+        try:
+            previous_token = delta_state.get_latest_token(table_name)
+            if previous_token is None:
+                # The first delta dump only takes the snapshot that the next one is compared with
+                for _ in self._iter_table_delta_row_batches(table_name, delta_state, None, batch_size, 1, delta_result):
+                    pass
+            else:
+                def write_delta(delta_file):
+                    chunks = self._iter_table_delta_json(table_name, delta_state, previous_token, formatted,
+                                                         batch_size, 1, delta_link, delta_result)
+                    self._write_chunks(table_name, chunks, delta_file)
+                write_file(f'{table_filename}.delta.{previous_token}', write_delta)
+        finally:
+            delta_state.close()
+        token = delta_result['token']
+        if token != previous_token:
+            empty_delta_json = ''.join(_iter_odata_json(f'$metadata#{table_name}/$delta', [], formatted, {},
+                                                        lambda: {'@odata.deltaLink': delta_link(token)}))
+            write_file(f'{table_filename}.delta.{token}', lambda delta_file: delta_file.write(empty_delta_json))
+        return token
+
+    def _dump_table(self, table_name, table_filename, dump_options, previous_fingerprint):
+        """
+        Write the file or files of a single table as part of a database dump.
+
+        :param dump_options: Dictionary of the options of the dump
+        :param previous_fingerprint: Fingerprint of the table from the previous incremental dump, if any
+        :return: Fingerprint of the table if the dump is incremental, otherwise None
+        """
+        compression = dump_options['compression']
+        compression_level = dump_options['compression_level']
+        columnar_format = dump_options['columnar_format']
+        columnar_filenames = []
+        if columnar_format is not None:
+            columnar_filenames.append(table_filename + _columnar_extensions[columnar_format])
+
+        def write_columnar_file(columnar_file):
+            self.write_table_columnar(table_name, columnar_file, columnar_format, dump_options['batch_size'])
+        delta_link = None
+        if dump_options['delta']:
+            write_file = functools.partial(_write_file_atomically if dump_options['incremental'] else _write_file,
+                                           compression=compression, compression_level=compression_level)
+            delta_token = self._write_table_delta_files(table_name, table_filename, dump_options, write_file)
+            delta_link = f'{table_name}.delta.{delta_token}'
+        if not dump_options['incremental']:
+            write_file = functools.partial(_write_file, compression=compression, compression_level=compression_level)
+            page_count = self._write_table_files(table_name, table_filename, dump_options, write_file, delta_link)
+            _remove_stale_pages(table_filename, page_count)
+            for columnar_filename in columnar_filenames:
+                _write_binary_file(columnar_filename, write_columnar_file, False)
+            return None
+        fingerprint = self.get_table_fingerprint(table_name, dump_options['batch_size'])
+        fingerprint['page_size'] = dump_options['page_size']
+        # The number of pages is only known once they are written, so an unchanged table keeps the previous one
+        fingerprint['page_count'] = (previous_fingerprint or {}).get('page_count')
+        if (fingerprint == previous_fingerprint and fingerprint['page_count'] is not None
+                and all(_output_files_exist(_get_page_filename(table_filename, n), compression)
+                        for n in range(1, fingerprint['page_count'] + 1))
+                and all(os.path.exists(f) for f in columnar_filenames)):
+            _log.debug('Skipping unchanged table %s', table_name)
         else:
-            return ujson.dumps(table_json, separators=(',', ':'))
+            write_file = functools.partial(_write_file_atomically, compression=compression,
+                                           compression_level=compression_level)
+            page_count = self._write_table_files(table_name, table_filename, dump_options, write_file, delta_link)
+            # Pages past the new last one are no longer linked to, so they go once it has replaced the old one
+            _remove_stale_pages(table_filename, page_count)
+            fingerprint['page_count'] = page_count
+            for columnar_filename in columnar_filenames:
+                _write_binary_file(columnar_filename, write_columnar_file, True)
+        return fingerprint
 
-    def dump_database(self, folder_name, tables_to_include=None, formatted=False):
+    @_instrumented
+    def dump_database(self, folder_name, tables_to_include=None, formatted=False, batch_size=None, workers=None,
+                      incremental=False, page_size=None, compression=None, compression_level=None,
+                      columnar_format=None, delta=False, progress=None, media_threshold=None, snapshot=False,
+                      aggregations=None):
         """
         Create a service document, metadata file for the database schemas, and a JSON
         file for each table, suitable for creating an OData-compatible API endpoint.
+        Table files are streamed to disk in batches, so memory use does not grow with table size.
 
         :param folder_name: Location to store output files
         :param tables_to_include: Optional list of tables to include in dump, defaults to all
         :param formatted: JSON output is formatted with indentation, defaults to false
+        :param batch_size: Number of rows fetched and written per chunk, defaults to 1000
+        :param workers: Number of worker processes exporting tables in parallel, each with its own
+                        read-only connection; defaults to exporting serially over this instance's connection
+        :param incremental: Only rewrite files whose content has changed since the previous incremental dump
+                            into the same folder, tracked by table fingerprints in a manifest file; changed files
+                            are replaced atomically. Defaults to false.
+        :param page_size: Optional maximum number of rows per table file; larger tables are split into
+                          files named after the table with the page number appended (e.g. "people.2"),
+                          each linked from the previous page by @odata.nextLink. Defaults to one file per table.
+        :param compression: Optional compression format, or list of formats, of precompressed sidecar files
+                            written next to every output file as it is streamed: "gzip" (".gz") or "zstd"
+                            (".zst", requires the zstandard package). Defaults to no sidecars.
+        :param compression_level: Optional compression level for the sidecars, defaults to each format's default
+        :param columnar_format: Optional columnar format of an additional file written for each table for
+                                analytics, "parquet" (".parquet") or "arrow" (".arrow", Arrow IPC file format),
+                                with column types derived from the metadata; requires the pyarrow package.
+                                Defaults to JSON files only.
+        :param delta: Track changes between dumps into the same folder, by keeping a snapshot of each table's
+                      row hashes in a state file; each dump writes the rows added, changed or removed since the
+                      previous one to a delta file named after the table and that dump's token
+                      (e.g. "people.delta.<token>"), which the previous dump's last page links to through
+                      @odata.deltaLink. Defaults to false.
+        :param progress: Optional function called after each table is written, with the table name, the number
+                         of tables written so far and the total number of tables
+        :param media_threshold: Optional size in bytes above which binary values are written to media resource
+                                files named after the table, field and row key (e.g. "people.media.Photo.WzFd")
+                                rather than inlined as base64url, with a "Photo@odata.mediaReadLink" annotation
+                                in place of the value. Defaults to inlining all binary values.
+        :param snapshot: Export the database as it was when the dump started, even while it is being written to,
+                         by first copying it in one read transaction to a private temporary file, which the dump
+                         and its workers then read from. The copy goes in the system's temporary folder (which the
+                         TMPDIR environment variable sets), never the output folder, since it holds every table.
+                         Writers to a database in WAL mode are not held up by the copy. Only supported for SQLite;
+                         defaults to false.
+        :param aggregations: Optional dictionary of pre-aggregated entity sets, where the keys are their names and
+                             the values are tuples of the aggregated table's name and an OData $apply expression,
+                             e.g. {'sales_by_country': ('invoices', 'groupby((BillingCountry),aggregate(Total with
+                             sum as Revenue))')}. Each set is written to a file of that name, listed in the service
+                             document and described in the metadata, so that clients can fetch summaries without
+                             downloading the rows they summarize. Defaults to none.
         """
-        _log.debug(f'Dumping database to {folder_name}')
+        _log.debug('Dumping database to %s', folder_name)
+        compression = [compression] if isinstance(compression, str) else list(compression or [])
+        for compression_format in compression:
+            _check_compression(compression_format)
+        if columnar_format is not None:
+            _check_columnar_format(columnar_format)
+        if media_threshold is not None and (not isinstance(media_threshold, int) or media_threshold < 0):
+            raise ValueError(f'Invalid media threshold: {media_threshold}')
+        aggregations = dict(aggregations or {})
+        for aggregation_name, (table_name, expression) in aggregations.items():
+            if not aggregation_name.isidentifier() or aggregation_name in self.get_table_names():
+                raise ValueError(f'Invalid aggregation name: {aggregation_name}')
+            # Checks the expression before anything is written
+            self.get_aggregation_schema(table_name, expression)
+        dump_arguments = (folder_name, tables_to_include, formatted, batch_size, workers, incremental, page_size,
+                          compression, compression_level, columnar_format, delta, progress, media_threshold,
+                          aggregations)
+        if not snapshot:
+            self._dump_database(*dump_arguments)
+            return
+        snapshot_file, snapshot_filename = tempfile.mkstemp(suffix='.db', prefix=_snapshot_filename_prefix)
+        os.close(snapshot_file)
+        try:
+            start = time.perf_counter()
+            snapshot_kwargs = self._backend.create_snapshot(self._connection, snapshot_filename)
+            _log.debug('Copied snapshot to %s in %.3f seconds', snapshot_filename, time.perf_counter() - start)
+            # The copy is read with the same options as the database, other than those that open it
+            interface_kwargs = {k: v for k, v in self._init_kwargs.items()
+                                if k in _interface_options or k in SQLiteBackend.options}
+            snapshot_interface = ODataInterface(**{**interface_kwargs, **snapshot_kwargs})
+            try:
+                snapshot_interface._dump_database(*dump_arguments)
+            finally:
+                snapshot_interface.close()
+        finally:
+            if os.path.exists(snapshot_filename):
+                os.remove(snapshot_filename)
+
+    def _dump_database(self, folder_name, tables_to_include, formatted, batch_size, workers, incremental, page_size,
+                       compression, compression_level, columnar_format, delta, progress, media_threshold,
+                       aggregations):
+        """Write the files of a database dump, once the options of dump_database have been checked."""
         table_names = self.get_table_names() if tables_to_include is None else tables_to_include
+        for table_name in table_names:
+            self._validate_table_name(table_name)
         os.makedirs(folder_name, exist_ok=True)
+        manifest_filename = os.path.join(folder_name, _manifest_filename)
+        manifest = _read_manifest(manifest_filename) if incremental else {}
+        previous_fingerprints = {}
+        if (manifest.get('formatted') == formatted and manifest.get('compression', []) == compression
+                and manifest.get('strict_types', False) == self._strict_types
+                and manifest.get('columnar_format') == columnar_format and manifest.get('delta', False) == delta
+                and manifest.get('media_threshold') == media_threshold):
+            previous_fingerprints = manifest.get('tables', {})
+        dump_options = {
+            'formatted': formatted,
+            'batch_size': batch_size,
+            'page_size': page_size,
+            'incremental': incremental,
+            'compression': compression,
+            'compression_level': compression_level,
+            'columnar_format': columnar_format,
+            'delta': delta,
+            'delta_state_filename': os.path.join(folder_name, _delta_state_filename),
+            'media_threshold': media_threshold,
+        }
         service_filename = os.path.join(folder_name, '$service')
-        service_json = self.get_database_service_json(tables_to_include)
+        service_json = self.get_database_service_json(tables_to_include, aggregations=aggregations)
         schema_filename = os.path.join(folder_name, '$metadata')
-        schema_xml = self.get_database_schema_xml()
-        with open(service_filename, 'w') as service_file:
-            service_file.write(service_json)
-        with open(schema_filename, 'w') as schema_file:
-            schema_file.write(schema_xml)
-        for table_name in table_names:
-            table_filename = os.path.join(folder_name, table_name)
-            table_json = self.get_table_json(table_name, formatted)
-            with open(table_filename, 'w') as table_file:
-                table_file.write(table_json)
+        schema_xml = self.get_database_schema_xml(aggregations=aggregations)
+        _write_text_file(service_filename, service_json, incremental, compression, compression_level)
+        _write_text_file(schema_filename, schema_xml, incremental, compression, compression_level)
+        fingerprints = {}
+        if workers is None or workers <= 1:
+            for table_name in table_names:
+                table_filename = os.path.join(folder_name, table_name)
+                with self._metrics_sink.span('dump_table', {'table': table_name}):
+                    fingerprints[table_name] = self._dump_table(table_name, table_filename, dump_options,
+                                                                previous_fingerprints.get(table_name))
+                if progress is not None:
+                    progress(table_name, len(fingerprints), len(table_names))
+        else:
+            # Largest tables go first so a big one doesn't start last and hold up the whole dump
+            table_names = sorted(table_names, key=lambda t: (-self.get_table_size_estimate(t), t))
+            _log.debug('Dumping %s tables with %s workers', len(table_names), workers)
+            # Workers buffer their measurements and send them back with each table for this instance's sink
+            init_kwargs = {k: v for k, v in self._init_kwargs.items() if k != 'metrics_sink'}
+            import concurrent.futures
+            with concurrent.futures.ProcessPoolExecutor(workers, initializer=_init_dump_worker,
+                                                        initargs=(init_kwargs,)) as executor:
+                futures = {}
+                for table_name in table_names:
+                    table_filename = os.path.join(folder_name, table_name)
+                    previous_fingerprint = previous_fingerprints.get(table_name)
+                    future = executor.submit(_dump_table_worker, table_name, table_filename, dump_options,
+                                             previous_fingerprint)
+                    futures[future] = table_name
+                for future in concurrent.futures.as_completed(futures):
+                    table_name = futures[future]
+                    fingerprints[table_name], records = future.result()
+                    replay(records, self._metrics_sink)
+                    if progress is not None:
+                        progress(table_name, len(fingerprints), len(table_names))
+        previous_aggregations = manifest.get('aggregations', {}) if previous_fingerprints else {}
+        for aggregation_name, (table_name, expression) in aggregations.items():
+            aggregation_filename = os.path.join(folder_name, aggregation_name)
+            if (previous_aggregations.get(aggregation_name) == [table_name, expression]
+                    and fingerprints.get(table_name) is not None
+                    and fingerprints[table_name] == previous_fingerprints.get(table_name)
+                    and _output_files_exist(aggregation_filename, compression)):
+                _log.debug('Skipping aggregation %s of unchanged table %s', aggregation_name, table_name)
+                continue
+            with self._metrics_sink.span('dump_aggregation', {'table': table_name}):
+                query, parameters, field_names, _, _, odata_types = self._compile_table_query(
+                    table_name, {'$apply': expression})
+                batches = self._iter_query_row_batches(table_name, query, parameters, field_names,
+                                                       batch_size or self._arraysize, convert=True,
+                                                       odata_types=odata_types)
+                aggregation_json = ''.join(_iter_odata_json(f'$metadata#{aggregation_name}', batches, formatted, {},
+                                                            dict, self._metrics_sink, {'table': table_name}))
+                _write_text_file(aggregation_filename, aggregation_json, incremental, compression, compression_level)
+        if incremental:
+            manifest = {'formatted': formatted, 'compression': compression, 'columnar_format': columnar_format,
+                        'delta': delta, 'media_threshold': media_threshold, 'strict_types': self._strict_types,
+                        'tables': {**previous_fingerprints, **fingerprints}}
+            if aggregations:
+                manifest['aggregations'] = {n: list(a) for n, a in aggregations.items()}
+            _write_text_file(manifest_filename, ujson.dumps(manifest, indent=4, sort_keys=True), incremental, [], None)
+
+    def close(self):
+        """Close the connections to the database."""
+        self._pool.close()
+        self._connection.close()
 
     def __init__(self, *args, **kwargs):
-        """Construct an instance of the class."""
-        sqlite_filename = kwargs['sqlite_filename']
-        sqlite_uri = f'file:{sqlite_filename}?mode=ro'
-        self._connection = sqlite3.connect(sqlite_uri, uri=True)
-        _log.debug(f'Opened read-only connection to database at {sqlite_filename}')
+        """
+        Construct an instance of the class.
+
+        :param sqlite_filename: Location of the SQLite database, which is the default backend
+        :param backend: Optional name of the database backend: "sqlite", "duckdb" (with duckdb_filename,
+                        requires the duckdb package) or "postgres" (with postgres_dsn, requires the
+                        psycopg package); defaults to "sqlite"
+        :param pool_size: Maximum number of pooled read-only connections that stream rows, each stream
+                          using one for as long as it is open; defaults to 4
+        :param pool_timeout: Number of seconds to wait for a pooled connection to become available, defaults to 30
+        :param arraysize: Number of rows fetched from a cursor at a time by calls that take no batch size,
+                          and by default by those that do; defaults to 1000
+        :param mmap_size: Optional number of bytes of a SQLite database that are memory-mapped
+        :param cache_size: Optional size of the page cache of each SQLite connection, in pages if positive
+                           or in kibibytes if negative
+        :param temp_store: Optional location of SQLite's temporary tables: "default", "file" or "memory"
+        :param query_only: Refuse all changes to a SQLite database, on top of opening it read-only
+        :param immutable: Open a SQLite database as an unchanging snapshot, without locking or change detection;
+                          only safe for files that are never written to while open
+        :param metrics_sink: Optional MetricsSink (such as a MetricsRecorder) that receives timings of every public
+                             call and of the query, conversion, serialization and write phases, counts of rows and
+                             bytes per table, and schema cache hits and misses; defaults to discarding them
+        :param profile_folder: Optional folder that receives a cProfile statistics file for every top-level public
+                               call, and for every table written by a dump worker; defaults to no profiling
+        :param strict_types: Write JSON values in the exact form of their OData type (date and times with a time
+                             zone, decimals with all of their digits, booleans and base64url binaries) and
+                             describe keys, nullability and default values in the metadata; defaults to writing
+                             values as the database returns them and types alone
+        :param navigation_properties: Describe the relationships given by the foreign keys of the database as
+                                      navigation properties with referential constraints in the metadata; $expand
+                                      works on them either way. Defaults to false.
+        """
+        self._init_kwargs = kwargs
+        self._strict_types = bool(kwargs.get('strict_types'))
+        self._navigation_properties = bool(kwargs.get('navigation_properties'))
+        self._metrics_sink = kwargs.get('metrics_sink') or _null_metrics_sink
+        self._profile_folder = kwargs.get('profile_folder')
+        self._arraysize = _default_batch_size if kwargs.get('arraysize') is None else kwargs['arraysize']
+        if isinstance(self._arraysize, bool) or not isinstance(self._arraysize, int) or self._arraysize < 1:
+            raise ValueError(f'Invalid array size: {self._arraysize}')
+        self._backend = create_backend(**{k: v for k, v in kwargs.items() if k not in _interface_options})
+        self.clear_schema_cache()
+        # Catalog and other short queries go through a connection of their own, which is never held by a stream
+        self._connection = self._backend.connect()
+        self._pool = ConnectionPool(self._backend, kwargs.get('pool_size', _default_pool_size),
+                                    kwargs.get('pool_timeout', _default_pool_timeout))
+        _log.debug('Opened read-only connection to %s', self._backend)
+
+
+_worker_interface = None
+
+
+def _init_dump_worker(init_kwargs):
+    """Open the read-only connection used by a dump worker process for all of its tables."""
+    global _worker_interface
+    _worker_interface = ODataInterface(**init_kwargs, metrics_sink=MetricsBuffer())
+
+
+def _dump_table_worker(table_name, *args):
+    """
+    Write a single table file from within a dump worker process.
+
+    :return: Tuple of the table's fingerprint and the measurements taken while writing it
+    """
+    profile = Profile(_worker_interface._profile_folder, 'dump_table')
+    with _worker_interface._metrics_sink.span('dump_table', {'table': table_name}), profile:
+        fingerprint = _worker_interface._dump_table(table_name, *args)
+    profile.save()
+    return fingerprint, _worker_interface._metrics_sink.pop_records()
+
+
+@functools.lru_cache(maxsize=256)
+def _get_row_builder(field_names, skip=0, converters=None):
+    """
+    Compile a function that turns a batch of row tuples into dictionaries of field name / value pairs.
+
+    The function unpacks each tuple straight into a dictionary display with the field names as constants,
+    which avoids the zip object and the generic dict constructor that dict(zip(...)) needs for every row.
+    The dictionaries are identical to those of dict(zip(...)), so the JSON written from them is too.
+    Fields with a converter have it called inline on their non-null values; the others are copied as they are.
+
+    :param field_names: Tuple of field names
+    :param skip: Number of leading values in each row tuple that are left out of the dictionary
+    :param converters: Optional tuple of a converter function or None for each field, defaults to no conversion
+    :return: Function that takes a list of row tuples and returns a list of dictionaries
+    """
+    converters = converters or (None,) * len(field_names)
+    targets = ''.join(f'_{i}, ' for i in range(skip + len(field_names)))
+    values = [f'_{skip + i}' if c is None else f'(None if _{skip + i} is None else _c{i}(_{skip + i}))'
+              for i, c in enumerate(converters)]
+    items = ', '.join(f'{n!r}: {v}' for n, v in zip(field_names, values))
+    namespace = {f'_c{i}': c for i, c in enumerate(converters) if c is not None}
+    # Field names are embedded as string literals through repr, so no table or column name can inject code
+    return eval(f'lambda rows: [{{{items}}} for {targets}in rows]', namespace)  # nosec
+
+
+def _iter_odata_json(odata_context_url, batches, formatted, annotations, trailing_annotations,
+                     metrics_sink=_null_metrics_sink, labels=None):
+    """
+    Generate an OData JSON collection document one chunk at a time.
+
+    :param odata_context_url: Value of the @odata.context annotation
+    :param batches: Iterable of lists of rows each of which is a dictionary of field name / value pairs
+    :param formatted: JSON output is formatted with indentation
+    :param annotations: Dictionary of annotations placed between the context and the value
+    :param trailing_annotations: Function that returns a dictionary of annotations placed after the value,
+                                 called once all of the rows have been generated
+    :param metrics_sink: Optional MetricsSink that receives the serialization timings and JSON byte counts
+    :param labels: Optional dictionary of labels of the measurements, such as the table
+    :return: Generator of JSON fragments
+    """
+    labels = labels or {}
+    if formatted:
+        yield f'{{\n    "@odata.context": {ujson.dumps(odata_context_url)},'
+        for name, value in annotations.items():
+            yield f'\n    {ujson.dumps(name)}: {ujson.dumps(value)},'
+        yield '\n    "value": ['
+        separator = '\n'
+        for batch in batches:
+            start = time.perf_counter()
+            # Strips the list brackets and nests the rows one level deeper within the envelope
+            batch_json = ujson.dumps(batch, indent=4, default=_json_default, reject_bytes=True)
+            batch_json = batch_json[2:-2].replace('\n', '\n    ')
+            metrics_sink.add_timing('serialization', time.perf_counter() - start, labels)
+            metrics_sink.add_count('bytes', len(batch_json), labels)
+            yield f'{separator}    {batch_json}'
+            separator = ',\n'
+        yield '\n    ]' if separator == ',\n' else ']'
+        for name, value in trailing_annotations().items():
+            yield f',\n    {ujson.dumps(name)}: {ujson.dumps(value)}'
+        yield '\n}'
+    else:
+        yield f'{{"@odata.context":{ujson.dumps(odata_context_url)},'
+        for name, value in annotations.items():
+            yield f'{ujson.dumps(name)}:{ujson.dumps(value)},'
+        yield '"value":['
+        separator = ''
+        for batch in batches:
+            start = time.perf_counter()
+            batch_json = ujson.dumps(batch, separators=(',', ':'), default=_json_default,
+                                     reject_bytes=True)[1:-1]
+            metrics_sink.add_timing('serialization', time.perf_counter() - start, labels)
+            metrics_sink.add_count('bytes', len(batch_json), labels)
+            yield separator + batch_json
+            separator = ','
+        yield ']'
+        for name, value in trailing_annotations().items():
+            yield f',{ujson.dumps(name)}:{ujson.dumps(value)}'
+        yield '}'
+
+
+def _json_default(value):
+    """
+    Convert the values that databases other than SQLite return, and ujson doesn't know, to JSON types,
+    along with binary values, which OData represents as base64url strings.
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.urlsafe_b64encode(value).decode()
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f'{value!r} is not JSON serializable')
+
+
+def _encode_skip_token(key):
+    """Encode the key values that a page starts after as an opaque, URL-safe $skiptoken."""
+    return base64.urlsafe_b64encode(ujson.dumps(key, default=_json_default).encode()).decode().rstrip('=')
+
+
+def _decode_skip_token(skip_token):
+    """Decode the key values from a $skiptoken created by _encode_skip_token."""
+    try:
+        key = ujson.loads(base64.urlsafe_b64decode(skip_token + '=' * (-len(skip_token) % 4)))
+    except ValueError:
+        raise ValueError(f'Invalid skip token: {skip_token}') from None
+    if not isinstance(key, list):
+        raise ValueError(f'Invalid skip token: {skip_token}')
+    return key
+
+
+def _format_entity_id(table_name, key_names, key_values):
+    """Format the canonical URL of an entity relative to the service root, e.g. "people(1)" or "pairs(a=1,b=2)"."""
+    if len(key_values) == 1:
+        return f'{table_name}({_format_literal(key_values[0])})'
+    key_json = ','.join(f'{n}={_format_literal(v)}' for n, v in zip(key_names, key_values))
+    return f'{table_name}({key_json})'
+
+
+def _format_literal(value):
+    """Format a key value as an OData URL literal."""
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _check_compression(compression):
+    """Ensure a sidecar compression format is known and available."""
+    if compression not in _compression_extensions:
+        raise ValueError(f'Unknown compression format: {compression}')
+    if compression == 'zstd':
+        try:
+            # Imported on first use only, like the other optional packages
+            import zstandard  # noqa: F401
+        except ImportError:
+            raise ValueError('Compression format zstd requires the zstandard package') from None
+
+
+def _check_columnar_format(columnar_format):
+    """Ensure a columnar format is known and that pyarrow is available to write it."""
+    if columnar_format not in _columnar_extensions:
+        raise ValueError(f'Unknown columnar format: {columnar_format}')
+    try:
+        # Imported on first use only, since pyarrow takes a while to import
+        import pyarrow.ipc  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise ValueError(f'Columnar format {columnar_format} requires the pyarrow package') from None
+
+
+def _to_arrow_array(values, arrow_type):
+    """
+    Convert the values of a column to an Arrow array of the column's type.
+
+    :param values: Sequence of values as returned by the database driver
+    :param arrow_type: Arrow type of the column
+    :return: Tuple of the pyarrow.Array and the number of values that couldn't be converted and are nulls instead
+    """
+    import pyarrow
+    try:
+        return pyarrow.array(values, type=arrow_type), 0
+    except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+        # Values that pyarrow can't take as they are, such as SQLite's textual dates or decimals of other
+        # databases, are cast from their text form
+        text_values = pyarrow.array([None if v is None else str(v) for v in values], type=pyarrow.string())
+    try:
+        return _cast_text_array(text_values, arrow_type), 0
+    except pyarrow.ArrowInvalid:
+        pass
+    # SQLite columns can hold values of any type, so the values that don't fit the column's are cast one at a time
+    arrays = []
+    invalid_count = 0
+    for value in text_values:
+        try:
+            arrays.append(_cast_text_array(pyarrow.array([value], type=pyarrow.string()), arrow_type))
+        except pyarrow.ArrowInvalid:
+            arrays.append(pyarrow.nulls(1, arrow_type))
+            invalid_count += 1
+    return pyarrow.concat_arrays(arrays), invalid_count
+
+
+def _cast_text_array(text_values, arrow_type):
+    """Cast an Arrow array of text to another Arrow type, raising pyarrow.ArrowInvalid for text that doesn't fit it."""
+    import pyarrow
+    if not pyarrow.types.is_timestamp(arrow_type):
+        return text_values.cast(arrow_type)
+    try:
+        return text_values.cast(arrow_type)
+    except pyarrow.ArrowInvalid:
+        # Timestamps without a zone offset are taken to be in UTC
+        return text_values.cast(pyarrow.timestamp(arrow_type.unit)).cast(arrow_type)
+
+
+def _open_compressed_file(raw_file, compression, compression_level):
+    """Wrap a binary file in a compressing writer of the given format."""
+    if compression == 'gzip':
+        compression_level = 9 if compression_level is None else compression_level
+        # No name and a fixed timestamp keep repeated dumps of the same data byte-identical
+        return gzip.GzipFile(filename='', mode='wb', compresslevel=compression_level, fileobj=raw_file, mtime=0)
+    else:
+        import zstandard
+        compression_level = 3 if compression_level is None else compression_level
+        compressor = zstandard.ZstdCompressor(level=compression_level)
+        return compressor.stream_writer(raw_file, closefd=False)
+
+
+class _SidecarWriter():
+    """Text file-like writer that encodes each chunk once and writes it to a file and all of its compressed sidecars."""
+
+    def write(self, text):
+        data = text.encode()
+        for output_file in self._output_files:
+            output_file.write(data)
+
+    def __init__(self, output_files):
+        self._output_files = output_files
+
+
+@contextlib.contextmanager
+def _open_output_file(filename, sidecars, compression_level):
+    """
+    Open a file for writing text, along with compressed sidecars that receive the same text as it is written.
+
+    :param filename: Name of the file to be written
+    :param sidecars: List of (compression format, filename) tuples of the sidecars to be written
+    :param compression_level: Optional compression level of the sidecars
+    :return: Context manager that produces a writable text file-like object
+    """
+    if not sidecars:
+        with open(filename, 'w') as output_file:
+            yield output_file
+        return
+    with contextlib.ExitStack() as stack:
+        output_files = [stack.enter_context(open(filename, 'wb'))]
+        for compression_format, sidecar_filename in sidecars:
+            raw_file = stack.enter_context(open(sidecar_filename, 'wb'))
+            compressed_file = _open_compressed_file(raw_file, compression_format, compression_level)
+            output_files.append(stack.enter_context(compressed_file))
+        yield _SidecarWriter(output_files)
+
+
+def _get_sidecar_filenames(filename, compression):
+    """Name the compressed sidecars of a file, one per compression format."""
+    return [filename + _compression_extensions[c] for c in compression]
+
+
+def _get_page_filename(table_filename, page_number):
+    """Name the file of a page of a table, where pages after the first have the page number appended."""
+    return table_filename if page_number == 1 else f'{table_filename}.{page_number}'
+
+
+def _remove_stale_pages(table_filename, page_count):
+    """Remove the files of the pages past a table's last one, and their sidecars, left by an earlier dump."""
+    page_number = page_count + 1
+    while True:
+        page_filename = _get_page_filename(table_filename, page_number)
+        stale_filenames = [f for f in [page_filename] + _get_sidecar_filenames(page_filename, _compression_extensions)
+                           if os.path.exists(f)]
+        if not stale_filenames:
+            return
+        _log.debug('Removing stale page %s', page_filename)
+        for stale_filename in stale_filenames:
+            os.remove(stale_filename)
+        page_number += 1
+
+
+def _output_files_exist(filename, compression):
+    """Check that a file and all of its compressed sidecars exist."""
+    return all(os.path.exists(f) for f in [filename] + _get_sidecar_filenames(filename, compression))
+
+
+def _write_file(filename, write_function, compression=(), compression_level=None):
+    """
+    Write a file in place.
+
+    :param filename: Name of the file to be written
+    :param write_function: Function that writes the content to the open file
+    :param compression: List of compression formats of sidecars written alongside the file
+    :param compression_level: Optional compression level of the sidecars
+    """
+    sidecars = list(zip(compression, _get_sidecar_filenames(filename, compression)))
+    with _open_output_file(filename, sidecars, compression_level) as output_file:
+        write_function(output_file)
+
+
+def _write_file_atomically(filename, write_function, compression=(), compression_level=None):
+    """
+    Write a file by way of a temporary sibling that then replaces it in one step,
+    so that readers never see a partially written file.
+
+    :param filename: Name of the file to be written
+    :param write_function: Function that writes the content to the open temporary file
+    :param compression: List of compression formats of sidecars written alongside the file
+    :param compression_level: Optional compression level of the sidecars
+    """
+    filenames = [filename] + _get_sidecar_filenames(filename, compression)
+    temp_filenames = [f'{f}.{os.getpid()}.tmp' for f in filenames]
+    try:
+        with _open_output_file(temp_filenames[0], list(zip(compression, temp_filenames[1:])),
+                               compression_level) as temp_file:
+            write_function(temp_file)
+        for temp_filename, output_filename in zip(temp_filenames, filenames):
+            os.replace(temp_filename, output_filename)
+    except BaseException:
+        for temp_filename in temp_filenames:
+            if os.path.exists(temp_filename):
+                os.remove(temp_filename)
+        raise
+
+
+def _write_binary_file(filename, write_function, atomic):
+    """
+    Write a binary file in place, or when atomic by way of a temporary sibling that then replaces it in one step.
+
+    :param filename: Name of the file to be written
+    :param write_function: Function that writes the content to the open file
+    :param atomic: Readers never see a partially written file
+    """
+    output_filename = f'{filename}.{os.getpid()}.tmp' if atomic else filename
+    try:
+        with open(output_filename, 'wb') as output_file:
+            write_function(output_file)
+        if atomic:
+            os.replace(output_filename, filename)
+    except BaseException:
+        if atomic and os.path.exists(output_filename):
+            os.remove(output_filename)
+        raise
+
+
+def _write_text_file(filename, text, incremental, compression, compression_level):
+    """
+    Write a complete text file; when incremental, it is left untouched if the content is the same
+    and otherwise replaced atomically.
+    """
+    if not incremental:
+        _write_file(filename, lambda text_file: text_file.write(text), compression, compression_level)
+        return
+    if _output_files_exist(filename, compression):
+        with open(filename) as text_file:
+            if text_file.read() == text:
+                _log.debug('Skipping unchanged file %s', filename)
+                return
+    _write_file_atomically(filename, lambda text_file: text_file.write(text), compression, compression_level)
+
+
+def _read_manifest(manifest_filename):
+    """Read the manifest left by a previous incremental dump, or an empty one if there is none."""
+    try:
+        with open(manifest_filename) as manifest_file:
+            return ujson.load(manifest_file)
+    except (OSError, ValueError):
+        _log.debug('No usable manifest at %s, dumping all tables', manifest_filename)
+        return {}
@@ -0,0 +1,620 @@
+import abc
+import contextlib
+import importlib
+import itertools
+import re
+import sqlite3
+import threading
+
+from sql_to_odata.query import quote_identifier
+
+
+# Question mark placeholders outside of quoted identifiers and string literals, and percent signs anywhere
+_placeholder_pattern = re.compile(r'''"(?:[^"]|"")*"|'(?:[^']|'')*'|\?|%''')
+
+_cursor_numbers = itertools.count(1)
+
+_temp_store_values = {'default': 0, 'file': 1, 'memory': 2}
+
+# Most parameters of a query in SQLite versions before 3.32, assumed where a connection can't report its own limit
+_sqlite_parameter_limit = 999
+
+# Most parameters of a query in other databases, well within the limits of their protocols
+_parameter_limit = 30000
+
+
+class Backend(abc.ABC):
+    """
+    Database driver used by ODataInterface for catalog introspection, type mapping and row cursors.
+    Queries are written with question mark placeholders, which each backend converts as its driver requires.
+    """
+
+    # Pseudo-column that orders and identifies the rows of a table without a primary key
+    row_id_name = 'rowid'
+
+    # Value of a LIMIT parameter that leaves the number of rows unlimited
+    no_limit = None
+
+    # Templates of $filter functions that differ from the SQLite ones, see sql_to_odata.query
+    filter_functions = {}
+
+    # Function giving the size in bytes of a binary value without reading the value itself
+    binary_length_function = 'octet_length'
+
+    @staticmethod
+    @abc.abstractmethod
+    def datatype_to_odata(type_name):
+        """
+        Convert a database datatype to an OData type.
+
+        :param type_name: Datatype as reported by get_table_columns
+        :return: OData type name
+        """
+
+    @abc.abstractmethod
+    def connect(self):
+        """
+        Open a read-only connection to the database.
+
+        :return: Connection object of the driver
+        """
+
+    def reset(self, connection):
+        """Return a connection to a clean state before it is handed out again by a pool."""
+
+    def fetch_all(self, connection, query, parameters=()):
+        """
+        Run a query whose result is small enough to be fetched in one go.
+
+        :return: List of row tuples
+        """
+        return connection.execute(query, parameters).fetchall()
+
+    def open_cursor(self, connection, query, parameters, batch_size):
+        """
+        Run a query whose result is fetched in batches with fetchmany.
+
+        :param batch_size: Number of rows that will be fetched per batch
+        :return: Cursor object of the driver
+        """
+        return connection.execute(query, parameters)
+
+    @abc.abstractmethod
+    def get_table_names(self, connection):
+        """
+        Fetch the names of all tables in the database.
+
+        :return: List of table names in any order
+        """
+
+    @abc.abstractmethod
+    def get_table_columns(self, connection, table_name):
+        """
+        Fetch the columns of a single table in the form returned by SQLite's pragma_table_info.
+
+        :return: List of (index, name, type_name, is_not_null, default_value, primary_key_position) tuples,
+                 where the primary key position is 0 for columns outside of the primary key
+        """
+
+    def get_foreign_keys(self, connection, table_name):
+        """
+        Fetch the foreign keys of a single table in the form returned by SQLite's pragma_foreign_key_list.
+
+        :return: List of (id, position, referenced_table, column_name, referenced_column_name) tuples, one for each
+                 column of each foreign key in position order, where the referenced column name is None for
+                 references to the primary key of the referenced table; empty if the database offers no way of telling
+        """
+        return []
+
+    def get_parameter_limit(self, connection):
+        """
+        Find the most parameters that a single query may have on a connection.
+
+        :return: Number of parameters
+        """
+        return _parameter_limit
+
+    def get_row_id_name(self, connection, table_name):
+        """
+        Find the pseudo-column that identifies the rows of a table that is known to exist, where its primary key
+        may not: it is never NULL and unique within the table.
+
+        :return: Name of the pseudo-column, or None if the primary key can be relied on instead
+        """
+        return None
+
+    def get_schema_version(self, connection):
+        """
+        Fetch a value that changes whenever the database schema changes.
+
+        :return: Schema version, or None if the database offers no way of telling, in which case
+                 cached schemas are kept until they are cleared explicitly
+        """
+        return None
+
+    def get_data_version(self, connection):
+        """
+        Fetch a value of the connection that changes whenever another connection commits a change.
+
+        :return: Data version, or None if the database offers no way of telling
+        """
+        return None
+
+    @abc.abstractmethod
+    def get_table_size_estimate(self, connection, table_name):
+        """
+        Cheaply estimate the number of rows in a table that is known to exist.
+
+        :return: Approximate number of rows, or None if unknown
+        """
+
+    def create_snapshot(self, connection, snapshot_filename):
+        """
+        Copy the database as it is at one point in time to a file, which other processes can then read
+        consistently while the database goes on changing.
+
+        :param snapshot_filename: Location of the copy
+        :return: Dictionary of the keyword arguments of ODataInterface that open the copy
+        """
+        raise ValueError(f'Snapshot exports are not supported for {self}')
+
+
+class SQLiteBackend(Backend):
+    """
+    Backend for SQLite databases, opened read-only through the sqlite3 module, with optional tuning
+    of every connection for large sequential scans.
+    """
+
+    no_limit = -1
+
+    # octet_length only exists since SQLite 3.43, and length reads a BLOB's size from its header alone
+    binary_length_function = 'length'
+
+    # Keyword arguments of ODataInterface that tune SQLite connections
+    options = ('mmap_size', 'cache_size', 'temp_store', 'query_only', 'immutable')
+
+    @staticmethod
+    def datatype_to_odata(type_name):
+        if type_name == 'INTEGER':
+            return 'Edm.Int64'
+        elif type_name == 'REAL':
+            return 'Edm.Double'
+        elif type_name.startswith('NUMERIC'):
+            return 'Edm.Decimal'
+        elif type_name == 'TEXT':
+            return 'Edm.String'
+        elif type_name.startswith('NVARCHAR'):
+            return 'Edm.String'
+        elif type_name == 'BLOB':
+            return 'Edm.Binary'
+        elif type_name == 'DATETIME':
+            return 'Edm.DateTimeOffset'
+        elif type_name == 'DATE':
+            return 'Edm.Date'
+        elif type_name == 'BOOLEAN':
+            return 'Edm.Boolean'
+        else:
+            raise ValueError(f'Unknown data type: {type_name}')
+
+    def connect(self):
+        sqlite_uri = f'file:{self._sqlite_filename}?mode=ro'
+        if self._immutable:
+            sqlite_uri += '&immutable=1'
+        # Pooled connections may be handed from one thread to another, but are only used by one at a time
+        connection = sqlite3.connect(sqlite_uri, uri=True, check_same_thread=False)
+        for pragma in self._pragmas:
+            connection.execute(pragma)
+        return connection
+
+    def get_table_names(self, connection):
+        query = '''SELECT name FROM sqlite_schema WHERE type ='table' AND name NOT LIKE 'sqlite_%';'''
+        return [r[0] for r in connection.execute(query)]
+
+    def get_table_columns(self, connection, table_name):
+        query = '''SELECT * FROM pragma_table_info(?);'''
+        return connection.execute(query, [table_name]).fetchall()
+
+    def get_foreign_keys(self, connection, table_name):
+        query = '''SELECT id, seq, "table", "from", "to" FROM pragma_foreign_key_list(?) ORDER BY id, seq;'''
+        return connection.execute(query, [table_name]).fetchall()
+
+    def get_parameter_limit(self, connection):
+        return get_sqlite_parameter_limit(connection)
+
+    def get_row_id_name(self, connection, table_name):
+        try:
+            query = f'''SELECT rowid FROM {quote_identifier(table_name)} LIMIT 0'''  # nosec - validated by caller
+            connection.execute(query)
+        except sqlite3.OperationalError:
+            # Tables created WITHOUT ROWID have none, but their primary keys can't hold NULL values either
+            return None
+        # Unlike in other databases, the primary key of a rowid table can hold NULL values, even several of them
+        return 'rowid'
+
+    def get_schema_version(self, connection):
+        return connection.execute('''PRAGMA schema_version;''').fetchone()[0]
+
+    def get_data_version(self, connection):
+        return connection.execute('''PRAGMA data_version;''').fetchone()[0]
+
+    def get_table_size_estimate(self, connection, table_name):
+        try:
+            # The largest rowid is an index lookup rather than a full scan
+            query = f'''SELECT max(rowid) FROM {quote_identifier(table_name)}'''  # nosec - validated by caller
+            return connection.execute(query).fetchone()[0]
+        except sqlite3.OperationalError:
+            # Tables created WITHOUT ROWID have to be counted instead
+            query = f'''SELECT count(*) FROM {quote_identifier(table_name)}'''  # nosec - validated by caller
+            return connection.execute(query).fetchone()[0]
+
+    def create_snapshot(self, connection, snapshot_filename):
+        snapshot_connection = sqlite3.connect(snapshot_filename)
+        try:
+            # Copying every page in a single step reads them all within one read transaction, which in WAL mode
+            # doesn't hold up writers, rather than restarting whenever a writer changes the database
+            connection.backup(snapshot_connection, pages=-1)
+        finally:
+            snapshot_connection.close()
+        return {'backend': 'sqlite', 'sqlite_filename': snapshot_filename, 'immutable': True}
+
+    def __init__(self, sqlite_filename, mmap_size=None, cache_size=None, temp_store=None, query_only=False,
+                 immutable=False):
+        """
+        Construct an instance of the class.
+
+        :param sqlite_filename: Location of the SQLite database
+        :param mmap_size: Optional number of bytes of the database file that are memory-mapped, which saves
+                          copying pages into the page cache when reading; defaults to SQLite's (usually none)
+        :param cache_size: Optional size of the page cache of each connection, in pages if positive
+                           or in kibibytes if negative; defaults to SQLite's (usually 2 MiB)
+        :param temp_store: Optional location of temporary tables and indices, such as those of sorting:
+                           "default", "file" or "memory"; defaults to SQLite's
+        :param query_only: Refuse all changes to the database, on top of opening it read-only; defaults to false
+        :param immutable: Treat the database as a snapshot that nothing changes while it is open, which skips
+                          all locking and change detection; only safe for files that are never written to.
+                          Defaults to false.
+        """
+        self._sqlite_filename = sqlite_filename
+        self._immutable = immutable
+        self._pragmas = []
+        # Values are checked to be integers or known names, which makes them safe to interpolate
+        if mmap_size is not None:
+            self._pragmas.append(f'PRAGMA mmap_size = {_check_integer("mmap size", mmap_size)};')
+        if cache_size is not None:
+            self._pragmas.append(f'PRAGMA cache_size = {_check_integer("cache size", cache_size)};')
+        if temp_store is not None:
+            if temp_store not in _temp_store_values:
+                raise ValueError(f'Invalid temp store: {temp_store}')
+            self._pragmas.append(f'PRAGMA temp_store = {_temp_store_values[temp_store]};')
+        if query_only:
+            self._pragmas.append('PRAGMA query_only = 1;')
+
+    def __str__(self):
+        return f'SQLite database at {self._sqlite_filename}'
+
+
+class DuckDBBackend(Backend):
+    """Backend for DuckDB databases, opened read-only in process. Requires the duckdb package."""
+
+    filter_functions = {
+        '$eq': {2: '({0} IS NOT DISTINCT FROM {1})'},
+        '$ne': {2: '({0} IS DISTINCT FROM {1})'},
+        'contains': {2: 'contains({0}, {1})'},
+        'startswith': {2: 'starts_with({0}, {1})'},
+        'endswith': {2: 'ends_with({0}, {1})'},
+        'year': {1: 'year({0})'},
+        'month': {1: 'month({0})'},
+        'day': {1: 'day({0})'},
+        'hour': {1: 'hour({0})'},
+        'minute': {1: 'minute({0})'},
+        'second': {1: 'second({0})'},
+        'floor': {1: 'floor({0})'},
+        'ceiling': {1: 'ceil({0})'},
+    }
+
+    _odata_types = {
+        'BOOLEAN': 'Edm.Boolean',
+        'TINYINT': 'Edm.SByte',
+        'SMALLINT': 'Edm.Int16',
+        'INTEGER': 'Edm.Int32',
+        'BIGINT': 'Edm.Int64',
+        'UTINYINT': 'Edm.Byte',
+        'USMALLINT': 'Edm.Int32',
+        'UINTEGER': 'Edm.Int64',
+        'FLOAT': 'Edm.Single',
+        'DOUBLE': 'Edm.Double',
+        'VARCHAR': 'Edm.String',
+        'BLOB': 'Edm.Binary',
+        'DATE': 'Edm.Date',
+        'TIME': 'Edm.TimeOfDay',
+        'TIMESTAMP': 'Edm.DateTimeOffset',
+        'TIMESTAMP WITH TIME ZONE': 'Edm.DateTimeOffset',
+        'UUID': 'Edm.Guid',
+    }
+
+    @staticmethod
+    def datatype_to_odata(type_name):
+        if type_name.startswith('DECIMAL'):
+            return 'Edm.Decimal'
+        odata_type = DuckDBBackend._odata_types.get(type_name)
+        if odata_type is None:
+            raise ValueError(f'Unknown data type: {type_name}')
+        return odata_type
+
+    def connect(self):
+        return self._duckdb.connect(self._duckdb_filename, read_only=True)
+
+    def get_table_names(self, connection):
+        query = '''SELECT table_name FROM duckdb_tables() WHERE schema_name = current_schema();'''
+        return [r[0] for r in connection.execute(query).fetchall()]
+
+    def get_table_columns(self, connection, table_name):
+        query = '''SELECT constraint_column_names FROM duckdb_constraints()
+                   WHERE schema_name = current_schema() AND table_name = ? AND constraint_type = 'PRIMARY KEY';'''
+        rows = connection.execute(query, [table_name]).fetchall()
+        key_names = rows[0][0] if rows else []
+        query = '''SELECT * FROM pragma_table_info(?);'''
+        return [(r[0], r[1], r[2], r[3], r[4], key_names.index(r[1]) + 1 if r[1] in key_names else 0)
+                for r in connection.execute(query, [table_name]).fetchall()]
+
+    def get_foreign_keys(self, connection, table_name):
+        query = '''SELECT constraint_index, referenced_table, constraint_column_names, referenced_column_names
+                   FROM duckdb_constraints()
+                   WHERE schema_name = current_schema() AND table_name = ? AND constraint_type = 'FOREIGN KEY'
+                   ORDER BY constraint_index;'''
+        return [(r[0], i, r[1], column_name, r[3][i] if i < len(r[3]) else None)
+                for r in connection.execute(query, [table_name]).fetchall() for i, column_name in enumerate(r[2])]
+
+    def get_table_size_estimate(self, connection, table_name):
+        query = '''SELECT estimated_size FROM duckdb_tables()
+                   WHERE schema_name = current_schema() AND table_name = ?;'''
+        return connection.execute(query, [table_name]).fetchone()[0]
+
+    def __init__(self, duckdb_filename):
+        self._duckdb = _import_driver('duckdb', 'duckdb')
+        self._duckdb_filename = duckdb_filename
+
+    def __str__(self):
+        return f'DuckDB database at {self._duckdb_filename}'
+
+
+class PostgresBackend(Backend):
+    """
+    Backend for PostgreSQL databases, connected to through read-only transactions. Requires the psycopg package.
+    Rows are fetched through named server-side cursors, so they stream from the server as they are consumed.
+    """
+
+    row_id_name = 'ctid'
+
+    filter_functions = {
+        '$eq': {2: '({0} IS NOT DISTINCT FROM {1})'},
+        '$ne': {2: '({0} IS DISTINCT FROM {1})'},
+        'contains': {2: 'strpos({0}, {1}) > 0'},
+        'startswith': {2: 'strpos({0}, {1}) = 1'},
+        'endswith': {2: 'right({0}, length({1})) = {1}'},
+        'indexof': {2: '(strpos({0}, {1}) - 1)'},
+        'year': {1: 'CAST(extract(year FROM {0}) AS INTEGER)'},
+        'month': {1: 'CAST(extract(month FROM {0}) AS INTEGER)'},
+        'day': {1: 'CAST(extract(day FROM {0}) AS INTEGER)'},
+        'hour': {1: 'CAST(extract(hour FROM {0}) AS INTEGER)'},
+        'minute': {1: 'CAST(extract(minute FROM {0}) AS INTEGER)'},
+        'second': {1: 'CAST(floor(extract(second FROM {0})) AS INTEGER)'},
+        'floor': {1: 'floor({0})'},
+        'ceiling': {1: 'ceiling({0})'},
+    }
+
+    _odata_types = {
+        'boolean': 'Edm.Boolean',
+        'smallint': 'Edm.Int16',
+        'integer': 'Edm.Int32',
+        'bigint': 'Edm.Int64',
+        'real': 'Edm.Single',
+        'double precision': 'Edm.Double',
+        'numeric': 'Edm.Decimal',
+        'text': 'Edm.String',
+        'character varying': 'Edm.String',
+        'character': 'Edm.String',
+        'json': 'Edm.String',
+        'jsonb': 'Edm.String',
+        'bytea': 'Edm.Binary',
+        'date': 'Edm.Date',
+        'time without time zone': 'Edm.TimeOfDay',
+        'timestamp without time zone': 'Edm.DateTimeOffset',
+        'timestamp with time zone': 'Edm.DateTimeOffset',
+        'uuid': 'Edm.Guid',
+    }
+
+    @staticmethod
+    def datatype_to_odata(type_name):
+        odata_type = PostgresBackend._odata_types.get(type_name)
+        if odata_type is None:
+            raise ValueError(f'Unknown data type: {type_name}')
+        return odata_type
+
+    def connect(self):
+        connection = self._psycopg.connect(self._postgres_dsn)
+        connection.read_only = True
+        return connection
+
+    def reset(self, connection):
+        # Ends the read-only transaction, closing any server-side cursors that were left open
+        connection.rollback()
+
+    def fetch_all(self, connection, query, parameters=()):
+        with connection.cursor() as cursor:
+            rows = cursor.execute(convert_placeholders(query), parameters).fetchall()
+        # Keeps connections that are held on to from sitting idle in a transaction
+        connection.rollback()
+        return rows
+
+    def open_cursor(self, connection, query, parameters, batch_size):
+        cursor = connection.cursor(name=f'sql_to_odata_{next(_cursor_numbers)}')
+        cursor.itersize = batch_size
+        cursor.execute(convert_placeholders(query), parameters)
+        return cursor
+
+    def get_table_names(self, connection):
+        query = '''SELECT table_name FROM information_schema.tables
+                   WHERE table_schema = current_schema() AND table_type = 'BASE TABLE';'''
+        return [r[0] for r in self.fetch_all(connection, query)]
+
+    def get_table_columns(self, connection, table_name):
+        query = '''SELECT c.ordinal_position - 1, c.column_name, c.data_type, c.is_nullable = 'NO', c.column_default,
+                          coalesce(k.ordinal_position, 0)
+                   FROM information_schema.columns c
+                   LEFT JOIN information_schema.table_constraints t
+                   ON t.table_schema = c.table_schema AND t.table_name = c.table_name
+                   AND t.constraint_type = 'PRIMARY KEY'
+                   LEFT JOIN information_schema.key_column_usage k
+                   ON k.constraint_schema = t.constraint_schema AND k.constraint_name = t.constraint_name
+                   AND k.column_name = c.column_name
+                   WHERE c.table_schema = current_schema() AND c.table_name = ?
+                   ORDER BY c.ordinal_position;'''
+        return self.fetch_all(connection, query, [table_name])
+
+    def get_foreign_keys(self, connection, table_name):
+        query = '''SELECT c.conname, k.position - 1, r.relname, a.attname, ra.attname
+                   FROM pg_constraint c
+                   JOIN pg_class r ON r.oid = c.confrelid
+                   CROSS JOIN LATERAL unnest(c.conkey, c.confkey) WITH ORDINALITY AS k(attnum, confattnum, position)
+                   JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.attnum
+                   JOIN pg_attribute ra ON ra.attrelid = c.confrelid AND ra.attnum = k.confattnum
+                   WHERE c.contype = 'f' AND c.conrelid = to_regclass(quote_ident(?))
+                   ORDER BY c.conname, k.position;'''
+        return self.fetch_all(connection, query, [table_name])
+
+    def get_table_size_estimate(self, connection, table_name):
+        query = '''SELECT reltuples FROM pg_class WHERE oid = to_regclass(quote_ident(?));'''
+        rows = self.fetch_all(connection, query, [table_name])
+        # Tables that have never been analyzed report -1 tuples
+        return max(int(rows[0][0]), 0) if rows else None
+
+    def __init__(self, postgres_dsn):
+        self._psycopg = _import_driver('postgres', 'psycopg')
+        self._postgres_dsn = postgres_dsn
+
+    def __str__(self):
+        return 'PostgreSQL database'
+
+
+def get_sqlite_parameter_limit(connection):
+    """
+    Find the most parameters that a single query may have on a SQLite connection, which depends on how
+    SQLite was built: 999 before version 3.32, and 32766 since.
+
+    :param connection: sqlite3 connection
+    :return: Number of parameters
+    """
+    try:
+        return connection.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
+    except AttributeError:
+        # Limits can only be read from Python 3.11
+        return _sqlite_parameter_limit
+
+
+def _check_integer(name, value):
+    """Ensure a tuning option is an integer."""
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f'Invalid {name}: {value}')
+    return value
+
+
+def _import_driver(backend_name, module_name):
+    """Import the driver package of a backend when the backend is first created, since drivers are slow to import."""
+    try:
+        return importlib.import_module(module_name)
+    except ImportError:
+        raise ValueError(f'Backend {backend_name} requires the {module_name} package') from None
+
+
+def convert_placeholders(query):
+    """
+    Convert a query from question mark placeholders to the format placeholders of psycopg.
+
+    :param query: Query with ? placeholders
+    :return: Query with %s placeholders, where literal percent signs are doubled
+    """
+    def replace(match):
+        text = match.group(0)
+        return '%s' if text == '?' else '%%' if text == '%' else text.replace('%', '%%')
+    return _placeholder_pattern.sub(replace, query)
+
+
+def create_backend(backend='sqlite', **kwargs):
+    """
+    Create the backend for a database from the keyword arguments of ODataInterface.
+
+    :param backend: Name of the backend: "sqlite" (sqlite_filename and the tuning options of SQLiteBackend),
+                    "duckdb" (duckdb_filename) or "postgres" (postgres_dsn), defaults to "sqlite"
+    :return: Backend instance
+    """
+    if backend == 'sqlite':
+        return SQLiteBackend(kwargs['sqlite_filename'], **{k: kwargs[k] for k in SQLiteBackend.options if k in kwargs})
+    elif backend == 'duckdb':
+        return DuckDBBackend(kwargs['duckdb_filename'])
+    elif backend == 'postgres':
+        return PostgresBackend(kwargs['postgres_dsn'])
+    else:
+        raise ValueError(f'Unknown backend: {backend}')
+
+
+class ConnectionPool():
+    """Bounded pool of connections to a database, which are reused once returned rather than closed."""
+
+    @contextlib.contextmanager
+    def connection(self):
+        """
+        Borrow a connection for the duration of a with block, opening a new one if none is idle.
+        Waits for a connection to be returned if the pool is at its maximum size.
+        """
+        if not self._available.acquire(timeout=self._timeout):
+            raise TimeoutError(f'No database connection became available within {self._timeout} seconds')
+        try:
+            with self._lock:
+                connection = self._idle.pop() if self._idle else None
+            if connection is None:
+                connection = self._backend.connect()
+            try:
+                yield connection
+            finally:
+                self._release(connection)
+        finally:
+            self._available.release()
+
+    def _release(self, connection):
+        """Put a connection back into the pool, or close it if it can't be reused."""
+        try:
+            self._backend.reset(connection)
+        except Exception:
+            connection.close()
+            return
+        with self._lock:
+            if not self._closed:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def close(self):
+        """Close all idle connections, and any others as they are returned."""
+        with self._lock:
+            self._closed = True
+            idle_connections, self._idle = self._idle, []
+        for connection in idle_connections:
+            connection.close()
+
+    def __init__(self, backend, max_size, timeout=None):
+        """
+        Construct an instance of the class.
+
+        :param backend: Backend that opens the connections
+        :param max_size: Maximum number of connections that are open at once
+        :param timeout: Optional number of seconds to wait for a connection, defaults to waiting indefinitely
+        """
+        if max_size < 1:
+            raise ValueError(f'Invalid pool size: {max_size}')
+        self._backend = backend
+        self._available = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._timeout = timeout
+        self._closed = False
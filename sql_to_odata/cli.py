@@ -0,0 +1,194 @@
+import argparse
+import fnmatch
+import logging
+import os
+import sys
+import time
+
+import sql_to_odata
+
+
+_log = logging.getLogger(__name__)
+_log.addHandler(logging.NullHandler())
+
+_filename_arguments = {'sqlite': 'sqlite_filename', 'duckdb': 'duckdb_filename'}
+
+
+def add_tuning_arguments(parser):
+    """Add the arguments that tune database connections to a command line parser."""
+    parser.add_argument('--arraysize', type=int, help='rows fetched from a cursor at a time (default: 1000)')
+    parser.add_argument('--mmap-size', type=int, metavar='BYTES',
+                        help='bytes of each SQLite database to memory-map (default: SQLite\'s)')
+    parser.add_argument('--cache-size', type=int,
+                        help='SQLite page cache size, in pages or, if negative, in KiB (default: SQLite\'s)')
+    parser.add_argument('--temp-store', choices=['default', 'file', 'memory'],
+                        help='where SQLite keeps temporary tables (default: SQLite\'s)')
+    parser.add_argument('--immutable', action='store_true',
+                        help='open SQLite databases as snapshots that nothing writes to, without locking')
+
+
+def get_tuning_options(parsed_args):
+    """
+    Collect the values of the arguments added by add_tuning_arguments.
+
+    :return: Dictionary of the keyword arguments of ODataInterface that were given
+    """
+    tuning_options = {
+        'arraysize': parsed_args.arraysize,
+        'mmap_size': parsed_args.mmap_size,
+        'cache_size': parsed_args.cache_size,
+        'temp_store': parsed_args.temp_store,
+        'immutable': parsed_args.immutable,
+    }
+    return {k: v for k, v in tuning_options.items() if v not in (None, False)}
+
+
+def select_tables(table_names, include_patterns=None, exclude_patterns=None):
+    """
+    Select the tables whose names match any of the include patterns and none of the exclude patterns.
+
+    :param table_names: List of table names
+    :param include_patterns: Optional list of glob patterns (e.g. "sales_*"), defaults to including all tables
+    :param exclude_patterns: Optional list of glob patterns, defaults to excluding no tables
+    :return: List of the selected table names in their original order
+    """
+    return [t for t in table_names
+            if (not include_patterns or any(fnmatch.fnmatchcase(t, p) for p in include_patterns))
+            and not any(fnmatch.fnmatchcase(t, p) for p in exclude_patterns or [])]
+
+
+def _parse_aggregation(text):
+    """
+    Parse the value of an --aggregation argument, in the form NAME=TABLE:APPLY.
+
+    :return: Tuple of (entity set name, (table name, $apply expression))
+    """
+    name, separator, definition = text.partition('=')
+    table_name, colon, expression = definition.partition(':')
+    if not (separator and colon and name and table_name and expression):
+        raise argparse.ArgumentTypeError(f'Invalid aggregation: {text}')
+    return name, (table_name, expression)
+
+
+def _get_output_folders(database_filenames, output_folder):
+    """
+    Name the output folder of each database: the output folder itself for a single database, otherwise
+    a folder within it named after the database file without its extension (e.g. "output/stuff").
+
+    :return: List of folder names in the same order as the databases
+    """
+    if len(database_filenames) == 1:
+        return [output_folder]
+    folder_names = [os.path.splitext(os.path.basename(f))[0] for f in database_filenames]
+    duplicate_names = sorted({n for n in folder_names if folder_names.count(n) > 1})
+    if duplicate_names:
+        raise ValueError(f'Databases would share output folders: {", ".join(duplicate_names)}')
+    return [os.path.join(output_folder, n) for n in folder_names]
+
+
+def export_database(database_filename, output_folder, backend='sqlite', include_patterns=None, exclude_patterns=None,
+                    progress=False, interface_options=None, **dump_options):
+    """
+    Dump a single database file to a folder, as the command line does for each of its databases.
+
+    :param database_filename: Location of the database
+    :param output_folder: Location to store output files
+    :param backend: Name of the database backend, "sqlite" or "duckdb", defaults to "sqlite"
+    :param include_patterns: Optional list of glob patterns of tables to include, defaults to all tables
+    :param exclude_patterns: Optional list of glob patterns of tables to exclude, defaults to none
+    :param progress: Report each table on standard error as it is written, defaults to false
+    :param interface_options: Optional dictionary of other arguments passed on to ODataInterface, such as
+                              the tuning options of SQLite connections
+    :param dump_options: Other arguments passed on to ODataInterface.dump_database
+    :return: Number of tables dumped
+    """
+    start = time.perf_counter()
+    odata_interface = sql_to_odata.ODataInterface(backend=backend, **{_filename_arguments[backend]: database_filename},
+                                                  **interface_options or {})
+    try:
+        table_names = select_tables(odata_interface.get_table_names(), include_patterns, exclude_patterns)
+
+        def report_progress(table_name, tables_written, table_count):
+            elapsed = time.perf_counter() - start
+            print(f'{database_filename}: [{tables_written}/{table_count}] {table_name} ({elapsed:.1f}s)',
+                  file=sys.stderr)
+        odata_interface.dump_database(output_folder, tables_to_include=table_names,
+                                      progress=report_progress if progress else None, **dump_options)
+    finally:
+        odata_interface.close()
+    _log.debug('Dumped %s tables of %s in %.3f seconds', len(table_names), database_filename,
+               time.perf_counter() - start)
+    return len(table_names)
+
+
+def main(args=None):
+    """Export databases from the command line, returning the exit status."""
+    parser = argparse.ArgumentParser(prog='sql-to-odata',
+                                     description='Dump databases to static files that form an OData API.')
+    parser.add_argument('databases', nargs='+', help='database files to dump')
+    parser.add_argument('-o', '--output', required=True,
+                        help='folder to store output files in; with several databases, each gets a folder within it '
+                             'named after the database file')
+    parser.add_argument('--backend', choices=sorted(_filename_arguments), default='sqlite',
+                        help='type of the database files (default: %(default)s)')
+    parser.add_argument('--include', action='append', metavar='GLOB',
+                        help='only dump tables matching this pattern, may be repeated (default: all tables)')
+    parser.add_argument('--exclude', action='append', metavar='GLOB',
+                        help='skip tables matching this pattern, may be repeated')
+    parser.add_argument('--workers', type=int, help='worker processes exporting tables in parallel (default: none)')
+    parser.add_argument('--batch-size', type=int, help='rows fetched and written per chunk (default: 1000)')
+    parser.add_argument('--page-size', type=int, help='maximum rows per table file (default: one file per table)')
+    parser.add_argument('--compression', action='append', choices=['gzip', 'zstd'],
+                        help='also write precompressed sidecar files in this format, may be repeated')
+    parser.add_argument('--compression-level', type=int, help='compression level of the sidecar files')
+    parser.add_argument('--columnar-format', choices=['arrow', 'parquet'],
+                        help='also write each table in this columnar format (requires pyarrow)')
+    parser.add_argument('--snapshot', action='store_true',
+                        help='export each database as it was when its dump started, while it is being written to')
+    parser.add_argument('--media-threshold', type=int, metavar='BYTES',
+                        help='write binary values larger than this to separate media files (default: inline all)')
+    parser.add_argument('--aggregation', action='append', type=_parse_aggregation, metavar='NAME=TABLE:APPLY',
+                        help='also write an entity set of the rows of a table aggregated by an OData $apply '
+                             'expression, e.g. "by_country=invoices:groupby((BillingCountry))", may be repeated')
+    parser.add_argument('--formatted', action='store_true', help='indent the JSON output')
+    parser.add_argument('--incremental', action='store_true', help='only rewrite the files of changed tables')
+    parser.add_argument('--delta', action='store_true', help='track changes between dumps in delta files')
+    parser.add_argument('--strict-types', action='store_true',
+                        help='write values in the exact form of their OData type, and keys and facets in $metadata')
+    parser.add_argument('--navigation-properties', action='store_true',
+                        help='describe the foreign keys of each database as navigation properties in $metadata')
+    add_tuning_arguments(parser)
+    parser.add_argument('--progress', action='store_true', help='report each table on standard error as it is written')
+    parser.add_argument('--verbose', action='store_true', help='log debug messages on standard error')
+    parser.add_argument('--version', action='version', version=f'%(prog)s {sql_to_odata.__version__}')
+    parsed_args = parser.parse_args(args)
+    if parsed_args.verbose:
+        logging.basicConfig(level=logging.DEBUG)
+    try:
+        output_folders = _get_output_folders(parsed_args.databases, parsed_args.output)
+    except ValueError as error:
+        parser.error(str(error))
+    exit_status = 0
+    for database_filename, output_folder in zip(parsed_args.databases, output_folders):
+        try:
+            export_database(database_filename, output_folder, parsed_args.backend, parsed_args.include,
+                            parsed_args.exclude, parsed_args.progress,
+                            {'strict_types': parsed_args.strict_types,
+                             'navigation_properties': parsed_args.navigation_properties,
+                             **get_tuning_options(parsed_args)},
+                            formatted=parsed_args.formatted,
+                            batch_size=parsed_args.batch_size, workers=parsed_args.workers,
+                            incremental=parsed_args.incremental, page_size=parsed_args.page_size,
+                            compression=parsed_args.compression, compression_level=parsed_args.compression_level,
+                            columnar_format=parsed_args.columnar_format, delta=parsed_args.delta,
+                            media_threshold=parsed_args.media_threshold, snapshot=parsed_args.snapshot,
+                            aggregations=dict(parsed_args.aggregation or []))
+        except Exception as error:
+            # Remaining databases are still dumped, so one bad file doesn't hold up the others
+            print(f'{parser.prog}: error: {database_filename}: {error}', file=sys.stderr)
+            exit_status = 1
+    return exit_status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
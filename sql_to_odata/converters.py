@@ -0,0 +1,174 @@
+import base64
+import datetime
+import decimal
+import re
+
+
+# Date and time text as SQLite's date and time functions write it, which has no time zone
+_date_time_pattern = re.compile(r'\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?')
+
+# Constant default values: a quoted string, optionally cast as PostgreSQL reports them, or a number or boolean
+_default_value_pattern = re.compile(r"'((?:[^']|'')*)'(?:::[\w ]+)?|([-+]?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?|true|false)",
+                                    re.IGNORECASE)
+
+
+class JSONNumber():
+    """Number written into JSON exactly as given, where converting it to a float would lose digits."""
+
+    __slots__ = ('_text',)
+
+    def __json__(self):
+        return self._text
+
+    def __eq__(self, other):
+        return isinstance(other, JSONNumber) and other._text == self._text
+
+    def __hash__(self):
+        return hash(self._text)
+
+    def __repr__(self):
+        return f'JSONNumber({self._text!r})'
+
+    def __init__(self, text):
+        """
+        Construct an instance of the class.
+
+        :param text: Number in JSON syntax
+        """
+        self._text = text
+
+
+def convert_date_time_offset(value):
+    """
+    Convert a date and time to ISO 8601 text with a time zone, taking values without one to be in UTC.
+
+    :param value: Text, datetime or date from the database
+    :return: Text such as "2009-01-01T00:00:00Z", or the value unchanged if it isn't a date and time
+    """
+    if isinstance(value, str):
+        if _date_time_pattern.fullmatch(value):
+            if len(value) == 10:
+                return f'{value}T00:00:00Z'
+            return f'{value[:10]}T{value[11:]}:00Z' if len(value) == 16 else f'{value[:10]}T{value[11:]}Z'
+        try:
+            value = datetime.datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+        except ValueError:
+            return value
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        text = value.isoformat()
+        return f'{text[:-6]}Z' if text.endswith('+00:00') else text
+    if isinstance(value, datetime.date):
+        return f'{value.isoformat()}T00:00:00Z'
+    return value
+
+
+def convert_date(value):
+    """
+    Convert a date to ISO 8601 text.
+
+    :param value: Text, date or datetime from the database
+    :return: Text such as "2009-01-01", or the value unchanged if it isn't a date
+    """
+    if isinstance(value, str):
+        return value[:10] if _date_time_pattern.fullmatch(value) else value
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+
+def convert_time_of_day(value):
+    """
+    Convert a time of day to ISO 8601 text.
+
+    :param value: Text or time from the database
+    :return: Text such as "12:30:00", or the value unchanged if it isn't a time
+    """
+    if isinstance(value, datetime.time):
+        return value.replace(tzinfo=None).isoformat()
+    return value
+
+
+def convert_decimal(value):
+    """
+    Convert an exact decimal to a number that keeps all of its digits in JSON.
+
+    :param value: Decimal, float or integer from the database
+    :return: JSONNumber for decimals, "NaN", "INF" or "-INF" for values JSON has no number for,
+             or the value unchanged otherwise
+    """
+    if isinstance(value, decimal.Decimal):
+        if not value.is_finite():
+            return 'NaN' if value.is_nan() else ('-INF' if value.is_signed() else 'INF')
+        return JSONNumber(str(value))
+    return value
+
+
+def convert_boolean(value):
+    """
+    Convert a boolean stored as a number, as SQLite does, to true or false.
+
+    :param value: Number or boolean from the database
+    :return: Boolean, or the value unchanged if it isn't a number
+    """
+    if isinstance(value, int):
+        return value != 0
+    return value
+
+
+def convert_binary(value):
+    """
+    Convert a binary value to base64url text.
+
+    :param value: Bytes, bytearray or memoryview from the database
+    :return: Encoded text, or the value unchanged if it isn't binary
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.urlsafe_b64encode(value).decode()
+    return value
+
+
+# Converters by OData type; values of the other types are written as the database returns them
+converters = {
+    'Edm.DateTimeOffset': convert_date_time_offset,
+    'Edm.Date': convert_date,
+    'Edm.TimeOfDay': convert_time_of_day,
+    'Edm.Decimal': convert_decimal,
+    'Edm.Boolean': convert_boolean,
+    'Edm.Binary': convert_binary,
+}
+
+
+def get_converters(odata_types):
+    """
+    Pick the converter of each of a list of fields.
+
+    :param odata_types: List of the OData types of the fields
+    :return: Tuple of a converter function or None for each field, or None if no field needs converting
+    """
+    field_converters = tuple(converters.get(t) for t in odata_types)
+    return field_converters if any(field_converters) else None
+
+
+def get_default_value(default_expression, odata_type=None):
+    """
+    Convert the default value of a column, as the database reports it, to the DefaultValue of an OData property.
+
+    :param default_expression: SQL expression of the default value, or None
+    :param odata_type: Optional OData type of the column, which turns the 0 and 1 of booleans into false and true
+    :return: Default value as text, or None if there is none or it isn't a constant (e.g. CURRENT_TIMESTAMP)
+    """
+    if default_expression is None:
+        return None
+    match = _default_value_pattern.fullmatch(str(default_expression).strip())
+    if match is None:
+        return None
+    if match.group(1) is not None:
+        return match.group(1).replace("''", "'")
+    default_value = match.group(2).lower()
+    if odata_type == 'Edm.Boolean' and default_value in ('0', '1'):
+        return 'true' if default_value == '1' else 'false'
+    return default_value
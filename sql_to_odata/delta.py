@@ -0,0 +1,129 @@
+import os
+import sqlite3
+
+from sql_to_odata.backends import get_sqlite_parameter_limit
+
+
+# Seconds to wait for other processes writing to the same state file, such as parallel dump workers
+_state_timeout = 60
+
+
+class DeltaState():
+    """
+    Store of table snapshots that delta tokens refer to, kept in a SQLite file. A snapshot holds the key
+    and a hash of the other values of every row, so later changes can be found by comparing hashes.
+    """
+
+    def get_latest_token(self, table_name):
+        """
+        Find the token of the most recent complete snapshot of a table.
+
+        :return: Delta token, or None if the table has no snapshot
+        """
+        query = '''SELECT token FROM snapshots WHERE table_name = ? AND complete ORDER BY id DESC LIMIT 1;'''
+        row = self._connection.execute(query, [table_name]).fetchone()
+        return None if row is None else row[0]
+
+    def get_snapshot_id(self, table_name, token):
+        """
+        Look up the complete snapshot of a table that a delta token refers to.
+
+        :return: Snapshot ID
+        """
+        query = '''SELECT id FROM snapshots WHERE table_name = ? AND token = ? AND complete;'''
+        row = self._connection.execute(query, [table_name, token]).fetchone()
+        if row is None:
+            raise ValueError(f'Invalid delta token: {token}')
+        return row[0]
+
+    def create_snapshot(self, table_name):
+        """
+        Start a new snapshot of a table, which delta tokens can only refer to once it is completed.
+
+        :return: Snapshot ID
+        """
+        with self._connection:
+            query = '''INSERT INTO snapshots (table_name, token, complete) VALUES (?, ?, 0);'''
+            return self._connection.execute(query, [table_name, os.urandom(8).hex()]).lastrowid
+
+    def add_rows(self, snapshot_id, keys, hashes):
+        """Add the keys and hashes of a batch of rows to an incomplete snapshot."""
+        with self._connection:
+            query = '''INSERT INTO snapshot_rows (snapshot_id, key, hash) VALUES (?, ?, ?);'''
+            self._connection.executemany(query, [(snapshot_id, k, h) for k, h in zip(keys, hashes)])
+
+    def get_hashes(self, snapshot_id, keys):
+        """
+        Fetch the hashes that a snapshot holds for a batch of keys.
+
+        :return: Dictionary of hashes by key, leaving out keys that are not in the snapshot
+        """
+        hashes = {}
+        # One parameter of each query is taken by the snapshot ID
+        keys_per_query = get_sqlite_parameter_limit(self._connection) - 1
+        for i in range(0, len(keys), keys_per_query):
+            chunk = list(keys[i:i + keys_per_query])
+            placeholders = ', '.join('?' * len(chunk))
+            query = f'''SELECT key, hash FROM snapshot_rows
+                        WHERE snapshot_id = ? AND key IN ({placeholders});'''  # nosec - placeholders only
+            hashes.update(self._connection.execute(query, [snapshot_id] + chunk))
+        return hashes
+
+    def iter_removed_keys(self, previous_snapshot_id, snapshot_id, batch_size):
+        """
+        Find the keys of rows that are in a previous snapshot but not in a later one.
+
+        :return: Generator of lists of keys
+        """
+        query = '''SELECT key FROM snapshot_rows WHERE snapshot_id = ?
+                   EXCEPT SELECT key FROM snapshot_rows WHERE snapshot_id = ?;'''
+        cursor = self._connection.execute(query, [previous_snapshot_id, snapshot_id])
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [r[0] for r in rows]
+
+    def complete_snapshot(self, snapshot_id, snapshots_to_keep):
+        """
+        Complete a snapshot so delta tokens can refer to it, and delete the oldest snapshots of its table.
+
+        :param snapshots_to_keep: Number of the table's most recent complete snapshots that are kept
+        :return: Delta token of the snapshot
+        """
+        with self._connection:
+            self._connection.execute('''UPDATE snapshots SET complete = 1 WHERE id = ?;''', [snapshot_id])
+            table_name, token = self._connection.execute('''SELECT table_name, token FROM snapshots WHERE id = ?;''',
+                                                         [snapshot_id]).fetchone()
+            query = '''SELECT id FROM snapshots WHERE table_name = ? AND complete ORDER BY id DESC LIMIT -1 OFFSET ?;'''
+            for old_snapshot_id, in self._connection.execute(query, [table_name, snapshots_to_keep]).fetchall():
+                self._delete_snapshot(old_snapshot_id)
+        return token
+
+    def _delete_snapshot(self, snapshot_id):
+        self._connection.execute('''DELETE FROM snapshot_rows WHERE snapshot_id = ?;''', [snapshot_id])
+        self._connection.execute('''DELETE FROM snapshots WHERE id = ?;''', [snapshot_id])
+
+    def delete_snapshot(self, snapshot_id):
+        """Delete a snapshot, such as an incomplete one that was abandoned."""
+        with self._connection:
+            self._delete_snapshot(snapshot_id)
+
+    def close(self):
+        """Close the state file."""
+        self._connection.close()
+
+    def __init__(self, state_filename):
+        """
+        Construct an instance of the class.
+
+        :param state_filename: Location of the SQLite file holding the snapshots, created if it doesn't exist
+        """
+        self._connection = sqlite3.connect(state_filename, timeout=_state_timeout)
+        with self._connection:
+            self._connection.execute('''PRAGMA journal_mode = WAL;''')
+            self._connection.execute('''CREATE TABLE IF NOT EXISTS snapshots (id INTEGER PRIMARY KEY,
+                                        table_name TEXT NOT NULL, token TEXT NOT NULL, complete INTEGER NOT NULL);''')
+            self._connection.execute('''CREATE TABLE IF NOT EXISTS snapshot_rows (snapshot_id INTEGER NOT NULL,
+                                        key TEXT NOT NULL, hash BLOB NOT NULL, PRIMARY KEY (snapshot_id, key))
+                                        WITHOUT ROWID;''')
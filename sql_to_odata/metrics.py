@@ -0,0 +1,228 @@
+import contextlib
+import itertools
+import os
+import threading
+import time
+
+
+# Only one call is profiled at a time, since a profiler covers nested calls and newer Pythons allow just one
+_profile_lock = threading.Lock()
+
+_profile_numbers = itertools.count(1)
+
+_active_profiler = None
+
+
+class MetricsSink():
+    """
+    Receiver of the measurements taken by an ODataInterface, which discards them. Subclasses override
+    add_timing and add_count to keep them, and may override span to also wrap calls in tracing spans.
+
+    Timings are named after the phase or call they measure: "call" (every public method, labelled with
+    the method), "dump_table", "query" (executing queries and fetching rows), "conversion" (turning rows into
+    dictionaries or Arrow arrays), "serialization" (encoding JSON) and "write" (writing output files).
+    Counts are "rows" and "bytes" (of JSON produced) per table, and "cache_hits" and "cache_misses" per cache.
+    """
+
+    def add_timing(self, name, seconds, labels):
+        """
+        Record the duration of one occurrence of a timed phase or call.
+
+        :param name: Name of the timing
+        :param seconds: Duration in seconds
+        :param labels: Dictionary of label names and values, such as the table
+        """
+
+    def add_count(self, name, value, labels):
+        """
+        Add to a count.
+
+        :param name: Name of the count
+        :param value: Amount added to the count
+        :param labels: Dictionary of label names and values, such as the table
+        """
+
+    @contextlib.contextmanager
+    def span(self, name, labels):
+        """
+        Time a block of code, recording its duration as a timing.
+
+        :param name: Name of the timing
+        :param labels: Dictionary of label names and values, such as the method
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_timing(name, time.perf_counter() - start, labels)
+
+
+class MetricsRecorder(MetricsSink):
+    """Sink that totals measurements in memory and exports them in the Prometheus text format."""
+
+    def add_timing(self, name, seconds, labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            count, total = self._timings.get(key, (0, 0.0))
+            self._timings[key] = (count + 1, total + seconds)
+
+    def add_count(self, name, value, labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + value
+
+    def get_timings(self):
+        """
+        Fetch the totals of the timings recorded so far.
+
+        :return: Dictionary of (name, labels) keys, where labels is a sorted tuple of (name, value) pairs,
+                 and (number of occurrences, total seconds) values
+        """
+        with self._lock:
+            return dict(self._timings)
+
+    def get_counts(self):
+        """
+        Fetch the counts recorded so far.
+
+        :return: Dictionary of (name, labels) keys, where labels is a sorted tuple of (name, value) pairs,
+                 and count values
+        """
+        with self._lock:
+            return dict(self._counts)
+
+    def get_prometheus_text(self, prefix='sql_to_odata'):
+        """
+        Export the measurements in the Prometheus text exposition format, with counts as counters
+        ("<prefix>_rows_total") and timings as summaries ("<prefix>_query_seconds_count" and "_sum").
+
+        :param prefix: Prefix of the metric names, defaults to "sql_to_odata"
+        :return: Prometheus metrics as a string
+        """
+        lines = []
+        counts = self.get_counts()
+        for name in sorted({n for n, _ in counts}):
+            lines.append(f'# TYPE {prefix}_{name}_total counter')
+            for (_, labels), value in sorted(i for i in counts.items() if i[0][0] == name):
+                lines.append(f'{prefix}_{name}_total{_format_labels(labels)} {value}')
+        timings = self.get_timings()
+        for name in sorted({n for n, _ in timings}):
+            lines.append(f'# TYPE {prefix}_{name}_seconds summary')
+            for (_, labels), (count, total) in sorted(i for i in timings.items() if i[0][0] == name):
+                lines.append(f'{prefix}_{name}_seconds_count{_format_labels(labels)} {count}')
+                lines.append(f'{prefix}_{name}_seconds_sum{_format_labels(labels)} {total!r}')
+        return ''.join(f'{line}\n' for line in lines)
+
+    def clear(self):
+        """Discard all measurements recorded so far."""
+        with self._lock:
+            self._timings = {}
+            self._counts = {}
+
+    def __init__(self):
+        """Construct an instance of the class."""
+        self._lock = threading.Lock()
+        self.clear()
+
+
+class MetricsBuffer(MetricsSink):
+    """Sink that keeps every measurement in order, so they can be passed on to another sink later."""
+
+    def add_timing(self, name, seconds, labels):
+        self.records.append(('timing', name, seconds, labels))
+
+    def add_count(self, name, value, labels):
+        self.records.append(('count', name, value, labels))
+
+    def pop_records(self):
+        """
+        Take the measurements buffered so far, emptying the buffer.
+
+        :return: List of (kind, name, value, labels) tuples, where kind is "timing" or "count"
+        """
+        records = self.records
+        self.records = []
+        return records
+
+    def __init__(self):
+        """Construct an instance of the class."""
+        self.records = []
+
+
+class Profile():
+    """
+    cProfile capture of a single call, which is saved to a file in the profile folder once finished.
+    Generators enter the capture each time they are resumed, so the consumer's own code isn't included.
+    A call made while another is being profiled, such as a nested call, captures nothing of its own.
+    """
+
+    def save(self):
+        """Write the captured statistics to a file that the pstats module and profile viewers can read."""
+        if self._profiler is not None:
+            os.makedirs(self._profile_folder, exist_ok=True)
+            self._profiler.dump_stats(os.path.join(self._profile_folder, self._filename))
+
+    def __enter__(self):
+        global _active_profiler
+        self._is_enabled = self._profiler is not None and _profile_lock.acquire(blocking=False)
+        if self._is_enabled:
+            _active_profiler = self._profiler
+            self._profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        global _active_profiler
+        if self._is_enabled:
+            self._profiler.disable()
+            _active_profiler = None
+            _profile_lock.release()
+
+    def __init__(self, profile_folder, name):
+        """
+        Construct an instance of the class.
+
+        :param profile_folder: Folder that receives the statistics file, or None to capture nothing
+        :param name: Name of the call, which begins the statistics file name (e.g. "dump_database.1234.1.prof")
+        """
+        self._profile_folder = profile_folder
+        self._profiler = None
+        self._is_enabled = False
+        if profile_folder is not None and not _profile_lock.locked():
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._filename = f'{name}.{os.getpid()}.{next(_profile_numbers)}.prof'
+
+
+def _reset_profiling():
+    """Stop a forked process, such as a dump worker, from continuing the profile of the call that forked it."""
+    global _profile_lock, _active_profiler
+    if _active_profiler is not None:
+        _active_profiler.disable()
+        _active_profiler = None
+    _profile_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_profiling)
+
+
+def replay(records, sink):
+    """
+    Pass measurements taken from a MetricsBuffer on to a sink, such as those of a dump worker process.
+
+    :param records: List of records returned by MetricsBuffer.pop_records
+    :param sink: MetricsSink that receives the measurements
+    """
+    for kind, name, value, labels in records:
+        if kind == 'timing':
+            sink.add_timing(name, value, labels)
+        else:
+            sink.add_count(name, value, labels)
+
+
+def _format_labels(labels):
+    """Format label pairs the way the Prometheus text format expects them, e.g. {table="people"}."""
+    if not labels:
+        return ''
+    escaped_labels = ((n, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for n, v in labels)
+    return '{' + ','.join(f'{n}="{v}"' for n, v in escaped_labels) + '}'
@@ -0,0 +1,564 @@
+import datetime
+import re
+
+
+_token_pattern = re.compile(r'''
+    \s*(?:
+        (?P<string>'(?:[^']|'')*')
+      | (?P<datetime>\d{4}-\d{2}-\d{2}T\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:\d{2}))
+      | (?P<date>\d{4}-\d{2}-\d{2})
+      | (?P<number>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+      | (?P<symbol>[(),-])
+    )\s*''', re.VERBOSE)
+
+_comparison_operators = {'eq': '=', 'ne': '!=', 'gt': '>', 'ge': '>=', 'lt': '<', 'le': '<='}
+
+_additive_operators = {'add': '+', 'sub': '-'}
+
+_multiplicative_operators = {'mul': '*', 'div': '/', 'mod': '%'}
+
+# Each function maps its arity to a SQLite template, where {0}, {1}, ... are replaced by the compiled arguments.
+# The names starting with $ are the comparisons with OData null semantics, which no $filter function call can reach
+_functions = {
+    '$eq': {2: '({0} IS {1})'},
+    '$ne': {2: '({0} IS NOT {1})'},
+    'contains': {2: 'instr({0}, {1}) > 0'},
+    'startswith': {2: 'instr({0}, {1}) = 1'},
+    'endswith': {2: '(length({1}) = 0 OR substr({0}, -length({1})) = {1})'},
+    'indexof': {2: '(instr({0}, {1}) - 1)'},
+    'length': {1: 'length({0})'},
+    'substring': {2: 'substr({0}, {1} + 1)', 3: 'substr({0}, {1} + 1, {2})'},
+    'tolower': {1: 'lower({0})'},
+    'toupper': {1: 'upper({0})'},
+    'trim': {1: 'trim({0})'},
+    'concat': {2: '({0} || {1})'},
+    'year': {1: "CAST(strftime('%Y', {0}) AS INTEGER)"},
+    'month': {1: "CAST(strftime('%m', {0}) AS INTEGER)"},
+    'day': {1: "CAST(strftime('%d', {0}) AS INTEGER)"},
+    'hour': {1: "CAST(strftime('%H', {0}) AS INTEGER)"},
+    'minute': {1: "CAST(strftime('%M', {0}) AS INTEGER)"},
+    'second': {1: "CAST(strftime('%S', {0}) AS INTEGER)"},
+    'round': {1: 'round({0})'},
+    'floor': {1: '(CAST({0} AS INTEGER) - ({0} < CAST({0} AS INTEGER)))'},
+    'ceiling': {1: '(CAST({0} AS INTEGER) + ({0} > CAST({0} AS INTEGER)))'},
+}
+
+# Each aggregation method of $apply maps to a SQL template, where {0} is replaced by the compiled expression
+_aggregation_methods = {
+    'sum': 'sum({0})',
+    'min': 'min({0})',
+    'max': 'max({0})',
+    'average': 'avg({0})',
+    'countdistinct': 'count(DISTINCT {0})',
+}
+
+_integer_types = {'Edm.Byte', 'Edm.SByte', 'Edm.Int16', 'Edm.Int32', 'Edm.Int64'}
+
+_transformation_pattern = re.compile(r'\s*([A-Za-z]+)\((.*)\)\s*', re.DOTALL)
+
+_aggregate_pattern = re.compile(r'\s*(.+)\s+with\s+([A-Za-z]+)\s+as\s+([A-Za-z_][A-Za-z0-9_]*)\s*', re.DOTALL)
+
+_count_aggregate_pattern = re.compile(r'\s*\$count\s+as\s+([A-Za-z_][A-Za-z0-9_]*)\s*')
+
+_expand_item_pattern = re.compile(r'\s*([^()\s]+)\s*(?:\((.*)\))?\s*', re.DOTALL)
+
+# System query options that may be nested within an item of $expand, which apply to the related rows
+_expand_options = ('$select', '$filter', '$orderby', '$expand')
+
+
+def quote_identifier(name):
+    """
+    Quote a table or column name for use in a query.
+
+    :param name: Name to be quoted
+    :return: Name in double quotes, with any embedded double quotes escaped
+    """
+    escaped_name = name.replace('"', '""')
+    return f'"{escaped_name}"'
+
+
+def _tokenize(expression):
+    """
+    Split an OData expression into tokens.
+
+    :param expression: OData expression
+    :return: List of (kind, text) tuples
+    """
+    tokens = []
+    position = 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = _token_pattern.match(expression, position)
+        if match is None:
+            raise ValueError(f'Invalid expression at position {position}: {expression}')
+        tokens.append((match.lastgroup, match.group(match.lastgroup)))
+        position = match.end()
+    return tokens
+
+
+def _apply_template(template, arguments):
+    """
+    Fill a SQL template with compiled arguments, keeping parameters in the order their placeholders appear.
+
+    :param template: SQL template with {0}, {1}, ... placeholders
+    :param arguments: List of (sql, parameters) tuples
+    :return: Tuple of (sql, parameters)
+    """
+    parameters = []
+
+    def replace(match):
+        argument_sql, argument_parameters = arguments[int(match.group(1))]
+        parameters.extend(argument_parameters)
+        return argument_sql
+    return re.sub(r'\{(\d+)\}', replace, template), parameters
+
+
+def _datetime_literal_to_sqlite(text):
+    """Convert a DateTimeOffset literal to the UTC 'YYYY-MM-DD HH:MM:SS' text form that SQLite date functions use."""
+    value = datetime.datetime.fromisoformat(text.replace('Z', '+00:00')).astimezone(datetime.timezone.utc)
+    return value.replace(tzinfo=None).isoformat(sep=' ')
+
+
+class _FilterParser():
+    """Recursive descent parser that compiles an OData $filter expression into a SQLite condition."""
+
+    def _peek(self, offset=0):
+        index = self._index + offset
+        return self._tokens[index] if index < len(self._tokens) else (None, None)
+
+    def _next(self):
+        token = self._peek()
+        if token[0] is None:
+            raise ValueError(f'Unexpected end of expression: {self._expression}')
+        self._index += 1
+        return token
+
+    def _expect(self, text):
+        kind, token_text = self._next()
+        if token_text != text:
+            raise ValueError(f'Expected "{text}" but found "{token_text}": {self._expression}')
+
+    def _peek_keyword(self, keywords):
+        kind, text = self._peek()
+        return text if kind == 'name' and text in keywords else None
+
+    def parse(self):
+        sql, parameters = self._parse_or()
+        if self._peek()[0] is not None:
+            raise ValueError(f'Unexpected "{self._peek()[1]}": {self._expression}')
+        return sql, parameters
+
+    def _parse_or(self):
+        sql, parameters = self._parse_and()
+        while self._peek_keyword({'or'}):
+            self._next()
+            right_sql, right_parameters = self._parse_and()
+            sql, parameters = f'({sql} OR {right_sql})', parameters + right_parameters
+        return sql, parameters
+
+    def _parse_and(self):
+        sql, parameters = self._parse_not()
+        while self._peek_keyword({'and'}):
+            self._next()
+            right_sql, right_parameters = self._parse_not()
+            sql, parameters = f'({sql} AND {right_sql})', parameters + right_parameters
+        return sql, parameters
+
+    def _parse_not(self):
+        if self._peek_keyword({'not'}):
+            self._next()
+            sql, parameters = self._parse_not()
+            return f'(NOT {sql})', parameters
+        return self._parse_comparison()
+
+    def _parse_comparison(self):
+        sql, parameters = self._parse_additive()
+        operator = self._peek_keyword(_comparison_operators.keys() | {'in'})
+        if operator is None:
+            return sql, parameters
+        self._next()
+        if operator == 'in':
+            self._expect('(')
+            items = [self._parse_additive()]
+            while self._peek()[1] == ',':
+                self._next()
+                items.append(self._parse_additive())
+            self._expect(')')
+            item_sql = ', '.join(i[0] for i in items)
+            return f'({sql} IN ({item_sql}))', parameters + [p for i in items for p in i[1]]
+        right_sql, right_parameters = self._parse_additive()
+        if operator in ('eq', 'ne'):
+            # Equality follows OData semantics, where null eq null is true and null ne any other value
+            template = self._functions[f'${operator}'][2]
+            return _apply_template(template, [(sql, parameters), (right_sql, right_parameters)])
+        sql_operator = _comparison_operators[operator]
+        return f'({sql} {sql_operator} {right_sql})', parameters + right_parameters
+
+    def _parse_additive(self):
+        sql, parameters = self._parse_multiplicative()
+        while True:
+            operator = self._peek_keyword(_additive_operators.keys())
+            if operator is None:
+                return sql, parameters
+            self._next()
+            right_sql, right_parameters = self._parse_multiplicative()
+            sql_operator = _additive_operators[operator]
+            sql, parameters = f'({sql} {sql_operator} {right_sql})', parameters + right_parameters
+
+    def _parse_multiplicative(self):
+        sql, parameters = self._parse_unary()
+        while True:
+            operator = self._peek_keyword(_multiplicative_operators.keys())
+            if operator is None:
+                return sql, parameters
+            self._next()
+            right_sql, right_parameters = self._parse_unary()
+            sql_operator = _multiplicative_operators[operator]
+            sql, parameters = f'({sql} {sql_operator} {right_sql})', parameters + right_parameters
+
+    def _parse_unary(self):
+        if self._peek()[1] == '-':
+            self._next()
+            sql, parameters = self._parse_unary()
+            return f'(-{sql})', parameters
+        return self._parse_primary()
+
+    def _parse_primary(self):
+        kind, text = self._next()
+        if kind == 'string':
+            return '?', [text[1:-1].replace("''", "'")]
+        elif kind == 'number':
+            return '?', [float(text) if any(c in text for c in '.eE') else int(text)]
+        elif kind == 'date':
+            return '?', [text]
+        elif kind == 'datetime':
+            return '?', [_datetime_literal_to_sqlite(text)]
+        elif text == '(':
+            sql, parameters = self._parse_or()
+            self._expect(')')
+            return sql, parameters
+        elif kind != 'name':
+            raise ValueError(f'Unexpected "{text}": {self._expression}')
+        elif text == 'null':
+            return 'NULL', []
+        elif text in ('true', 'false'):
+            return '?', [text == 'true']
+        elif self._peek()[1] == '(':
+            return self._parse_function(text)
+        elif text in self._field_names:
+            return quote_identifier(text), []
+        else:
+            raise ValueError(f'Unknown property: {text}')
+
+    def _parse_function(self, function_name):
+        if function_name not in self._functions:
+            raise ValueError(f'Unsupported function: {function_name}')
+        self._expect('(')
+        arguments = [self._parse_or()]
+        while self._peek()[1] == ',':
+            self._next()
+            arguments.append(self._parse_or())
+        self._expect(')')
+        template = self._functions[function_name].get(len(arguments))
+        if template is None:
+            raise ValueError(f'Wrong number of arguments for function: {function_name}')
+        return _apply_template(template, arguments)
+
+    def __init__(self, expression, field_names, functions):
+        self._expression = expression
+        self._tokens = _tokenize(expression)
+        self._index = 0
+        self._field_names = field_names
+        self._functions = {**_functions, **(functions or {})}
+
+
+def compile_filter(expression, field_names, functions=None):
+    """
+    Compile an OData $filter expression into a parameterized SQLite condition.
+
+    :param expression: Value of the $filter system query option, e.g. "Total gt 10 and contains(Name,'Rock')"
+    :param field_names: Names of the fields that the expression may refer to
+    :param functions: Optional dictionary of function templates that replace the SQLite ones, in the same
+                      form as _functions, for databases with a different SQL dialect
+    :return: Tuple of (sql, parameters) for use in a WHERE clause
+    """
+    if not expression.strip():
+        raise ValueError('Empty filter expression')
+    return _FilterParser(expression, field_names, functions).parse()
+
+
+def compile_select(expression, field_names):
+    """
+    Resolve an OData $select expression into the list of fields to be fetched.
+
+    :param expression: Value of the $select system query option, e.g. "Name,Total"
+    :param field_names: Names of the fields that may be selected, in table order
+    :return: List of selected field names
+    """
+    selected_names = [n.strip() for n in expression.split(',')]
+    if '*' in selected_names:
+        return list(field_names)
+    for selected_name in selected_names:
+        if selected_name not in field_names:
+            raise ValueError(f'Unknown property: {selected_name}')
+    # Duplicates are dropped since a JSON object can only hold each name once
+    return list(dict.fromkeys(selected_names))
+
+
+def compile_orderby(expression, field_names):
+    """
+    Compile an OData $orderby expression into a SQLite ORDER BY clause.
+
+    :param expression: Value of the $orderby system query option, e.g. "Total desc,Name"
+    :param field_names: Names of the fields that may be ordered by
+    :return: SQL for use after ORDER BY
+    """
+    terms = []
+    for item in expression.split(','):
+        parts = item.split()
+        if len(parts) not in (1, 2) or (len(parts) == 2 and parts[1] not in ('asc', 'desc')):
+            raise ValueError(f'Invalid orderby expression: {expression}')
+        if parts[0] not in field_names:
+            raise ValueError(f'Unknown property: {parts[0]}')
+        direction = 'DESC' if parts[-1] == 'desc' else 'ASC'
+        terms.append(f'{quote_identifier(parts[0])} {direction}')
+    return ', '.join(terms)
+
+
+def compile_count(value):
+    """
+    Interpret an OData $count value.
+
+    :param value: Value of the $count system query option, either a boolean or "true" / "false"
+    :return: True if a count of matching rows is requested
+    """
+    if value in (True, False):
+        return value
+    if value in ('true', 'false'):
+        return value == 'true'
+    raise ValueError(f'Invalid value for $count: {value}')
+
+
+def compile_non_negative_integer(option_name, value):
+    """
+    Interpret an OData system query option whose value is a non-negative integer, such as $top and $skip.
+
+    :param option_name: Name of the system query option
+    :param value: Value of the option, either an integer or its text form
+    :return: Value as an integer
+    """
+    try:
+        integer = int(value)
+    except (TypeError, ValueError):
+        integer = -1
+    if isinstance(value, bool) or integer < 0 or (isinstance(value, str) and not value.isdigit()):
+        raise ValueError(f'Invalid value for {option_name}: {value}')
+    return integer
+
+
+def _split_top_level(expression, separator):
+    """
+    Split an OData expression at each separator outside of parentheses and string literals.
+
+    :param expression: OData expression
+    :param separator: Single separator character, e.g. "/" or ","
+    :return: List of the parts of the expression
+    """
+    parts = []
+    depth = 0
+    quoted = False
+    start = 0
+    for position, character in enumerate(expression):
+        if character == "'":
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif character == '(':
+            depth += 1
+        elif character == ')':
+            depth -= 1
+        elif character == separator and depth == 0:
+            parts.append(expression[start:position])
+            start = position + 1
+    parts.append(expression[start:])
+    return parts
+
+
+def _get_aggregate_type(method, expression_type):
+    """Derive the OData type of an aggregated value from the aggregation method and the type of its expression."""
+    if method == 'countdistinct':
+        return 'Edm.Int64'
+    if method in ('min', 'max'):
+        return expression_type
+    if expression_type in ('Edm.Single', 'Edm.Double'):
+        return 'Edm.Double'
+    if method == 'sum' and expression_type in _integer_types:
+        return 'Edm.Int64'
+    return 'Edm.Decimal'
+
+
+def _compile_aggregate(expression, field_types, functions):
+    """
+    Compile a single aggregate expression of $apply, e.g. "Total with sum as Revenue" or "$count as Count".
+
+    :return: Tuple of (sql, parameters, alias, OData type)
+    """
+    match = _count_aggregate_pattern.fullmatch(expression)
+    if match is not None:
+        return 'count(*)', [], match.group(1), 'Edm.Int64'
+    match = _aggregate_pattern.fullmatch(expression)
+    if match is None:
+        raise ValueError(f'Invalid aggregate expression: {expression.strip()}')
+    value_expression, method, alias = match.groups()
+    if method not in _aggregation_methods:
+        raise ValueError(f'Unsupported aggregation method: {method}')
+    sql, parameters = _apply_template(_aggregation_methods[method],
+                                      [compile_filter(value_expression, field_types, functions)])
+    # Values computed from several properties have no single type, so they are taken to be decimals
+    expression_type = field_types.get(value_expression.strip(), 'Edm.Decimal')
+    return sql, parameters, alias, _get_aggregate_type(method, expression_type)
+
+
+def _compile_aggregation(aggregates, group_names, source, parameters, field_types, functions):
+    """
+    Compile the aggregate and groupby transformations of $apply into a query that groups the rows of the source
+    by the given properties, if any, and aggregates each group into a single row.
+
+    :param aggregates: Comma-separated aggregate expressions, or None for none
+    :param group_names: List of the names of the properties to group by
+    :return: Tuple of (query, parameters, dictionary of the OData types of the fields of the result)
+    """
+    columns = [quote_identifier(n) for n in group_names]
+    column_parameters = []
+    result_types = {n: field_types[n] for n in group_names}
+    for aggregate in _split_top_level(aggregates, ',') if aggregates is not None else []:
+        sql, aggregate_parameters, alias, odata_type = _compile_aggregate(aggregate, field_types, functions)
+        if alias in result_types:
+            raise ValueError(f'Duplicate property: {alias}')
+        columns.append(f'{sql} AS {quote_identifier(alias)}')
+        column_parameters += aggregate_parameters
+        result_types[alias] = odata_type
+    grouping = f' GROUP BY {", ".join(quote_identifier(n) for n in group_names)}' if group_names else ''
+    # Group names are known properties and aliases identifiers, both quoted, and values are parameters
+    query = f'SELECT {", ".join(columns)} FROM {source}{grouping}'  # nosec - validated
+    return query, column_parameters + parameters, result_types
+
+
+def _compile_aggregate_transformation(arguments, source, parameters, field_types, functions):
+    return _compile_aggregation(arguments, [], source, parameters, field_types, functions)
+
+
+def _compile_groupby_transformation(arguments, source, parameters, field_types, functions):
+    groupby_arguments = _split_top_level(arguments, ',')
+    grouping = groupby_arguments[0].strip()
+    if len(groupby_arguments) > 2 or not (grouping.startswith('(') and grouping.endswith(')')):
+        raise ValueError(f'Invalid groupby transformation: groupby({arguments})')
+    group_names = [n.strip() for n in grouping[1:-1].split(',')]
+    for group_name in group_names:
+        if group_name not in field_types:
+            raise ValueError(f'Unknown property: {group_name}')
+    aggregates = None
+    if len(groupby_arguments) == 2:
+        match = _transformation_pattern.fullmatch(groupby_arguments[1])
+        if match is None or match.group(1) != 'aggregate':
+            raise ValueError(f'Invalid groupby transformation: groupby({arguments})')
+        aggregates = match.group(2)
+    return _compile_aggregation(aggregates, list(dict.fromkeys(group_names)), source, parameters, field_types,
+                                functions)
+
+
+def _compile_filter_transformation(arguments, source, parameters, field_types, functions):
+    condition, condition_parameters = compile_filter(arguments, field_types, functions)
+    columns = ', '.join(quote_identifier(n) for n in field_types)
+    query = f'SELECT {columns} FROM {source} WHERE {condition}'  # nosec - quoted names and compiled condition
+    return query, parameters + condition_parameters, field_types
+
+
+def _compile_topcount_transformation(arguments, source, parameters, field_types, functions):
+    topcount_arguments = _split_top_level(arguments, ',')
+    if len(topcount_arguments) != 2:
+        raise ValueError(f'Invalid topcount transformation: topcount({arguments})')
+    count = compile_non_negative_integer('topcount', topcount_arguments[0].strip())
+    sql, value_parameters = compile_filter(topcount_arguments[1], field_types, functions)
+    columns = ', '.join(quote_identifier(n) for n in field_types)
+    # Nulls are ordered last explicitly, since databases disagree on where they go in descending order
+    query = f'SELECT {columns} FROM {source} ORDER BY ({sql}) IS NULL, ({sql}) DESC LIMIT ?'  # nosec - validated
+    return query, parameters + value_parameters + value_parameters + [count], field_types
+
+
+# Each transformation of $apply maps to a function that compiles its arguments into a query on a source
+_transformations = {
+    'aggregate': _compile_aggregate_transformation,
+    'filter': _compile_filter_transformation,
+    'groupby': _compile_groupby_transformation,
+    'topcount': _compile_topcount_transformation,
+}
+
+
+def compile_apply(expression, source, field_types, functions=None):
+    """
+    Compile an OData $apply expression of the Data Aggregation extension into a parameterized SQLite query.
+    Transformations separated by "/" are applied in turn, each to the result of the previous one:
+    filter(condition), groupby((properties),aggregate(...)), aggregate(...) and topcount(count,value),
+    where aggregate expressions take the form "Total with sum as Revenue" (also min, max, average and
+    countdistinct) or "$count as Count".
+
+    :param expression: Value of the $apply system query option,
+                       e.g. "filter(Total gt 1)/groupby((BillingCountry),aggregate(Total with sum as Revenue))"
+    :param source: SQL of the table that the transformations apply to, such as its quoted name
+    :param field_types: Dictionary of the OData types of the fields of the table, in table order
+    :param functions: Optional dictionary of function templates that replace the SQLite ones, as for compile_filter
+    :return: Tuple of (query, parameters, dictionary of the OData types of the fields of the result, in order)
+    """
+    if not expression.strip():
+        raise ValueError('Empty apply expression')
+    query = None
+    parameters = []
+    field_types = dict(field_types)
+    for step, transformation in enumerate(_split_top_level(expression, '/')):
+        match = _transformation_pattern.fullmatch(transformation)
+        if match is None:
+            raise ValueError(f'Invalid transformation: {transformation.strip()}')
+        name, arguments = match.groups()
+        if name not in _transformations:
+            raise ValueError(f'Unsupported transformation: {name}')
+        if query is not None:
+            source = f'({query}) AS {quote_identifier(f"_apply{step}")}'
+        query, parameters, field_types = _transformations[name](arguments, source, parameters, field_types,
+                                                                functions)
+    return query, parameters, field_types
+
+
+def compile_expand(expression, navigation_names):
+    """
+    Resolve an OData $expand expression into the navigation properties to be expanded.
+
+    :param expression: Value of the $expand system query option, e.g. "tracks($select=Name;$expand=genres),artists"
+                       or "*" for all navigation properties
+    :param navigation_names: Names of the navigation properties that may be expanded
+    :return: Dictionary where the keys are navigation property names and the values are dictionaries of the
+             system query options nested within them ($select, $filter, $orderby and $expand)
+    """
+    expansions = {}
+    for item in _split_top_level(expression, ','):
+        match = _expand_item_pattern.fullmatch(item)
+        if match is None:
+            raise ValueError(f'Invalid expand expression: {expression}')
+        name, nested_options = match.groups()
+        options = {}
+        for option in _split_top_level(nested_options, ';') if nested_options is not None else []:
+            option_name, separator, value = option.partition('=')
+            option_name = option_name.strip()
+            if option_name not in _expand_options:
+                raise ValueError(f'Unsupported expand option: {option_name}')
+            options[option_name] = value
+        if name == '*' and not options:
+            expansions.update((n, {}) for n in navigation_names if n not in expansions)
+            continue
+        if name not in navigation_names:
+            raise ValueError(f'Unknown navigation property: {name}')
+        if name in expansions:
+            raise ValueError(f'Duplicate navigation property: {name}')
+        expansions[name] = options
+    return expansions
@@ -0,0 +1,308 @@
+import argparse
+import asyncio
+import concurrent.futures
+import http
+import logging
+import os
+import urllib.parse
+
+import ujson
+
+from sql_to_odata import ODataInterface
+from sql_to_odata.backends import SQLiteBackend
+from sql_to_odata.cli import add_tuning_arguments, get_tuning_options
+
+
+_log = logging.getLogger(__name__)
+_log.addHandler(logging.NullHandler())
+
+_json_content_type = 'application/json;odata.metadata=minimal'
+
+_xml_content_type = 'application/xml'
+
+# Chunks produced by a reader are gathered up to this size before being sent, to limit thread hand-offs
+_min_chunk_size = 65536
+
+_max_header_lines = 100
+
+
+class _HTTPError(Exception):
+    """Error that is reported to the client with the given HTTP status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class _Reader():
+    """Read-only database connection that is only ever used from its own single worker thread."""
+
+    def run(self, function, *args):
+        """Run a function on this reader's thread, passing it the reader's ODataInterface."""
+        return asyncio.get_running_loop().run_in_executor(self._executor, function, self._interface, *args)
+
+    def close(self):
+        """Close the reader's database connections on its own thread, then let the thread end."""
+        closed = self._executor.submit(self._interface.close)
+        self._executor.shutdown(wait=False)
+        return asyncio.wrap_future(closed)
+
+    def __init__(self, interface_kwargs):
+        self._executor = concurrent.futures.ThreadPoolExecutor(1)
+        # SQLite connections must be used on the thread that created them
+        self._interface = self._executor.submit(ODataInterface, **interface_kwargs).result()
+
+
+def _read_chunks(interface, chunks):
+    """Gather generated chunks until there is enough to send, returning an empty string once they run out."""
+    gathered = []
+    gathered_size = 0
+    for chunk in chunks:
+        gathered.append(chunk)
+        gathered_size += len(chunk)
+        if gathered_size >= _min_chunk_size:
+            break
+    return ''.join(gathered)
+
+
+class ODataServer():
+    """
+    Asynchronous HTTP server that provides a live, read-only OData API over a SQLite database.
+
+    Requests for the service document ($service or the root), the metadata ($metadata) and the entity sets
+    (one per table, supporting the system query options of ODataInterface.query_table_json) are answered from
+    a pool of read-only connections, each on its own thread. Responses are streamed with chunked transfer
+    encoding and carry an ETag that changes whenever the database does, so If-None-Match requests for
+    unchanged resources are answered with a 304 without touching the data.
+    """
+
+    def _get_generation(self, interface):
+        """Run on the watcher thread: advance the generation if the database has changed since last checked."""
+        data_version = interface.get_data_version()
+        if data_version != self._data_version:
+            self._data_version = data_version
+            self._generation += 1
+        return self._generation
+
+    def _open_resource(self, interface, path, query_options):
+        """
+        Run on a reader thread: resolve a request to a response.
+
+        :return: Tuple of (content type, iterator of body chunks)
+        """
+        if path in ('', '$service'):
+            return _json_content_type, iter([interface.get_database_service_json()])
+        if path == '$metadata':
+            return _xml_content_type, iter([interface.get_database_schema_xml()])
+        if path not in interface.get_table_names():
+            raise _HTTPError(404, f'Resource not found: {path}')
+        # Custom query options, which don't start with "$", are to be ignored, and responses are always JSON
+        query_options = {k: v for k, v in query_options.items() if k.startswith('$') and k != '$format'}
+        try:
+            if set(query_options) <= {'$skiptoken'} and (self._page_size or query_options):
+                page_size = self._page_size or 1000
+                chunks = interface.iter_table_json(path, page_size=page_size,
+                                                   skip_token=query_options.get('$skiptoken'))
+            else:
+                chunks = interface.iter_query_json(path, query_options)
+            # Gets the first chunks now so that query errors are reported before the response begins
+            first_chunk = _read_chunks(interface, chunks)
+        except ValueError as error:
+            raise _HTTPError(400, str(error)) from None
+        return _json_content_type, _prepend(first_chunk, chunks)
+
+    async def _get_etag(self):
+        generation = await self._watcher.run(self._get_generation)
+        return f'"{self._instance_token}-{generation}"'
+
+    async def _handle_request(self, method, target, version, headers, writer):
+        """Answer a single request, streaming the body with chunked transfer encoding unless the client is HTTP/1.0."""
+        if method not in ('GET', 'HEAD'):
+            raise _HTTPError(405, f'Method not allowed: {method}')
+        url = urllib.parse.urlsplit(target)
+        path = urllib.parse.unquote(url.path).strip('/')
+        query_options = dict(urllib.parse.parse_qsl(url.query, keep_blank_values=True))
+        etag = await self._get_etag()
+        if_none_match = headers.get('if-none-match', '')
+        if if_none_match.strip() == '*' or etag in (t.strip() for t in if_none_match.split(',')):
+            _write_head(writer, 304, {'ETag': etag})
+            await writer.drain()
+            return
+        reader = await self._readers.get()
+        try:
+            content_type, chunks = await reader.run(self._open_resource, path, query_options)
+            chunked = version != 'HTTP/1.0'
+            response_headers = {'Content-Type': content_type, 'ETag': etag}
+            if chunked:
+                response_headers['Transfer-Encoding'] = 'chunked'
+            _write_head(writer, 200, response_headers)
+            if method == 'HEAD':
+                await writer.drain()
+                return
+            while True:
+                chunk = await reader.run(_read_chunks, chunks)
+                if not chunk:
+                    break
+                data = chunk.encode()
+                writer.write(b'%x\r\n%s\r\n' % (len(data), data) if chunked else data)
+                await writer.drain()
+            if chunked:
+                writer.write(b'0\r\n\r\n')
+                await writer.drain()
+        finally:
+            self._readers.put_nowait(reader)
+
+    async def _handle_connection(self, stream_reader, writer):
+        """Serve requests on a client connection until it is closed."""
+        try:
+            while True:
+                request_line = await stream_reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                for _ in range(_max_header_lines):
+                    header_line = await stream_reader.readline()
+                    if not header_line.strip():
+                        break
+                    name, _, value = header_line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                request_parts = request_line.decode('latin-1').split()
+                try:
+                    if len(request_parts) != 3:
+                        raise _HTTPError(400, 'Malformed request line')
+                    method, target, version = request_parts
+                    _log.debug('Handling %s %s', method, target)
+                    await self._handle_request(method, target, version, headers, writer)
+                except _HTTPError as error:
+                    _write_error(writer, error.status, str(error))
+                    await writer.drain()
+                    if error.status in (400, 405):
+                        break
+                if headers.get('connection', '').lower() == 'close' or request_parts[-1] == 'HTTP/1.0':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as error:
+            _log.debug('Dropping client connection: %s', error)
+        except Exception:
+            # Once a response has started there is no way to report an error other than ending it abruptly
+            _log.exception('Failed to handle request')
+        finally:
+            writer.close()
+
+    @property
+    def port(self):
+        """Port that the server is listening on, useful when it was started on port 0."""
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self):
+        """Open the database connections and start accepting requests."""
+        loop = asyncio.get_running_loop()
+        self._watcher = await loop.run_in_executor(None, _Reader, self._interface_kwargs)
+        self._readers = asyncio.Queue()
+        for _ in range(self._workers):
+            self._readers.put_nowait(await loop.run_in_executor(None, _Reader, self._interface_kwargs))
+        self._server = await asyncio.start_server(self._handle_connection, self._host, self._port)
+        _log.debug('Serving OData on %s:%s', self._host, self.port)
+
+    async def serve_forever(self):
+        """Start the server if needed and accept requests until cancelled."""
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+
+    async def close(self):
+        """Stop accepting requests and release the database connections."""
+        self._server.close()
+        await self._server.wait_closed()
+        await self._watcher.close()
+        while not self._readers.empty():
+            await self._readers.get_nowait().close()
+
+    def __init__(self, *args, **kwargs):
+        """
+        Construct an instance of the class.
+
+        :param sqlite_filename: Location of the SQLite database to be served
+        :param host: Interface to listen on, defaults to 127.0.0.1
+        :param port: Port to listen on, defaults to 8000
+        :param workers: Number of read-only connections serving requests concurrently, defaults to 4
+        :param page_size: Optional maximum number of rows in an unqueried entity set response, which then
+                          ends with an @odata.nextLink to the next page; defaults to all rows
+
+        The arraysize, strict_types and navigation_properties options and the tuning options of SQLite connections
+        (mmap_size, cache_size, temp_store, query_only and immutable) are passed on to the ODataInterface of every
+        connection.
+        """
+        interface_options = ('sqlite_filename', 'arraysize', 'strict_types',
+                             'navigation_properties') + SQLiteBackend.options
+        self._interface_kwargs = {k: v for k, v in kwargs.items() if k in interface_options}
+        self._host = kwargs.get('host', '127.0.0.1')
+        self._port = kwargs.get('port', 8000)
+        self._workers = kwargs.get('workers', 4)
+        self._page_size = kwargs.get('page_size')
+        self._server = None
+        self._data_version = None
+        self._generation = 0
+        # Keeps ETags from a previous run of the server from matching after a restart
+        self._instance_token = os.urandom(4).hex()
+
+
+def _prepend(first_chunk, chunks):
+    """Put a chunk that has already been taken back in front of the rest."""
+    yield first_chunk
+    yield from chunks
+
+
+def _write_head(writer, status, headers):
+    """Write the status line and headers of a response."""
+    lines = [f'HTTP/1.1 {status} {http.HTTPStatus(status).phrase}', 'OData-Version: 4.0']
+    lines.extend(f'{k}: {v}' for k, v in headers.items())
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+
+
+def _write_error(writer, status, message):
+    """Write a complete response holding an OData error."""
+    body = ujson.dumps({'error': {'code': str(status), 'message': message}}).encode()
+    _write_head(writer, status, {'Content-Type': _json_content_type, 'Content-Length': len(body)})
+    writer.write(body)
+
+
+def serve(sqlite_filename, host='127.0.0.1', port=8000, workers=4, page_size=None, **kwargs):
+    """
+    Serve a live OData API over a SQLite database until interrupted.
+
+    :param sqlite_filename: Location of the SQLite database to be served
+    :param host: Interface to listen on, defaults to 127.0.0.1
+    :param port: Port to listen on, defaults to 8000
+    :param workers: Number of read-only connections serving requests concurrently, defaults to 4
+    :param page_size: Optional maximum number of rows in an unqueried entity set response, defaults to all rows
+    :param kwargs: Other options of the database connections, such as strict_types, as taken by ODataServer
+    """
+    server = ODataServer(sqlite_filename=sqlite_filename, host=host, port=port, workers=workers, page_size=page_size,
+                         **kwargs)
+    asyncio.run(server.serve_forever())
+
+
+def main(args=None):
+    """Run the server from the command line."""
+    parser = argparse.ArgumentParser(description='Serve a live OData API over a SQLite database.')
+    parser.add_argument('sqlite_filename', help='SQLite database to be served')
+    parser.add_argument('--host', default='127.0.0.1', help='interface to listen on (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=8000, help='port to listen on (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=4, help='read-only connections (default: %(default)s)')
+    parser.add_argument('--page-size', type=int, help='maximum rows per entity set response (default: all)')
+    parser.add_argument('--strict-types', action='store_true',
+                        help='write values in the exact form of their OData type, and keys and facets in $metadata')
+    parser.add_argument('--navigation-properties', action='store_true',
+                        help='describe the foreign keys of the database as navigation properties in $metadata')
+    add_tuning_arguments(parser)
+    parsed_args = parser.parse_args(args)
+    try:
+        serve(parsed_args.sqlite_filename, parsed_args.host, parsed_args.port, parsed_args.workers,
+              parsed_args.page_size, strict_types=parsed_args.strict_types,
+              navigation_properties=parsed_args.navigation_properties, **get_tuning_options(parsed_args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
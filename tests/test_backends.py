@@ -0,0 +1,259 @@
+import datetime
+import decimal
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import uuid
+
+import pytest
+import ujson
+
+import sql_to_odata
+from sql_to_odata import backends
+from sql_to_odata.delta import DeltaState
+from tests.test_sql_to_odata import _test_sqlite_filename, _test_table_name
+
+
+_test_placeholder_queries = [
+    ('SELECT * FROM t WHERE a = ? AND b > ?', 'SELECT * FROM t WHERE a = %s AND b > %s'),
+    ('''SELECT "a?b" FROM t WHERE c = '?' AND d = ?''', '''SELECT "a?b" FROM t WHERE c = '?' AND d = %s'''),
+    ('''SELECT "50%" FROM t WHERE (a % ?) = 'x%' ''', '''SELECT "50%%" FROM t WHERE (a %% %s) = 'x%%' '''),
+]
+
+_test_duckdb_schema = [('id', 'Edm.Int32', True, None, True), ('name', 'Edm.String', False, None, False), ('born', 'Edm.DateTimeOffset', False, None, False), ('score', 'Edm.Decimal', False, None, False), ('ok', 'Edm.Boolean', False, None, False), ('u', 'Edm.Guid', False, None, False), ('d', 'Edm.Date', False, None, False)]  # noqa: E501
+
+_test_duckdb_row = {'id': 3, 'name': 'n3', 'born': '2020-01-04T12:00:00', 'score': 3.75, 'ok': False, 'u': '00000000-0000-0000-0000-000000000003', 'd': '2021-01-04'}  # noqa: E501
+
+_test_invalid_tuning_options = [
+    ({'mmap_size': '1'}, 'Invalid mmap size: 1'),
+    ({'cache_size': True}, 'Invalid cache size: True'),
+    ({'temp_store': 'disk'}, 'Invalid temp store: disk'),
+    ({'arraysize': 0}, 'Invalid array size: 0'),
+]
+
+_test_postgres_dsn_variable = 'SQL_TO_ODATA_TEST_POSTGRES_DSN'
+
+
+def test_convert_placeholders():
+    for query, converted_query in _test_placeholder_queries:
+        assert backends.convert_placeholders(query) == converted_query
+
+
+def test_create_backend():
+    backend = backends.create_backend(sqlite_filename=_test_sqlite_filename)
+    assert isinstance(backend, backends.SQLiteBackend)
+    with pytest.raises(ValueError) as error:
+        backends.create_backend(backend='oracle')
+    assert error.value.args[0] == 'Unknown backend: oracle'
+    # A backend has to implement the catalog introspection that ODataInterface relies on
+    incomplete_backend = type('IncompleteBackend', (backends.Backend,), {'connect': lambda self: None})
+    with pytest.raises(TypeError):
+        incomplete_backend()
+
+
+def test_sqlite_parameter_limit():
+    with tempfile.TemporaryDirectory() as temp_folder:
+        delta_state = DeltaState(os.path.join(temp_folder, 'delta.db'))
+        delta_state._connection.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 10)
+        assert backends.get_sqlite_parameter_limit(delta_state._connection) == 10
+        keys = [str(i) for i in range(50)]
+        snapshot_id = delta_state.create_snapshot(_test_table_name)
+        delta_state.add_rows(snapshot_id, keys, [b'hash'] * len(keys))
+        assert len(delta_state.get_hashes(snapshot_id, keys)) == len(keys)
+        delta_state.close()
+
+
+def test_sqlite_tuning():
+    backend = backends.SQLiteBackend(_test_sqlite_filename, mmap_size=2 ** 20, cache_size=-4096, temp_store='memory',
+                                     query_only=True, immutable=True)
+    connection = backend.connect()
+    pragma_values = [connection.execute(f'PRAGMA {p};').fetchone()[0]
+                     for p in ['mmap_size', 'cache_size', 'temp_store', 'query_only']]
+    assert pragma_values == [2 ** 20, -4096, 2, 1]
+    connection.close()
+    odata_interface = sql_to_odata.ODataInterface(sqlite_filename=_test_sqlite_filename)
+    tuned_interface = sql_to_odata.ODataInterface(sqlite_filename=_test_sqlite_filename, mmap_size=2 ** 20,
+                                                  cache_size=-4096, temp_store='file', immutable=True, arraysize=7)
+    assert tuned_interface.get_table_json(_test_table_name) == odata_interface.get_table_json(_test_table_name)
+    odata_interface.close()
+    tuned_interface.close()
+    for kwargs, message in _test_invalid_tuning_options:
+        with pytest.raises(ValueError) as error:
+            sql_to_odata.ODataInterface(sqlite_filename=_test_sqlite_filename, **kwargs)
+        assert error.value.args[0] == message
+
+
+def test_connection_pool():
+    backend = backends.SQLiteBackend(_test_sqlite_filename)
+    pool = backends.ConnectionPool(backend, 2, timeout=0.1)
+    with pool.connection() as first_connection:
+        with pool.connection() as second_connection:
+            assert first_connection is not second_connection
+            with pytest.raises(TimeoutError):
+                with pool.connection():
+                    pass
+    # Returned connections are reused rather than opened again
+    with pool.connection() as connection:
+        assert connection in (first_connection, second_connection)
+    pool.close()
+    with pytest.raises(ValueError) as error:
+        backends.ConnectionPool(backend, 0)
+    assert error.value.args[0] == 'Invalid pool size: 0'
+
+
+def test_connection_pool_threads():
+    odata_interface = sql_to_odata.ODataInterface(sqlite_filename=_test_sqlite_filename, pool_size=2)
+    table_json = odata_interface.get_table_json(_test_table_name)
+    results = []
+
+    def get_table_json():
+        results.append(odata_interface.get_table_json(_test_table_name))
+    threads = [threading.Thread(target=get_table_json) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [table_json] * 4
+    odata_interface.close()
+
+
+def test_interleaved_streams():
+    odata_interface = sql_to_odata.ODataInterface(sqlite_filename=_test_sqlite_filename)
+    first_chunks = odata_interface.iter_table_json(_test_table_name, batch_size=10)
+    second_chunks = odata_interface.iter_table_json(_test_table_name, batch_size=10)
+    # Each open stream holds its own connection, so catalog queries and other streams can run in between
+    table_json = next(first_chunks) + next(second_chunks)
+    table_json += ''.join(a + b for a, b in zip(first_chunks, second_chunks))
+    assert len(table_json) == 2 * len(odata_interface.get_table_json(_test_table_name))
+    assert odata_interface.get_table_names()
+    odata_interface.close()
+
+
+@pytest.fixture(scope='module')
+def duckdb_interface():
+    duckdb = pytest.importorskip('duckdb')
+    with tempfile.TemporaryDirectory() as temp_folder:
+        duckdb_filename = os.path.join(temp_folder, 'test.duckdb')
+        with duckdb.connect(duckdb_filename) as connection:
+            connection.execute('''CREATE TABLE people (id INTEGER PRIMARY KEY, name VARCHAR, born TIMESTAMP,
+                                  score DECIMAL(5,2), ok BOOLEAN, u UUID, d DATE)''')
+            connection.execute('''CREATE TABLE pairs (a INTEGER, b INTEGER, PRIMARY KEY (b, a))''')
+            connection.execute('''CREATE TABLE notes (text VARCHAR)''')
+            for i in range(10):
+                connection.execute('''INSERT INTO people VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                                   [i, f'n{i}', datetime.datetime(2020, 1, i + 1, 12), decimal.Decimal('1.25') * i,
+                                    i % 2 == 0, uuid.UUID(int=i), datetime.date(2021, 1, i + 1)])
+                connection.execute('''INSERT INTO pairs VALUES (?, ?)''', [i % 3, i // 3])
+                connection.execute('''INSERT INTO notes VALUES (?)''', [f'note {i}'])
+        odata_interface = sql_to_odata.ODataInterface(backend='duckdb', duckdb_filename=duckdb_filename)
+        yield odata_interface
+        odata_interface.close()
+
+
+def test_duckdb_schema(duckdb_interface):
+    assert duckdb_interface.get_table_names() == ['notes', 'pairs', 'people']
+    assert duckdb_interface.get_table_schema('people') == _test_duckdb_schema
+    assert duckdb_interface.get_table_key('pairs') == ['b', 'a']
+    assert duckdb_interface.get_table_key('notes') == ['rowid']
+    assert duckdb_interface.get_table_size_estimate('people') == 10
+
+
+def test_duckdb_rows(duckdb_interface):
+    assert ujson.loads(duckdb_interface.get_table_json('people'))['value'][3] == _test_duckdb_row
+    table_json = duckdb_interface.get_table_json('people', page_size=3)
+    skip_token = re.search(r'\$skiptoken=([^"]+)', table_json).group(1)
+    assert '"id":3' in duckdb_interface.get_table_json('people', page_size=3, skip_token=skip_token)
+    for table_name in ['pairs', 'notes']:
+        rows = []
+        skip_token = None
+        while True:
+            table_json = duckdb_interface.get_table_json(table_name, page_size=4, skip_token=skip_token)
+            rows.extend(ujson.loads(table_json)['value'])
+            match = re.search(r'\$skiptoken=([^"]+)', table_json)
+            if match is None:
+                break
+            skip_token = match.group(1)
+        assert sorted(map(str, rows)) == sorted(map(str, duckdb_interface.get_table_rows(table_name)))
+
+
+def test_duckdb_query(duckdb_interface):
+    query_options = {'$filter': "contains(name,'1') or year(born) eq 2020 and ok eq true", '$select': 'id,name',
+                     '$top': 3, '$skip': 1, '$count': 'true'}
+    assert duckdb_interface.query_table_json('people', query_options) == '{"@odata.context":"$metadata#people(id,name)","@odata.count":6,"value":[{"id":1,"name":"n1"},{"id":2,"name":"n2"},{"id":4,"name":"n4"}]}'  # noqa: E501
+    query_options = {'$filter': "born gt 2020-01-05T00:00:00Z and endswith(name,'7')", '$skip': 0}
+    assert duckdb_interface.query_table_rows('people', query_options) == [{'id': 7, 'name': 'n7', 'born': datetime.datetime(2020, 1, 8, 12), 'score': decimal.Decimal('8.75'), 'ok': False, 'u': uuid.UUID(int=7), 'd': datetime.date(2021, 1, 8)}]  # noqa: E501
+    query_options = {'$filter': "name ne 'n1' and id lt 3 and not (name eq null)", '$select': 'id'}
+    assert duckdb_interface.query_table_rows('people', query_options) == [{'id': 0}, {'id': 2}]
+
+
+def test_duckdb_dump_database(duckdb_interface):
+    with tempfile.TemporaryDirectory() as temp_folder:
+        with pytest.raises(ValueError) as error:
+            duckdb_interface.dump_database(temp_folder, snapshot=True)
+        assert error.value.args[0].startswith('Snapshot exports are not supported for DuckDB database')
+        duckdb_interface.dump_database(temp_folder, workers=2, page_size=4)
+        assert sorted(os.listdir(temp_folder)) == ['$metadata', '$service', 'notes', 'notes.2', 'notes.3', 'pairs', 'pairs.2', 'pairs.3', 'people', 'people.2', 'people.3']  # noqa: E501
+        with open(os.path.join(temp_folder, 'people')) as table_file:
+            assert table_file.read() == duckdb_interface.get_table_json('people', page_size=4).replace('people?$skiptoken=WzNd', 'people.2')  # noqa: E501
+
+
+def test_duckdb_navigation():
+    duckdb = pytest.importorskip('duckdb')
+    with tempfile.TemporaryDirectory() as temp_folder:
+        duckdb_filename = os.path.join(temp_folder, 'test.duckdb')
+        with duckdb.connect(duckdb_filename) as connection:
+            connection.execute('''CREATE TABLE orders (region VARCHAR, number INTEGER, PRIMARY KEY (region, number))''')
+            connection.execute('''CREATE TABLE lines (id INTEGER PRIMARY KEY, region VARCHAR, number INTEGER,
+                                  FOREIGN KEY (region, number) REFERENCES orders (region, number))''')
+            connection.execute('''INSERT INTO orders VALUES ('eu', 1), ('us', 1)''')
+            connection.execute('''INSERT INTO lines VALUES (1, 'eu', 1), (2, 'us', 1), (3, 'eu', 1)''')
+        odata_interface = sql_to_odata.ODataInterface(backend='duckdb', duckdb_filename=duckdb_filename)
+        assert odata_interface.get_table_navigation_properties('lines') == [
+            ('orders', 'orders', False, ('region', 'number'), ('region', 'number'), 'lines')]
+        query_options = {'$expand': 'lines($select=id;$orderby=id desc)'}
+        assert odata_interface.query_table_rows('orders', query_options) == [
+            {'region': 'eu', 'number': 1, 'lines': [{'id': 3}, {'id': 1}]},
+            {'region': 'us', 'number': 1, 'lines': [{'id': 2}]}]
+        odata_interface.close()
+
+
+@pytest.fixture(scope='module')
+def postgres_interface():
+    psycopg = pytest.importorskip('psycopg')
+    postgres_dsn = os.environ.get(_test_postgres_dsn_variable)
+    if postgres_dsn is None:
+        pytest.skip(f'{_test_postgres_dsn_variable} is not set')
+    with psycopg.connect(postgres_dsn, autocommit=True) as connection:
+        connection.execute('''DROP TABLE IF EXISTS sql_to_odata_people, "SqlToODataNotes"''')
+        connection.execute('''CREATE TABLE sql_to_odata_people (id INTEGER PRIMARY KEY, name TEXT,
+                              born TIMESTAMPTZ, score NUMERIC(5,2))''')
+        connection.execute('''CREATE TABLE "SqlToODataNotes" ("Text" VARCHAR(20), "Share%" REAL)''')
+        for i in range(10):
+            connection.execute('''INSERT INTO sql_to_odata_people VALUES (%s, %s, %s, %s)''',
+                               [i, f'n{i}', datetime.datetime(2020, 1, i + 1, 12, tzinfo=datetime.timezone.utc),
+                                decimal.Decimal('1.25') * i])
+            connection.execute('''INSERT INTO "SqlToODataNotes" VALUES (%s, %s)''', [f'note {i}', i / 4])
+    odata_interface = sql_to_odata.ODataInterface(backend='postgres', postgres_dsn=postgres_dsn)
+    yield odata_interface
+    odata_interface.close()
+    with psycopg.connect(postgres_dsn, autocommit=True) as connection:
+        connection.execute('''DROP TABLE sql_to_odata_people, "SqlToODataNotes"''')
+
+
+def test_postgres(postgres_interface):
+    assert postgres_interface.get_table_schema('sql_to_odata_people')[:2] == [('id', 'Edm.Int32', True, None, True), ('name', 'Edm.String', False, None, False)]  # noqa: E501
+    assert postgres_interface.get_table_key('SqlToODataNotes') == ['ctid']
+    assert postgres_interface.get_table_rows('sql_to_odata_people')[1] == {'id': 1, 'name': 'n1', 'born': datetime.datetime(2020, 1, 2, 12, tzinfo=datetime.timezone.utc), 'score': decimal.Decimal('1.25')}  # noqa: E501
+    table_json = postgres_interface.get_table_json('sql_to_odata_people', page_size=2)
+    assert table_json == '{"@odata.context":"$metadata#sql_to_odata_people","value":[{"id":0,"name":"n0","born":"2020-01-01T12:00:00+00:00","score":0.0},{"id":1,"name":"n1","born":"2020-01-02T12:00:00+00:00","score":1.25}],"@odata.nextLink":"sql_to_odata_people?$skiptoken=WzFd"}'  # noqa: E501
+    table_json = postgres_interface.get_table_json('SqlToODataNotes', page_size=4)
+    skip_token = re.search(r'\$skiptoken=([^"]+)', table_json).group(1)
+    assert '"note 4"' in postgres_interface.get_table_json('SqlToODataNotes', page_size=4, skip_token=skip_token)
+    query_options = {'$filter': "contains(name,'1') or year(born) eq 2020", '$select': 'id', '$skip': 8,
+                     '$count': 'true'}
+    assert postgres_interface.query_table_json('sql_to_odata_people', query_options) == '{"@odata.context":"$metadata#sql_to_odata_people(id)","@odata.count":10,"value":[{"id":8},{"id":9}]}'  # noqa: E501
+    assert len(postgres_interface.query_table_rows('SqlToODataNotes', {'$filter': "endswith(Text,'3')"})) == 1
+    query_options = {'$filter': "name ne 'n1' and id lt 3 and not (name eq null)", '$select': 'id'}
+    assert postgres_interface.query_table_rows('sql_to_odata_people', query_options) == [{'id': 0}, {'id': 2}]
@@ -0,0 +1,27 @@
+import sqlite3
+import tempfile
+
+from benchmarks import benchmark
+
+
+def test_create_database():
+    with tempfile.NamedTemporaryFile(suffix='.db') as database_file:
+        benchmark.create_database(database_file.name, 'numeric', 25)
+        connection = sqlite3.connect(database_file.name)
+        assert connection.execute('SELECT count(*), min(Id), max(Id) FROM numeric').fetchone() == (25, 1, 25)
+        connection.close()
+
+
+def test_run_benchmarks():
+    with tempfile.TemporaryDirectory() as work_folder:
+        options = {'repeat': 1, 'batch_size': None, 'workers': None, 'interface_options': {'mmap_size': 2 ** 20}}
+        results = benchmark.run_benchmarks([50], ['narrow'], ['get_table_json', 'dump_database'], work_folder, options)
+    assert [(r['shape'], r['rows'], r['operation']) for r in results] == [
+        ('narrow', 50, 'get_table_json'),
+        ('narrow', 50, 'dump_database'),
+    ]
+    for result in results:
+        assert 'error' not in result
+        assert result['seconds'] > 0
+        assert result['output_bytes'] > 0
+        assert result['peak_rss_bytes'] >= result['baseline_rss_bytes'] > 0
@@ -0,0 +1,84 @@
+import os
+import shutil
+import subprocess  # nosec
+import sys
+import tempfile
+
+import pytest
+
+import sql_to_odata
+from sql_to_odata import cli
+from tests.test_sql_to_odata import _test_sqlite_filename, _test_table_names
+
+
+_test_include_patterns = ['in*', 'p*']
+
+_test_exclude_patterns = ['*_*']
+
+_test_selected_table_names = ['invoices', 'playlists']
+
+_test_lazy_modules = ['concurrent.futures', 'duckdb', 'hashlib', 'psycopg', 'pyarrow', 'zstandard']
+
+
+def test_select_tables():
+    assert cli.select_tables(_test_table_names) == _test_table_names
+    assert cli.select_tables(_test_table_names, _test_include_patterns, _test_exclude_patterns) == _test_selected_table_names  # noqa: E501
+    assert cli.select_tables(_test_table_names, exclude_patterns=['*']) == []
+
+
+def test_main():
+    with tempfile.TemporaryDirectory() as temp_folder:
+        dump_folder = os.path.join(temp_folder, 'dump')
+        cli_folder = os.path.join(temp_folder, 'cli')
+        odata_interface = sql_to_odata.ODataInterface(sqlite_filename=_test_sqlite_filename)
+        odata_interface.dump_database(dump_folder, tables_to_include=_test_selected_table_names, formatted=True,
+                                      page_size=100)
+        odata_interface.close()
+        args = [_test_sqlite_filename, '-o', cli_folder, '--formatted', '--page-size', '100', '--workers', '2']
+        args += [a for p in _test_include_patterns for a in ['--include', p]]
+        args += [a for p in _test_exclude_patterns for a in ['--exclude', p]]
+        assert cli.main(args) == 0
+        assert sorted(os.listdir(cli_folder)) == sorted(os.listdir(dump_folder))
+        for output_filename in os.listdir(dump_folder):
+            with open(os.path.join(dump_folder, output_filename), 'rb') as dump_file:
+                with open(os.path.join(cli_folder, output_filename), 'rb') as cli_file:
+                    assert dump_file.read() == cli_file.read()
+
+
+def test_main_databases(capsys):
+    with tempfile.TemporaryDirectory() as temp_folder:
+        sqlite_filenames = [os.path.join(temp_folder, 'first.db'), os.path.join(temp_folder, 'second.sqlite')]
+        for sqlite_filename in sqlite_filenames:
+            shutil.copyfile(_test_sqlite_filename, sqlite_filename)
+        output_folder = os.path.join(temp_folder, 'output')
+        args = sqlite_filenames + ['-o', output_folder, '--include', 'artists', '--compression', 'gzip', '--progress']
+        assert cli.main(args) == 0
+        assert sorted(os.listdir(output_folder)) == ['first', 'second']
+        assert 'artists.gz' in os.listdir(os.path.join(output_folder, 'second'))
+        progress_lines = capsys.readouterr().err.splitlines()
+        assert [line.split(' (')[0] for line in progress_lines] == [f'{f}: [1/1] artists' for f in sqlite_filenames]
+        # Failing databases are reported, and the others still dumped
+        missing_filename = os.path.join(temp_folder, 'missing.db')
+        assert cli.main([missing_filename, sqlite_filenames[0], '-o', output_folder]) == 1
+        assert capsys.readouterr().err == f'sql-to-odata: error: {missing_filename}: unable to open database file\n'
+        assert os.path.exists(os.path.join(output_folder, 'first', _test_table_names[0]))
+        with pytest.raises(SystemExit):
+            cli.main([sqlite_filenames[0], sqlite_filenames[0], '-o', output_folder])
+        assert 'Databases would share output folders: first' in capsys.readouterr().err
+
+
+def test_lazy_imports():
+    code = f'import sys, sql_to_odata.cli; print(",".join(m for m in {_test_lazy_modules!r} if m in sys.modules))'
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, check=True, text=True).stdout  # nosec
+    assert output.strip() == ''
+
+
+def test_main_aggregations(capsys):
+    with tempfile.TemporaryDirectory() as temp_folder:
+        args = [_test_sqlite_filename, '-o', temp_folder, '--include', 'tracks',
+                '--aggregation', 'tracks_by_album=tracks:groupby((AlbumId),aggregate($count as Tracks))']
+        assert cli.main(args) == 0
+        assert sorted(os.listdir(temp_folder)) == ['$metadata', '$service', 'tracks', 'tracks_by_album']
+    with pytest.raises(SystemExit):
+        cli.main([_test_sqlite_filename, '-o', temp_folder, '--aggregation', 'tracks_by_album'])
+    assert 'Invalid aggregation: tracks_by_album' in capsys.readouterr().err
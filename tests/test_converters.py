@@ -0,0 +1,75 @@
+import datetime
+import decimal
+
+import ujson
+
+from sql_to_odata import converters
+
+
+_test_date_time_offsets = [
+    ('2009-01-01 00:00:00', '2009-01-01T00:00:00Z'),
+    ('2009-01-01T12:30', '2009-01-01T12:30:00Z'),
+    ('2009-01-01 12:30:15.250', '2009-01-01T12:30:15.250Z'),
+    ('2009-01-01', '2009-01-01T00:00:00Z'),
+    ('2009-01-01T12:30:15+02:00', '2009-01-01T12:30:15+02:00'),
+    ('2009-01-01T12:30:15Z', '2009-01-01T12:30:15Z'),
+    ('soon', 'soon'),
+    (datetime.datetime(2020, 1, 4, 12), '2020-01-04T12:00:00Z'),
+    (datetime.datetime(2020, 1, 4, 12, tzinfo=datetime.timezone(datetime.timedelta(hours=-5))),
+     '2020-01-04T12:00:00-05:00'),
+    (datetime.date(2020, 1, 4), '2020-01-04T00:00:00Z'),
+    (1234, 1234),
+]
+
+_test_conversions = [
+    (converters.convert_date, '2009-01-01 00:00:00', '2009-01-01'),
+    (converters.convert_date, datetime.datetime(2020, 1, 4, 12), '2020-01-04'),
+    (converters.convert_date, datetime.date(2020, 1, 4), '2020-01-04'),
+    (converters.convert_time_of_day, datetime.time(12, 30, 1, 500), '12:30:01.000500'),
+    (converters.convert_decimal, decimal.Decimal('NaN'), 'NaN'),
+    (converters.convert_decimal, decimal.Decimal('-Infinity'), '-INF'),
+    (converters.convert_decimal, 0.99, 0.99),
+    (converters.convert_boolean, 0, False),
+    (converters.convert_boolean, 2, True),
+    (converters.convert_boolean, 'yes', 'yes'),
+    (converters.convert_binary, b'\xfb\xff', '-_8='),
+    (converters.convert_binary, memoryview(b'ab'), 'YWI='),
+]
+
+_test_default_values = [
+    (None, None),
+    ("'It''s'", "It's"),
+    ("'n/a'::character varying", 'n/a'),
+    ('-1.5', '-1.5'),
+    ('1E3', '1e3'),
+    ('TRUE', 'true'),
+    ('CURRENT_TIMESTAMP', None),
+    ("nextval('ids'::regclass)", None),
+]
+
+
+def test_convert_date_time_offset():
+    for value, converted_value in _test_date_time_offsets:
+        assert converters.convert_date_time_offset(value) == converted_value
+
+
+def test_conversions():
+    for convert, value, converted_value in _test_conversions:
+        assert convert(value) == converted_value
+
+
+def test_convert_decimal():
+    exact_decimal = decimal.Decimal('12345678901234567890.12')
+    assert ujson.dumps([converters.convert_decimal(exact_decimal)]) == '[12345678901234567890.12]'
+    assert ujson.dumps({'a': converters.convert_decimal(decimal.Decimal('0.10'))}, indent=4) == '{\n    "a": 0.10\n}'
+
+
+def test_get_converters():
+    assert converters.get_converters(['Edm.Int64', 'Edm.String']) is None
+    assert converters.get_converters(['Edm.Int64', 'Edm.Decimal']) == (None, converters.convert_decimal)
+
+
+def test_get_default_value():
+    for default_expression, default_value in _test_default_values:
+        assert converters.get_default_value(default_expression) == default_value
+    assert converters.get_default_value('0', 'Edm.Boolean') == 'false'
@@ -0,0 +1,105 @@
+import contextlib
+import os
+import pstats
+import tempfile
+
+import sql_to_odata
+from sql_to_odata import metrics
+from tests.test_sql_to_odata import _test_sqlite_filename, _test_table_name, _test_table_row_count
+
+
+_test_prometheus_text = r'''# TYPE sql_to_odata_rows_total counter
+sql_to_odata_rows_total{table="albums"} 5
+sql_to_odata_rows_total{table="say \"hi\"\n"} 1
+# TYPE sql_to_odata_call_seconds summary
+sql_to_odata_call_seconds_count 1
+sql_to_odata_call_seconds_sum 2.0
+# TYPE sql_to_odata_query_seconds summary
+sql_to_odata_query_seconds_count{table="albums"} 2
+sql_to_odata_query_seconds_sum{table="albums"} 0.75
+'''
+
+_test_phases = ['conversion', 'query', 'serialization', 'write']
+
+
+class _SpanSink(metrics.MetricsRecorder):
+    """Recorder that also keeps the names of the spans it was asked to open."""
+
+    @contextlib.contextmanager
+    def span(self, name, labels):
+        self.spans.append((name, labels))
+        with super().span(name, labels):
+            yield
+
+    def __init__(self):
+        super().__init__()
+        self.spans = []
+
+
+def test_get_prometheus_text():
+    recorder = metrics.MetricsRecorder()
+    recorder.add_count('rows', 2, {'table': 'albums'})
+    recorder.add_count('rows', 3, {'table': 'albums'})
+    recorder.add_count('rows', 1, {'table': 'say "hi"\n'})
+    recorder.add_timing('query', 0.25, {'table': 'albums'})
+    recorder.add_timing('query', 0.5, {'table': 'albums'})
+    recorder.add_timing('call', 2.0, {})
+    assert recorder.get_prometheus_text() == _test_prometheus_text
+    recorder.clear()
+    assert recorder.get_prometheus_text() == ''
+
+
+def test_metrics_sink():
+    recorder = _SpanSink()
+    odata_interface = sql_to_odata.ODataInterface(sqlite_filename=_test_sqlite_filename, metrics_sink=recorder)
+    odata_interface.get_table_json(_test_table_name)
+    odata_interface.get_table_json(_test_table_name, page_size=10)
+    with tempfile.TemporaryFile('w') as output_file:
+        odata_interface.write_table_json(_test_table_name, output_file)
+    counts = recorder.get_counts()
+    timings = recorder.get_timings()
+    labels = (('table', _test_table_name),)
+    assert counts[('rows', labels)] == 2 * _test_table_row_count + 11
+    assert counts[('bytes', labels)] > 0
+    assert counts[('cache_misses', (('cache', 'table_names'),))] == 1
+    assert counts[('cache_hits', (('cache', 'table_schemas'),))] > 0
+    assert sorted(n for n, l in timings if l == labels) == _test_phases
+    assert timings[('call', (('method', 'get_table_json'),))][0] == 2
+    assert timings[('call', (('method', 'iter_table_json'),))][0] == 3
+    assert ('call', {'method': 'write_table_json'}) in recorder.spans
+    odata_interface.close()
+
+
+def test_metrics_sink_dump_database():
+    for workers in [None, 2]:
+        recorder = metrics.MetricsRecorder()
+        odata_interface = sql_to_odata.ODataInterface(sqlite_filename=_test_sqlite_filename, metrics_sink=recorder)
+        with tempfile.TemporaryDirectory() as temp_folder:
+            odata_interface.dump_database(temp_folder, workers=workers)
+        counts = recorder.get_counts()
+        timings = recorder.get_timings()
+        labels = (('table', _test_table_name),)
+        # Measurements taken in worker processes are passed back to the sink
+        assert counts[('rows', labels)] == _test_table_row_count
+        assert timings[('dump_table', labels)][0] == 1
+        assert sorted(n for n, l in timings if l == labels) == sorted(['dump_table'] + _test_phases)
+        assert timings[('call', (('method', 'dump_database'),))][0] == 1
+        odata_interface.close()
+
+
+def test_profile_folder():
+    with tempfile.TemporaryDirectory() as temp_folder:
+        profile_folder = os.path.join(temp_folder, 'profiles')
+        odata_interface = sql_to_odata.ODataInterface(sqlite_filename=_test_sqlite_filename,
+                                                      profile_folder=profile_folder)
+        odata_interface.get_table_json(_test_table_name)
+        ''.join(odata_interface.iter_table_json(_test_table_name))
+        odata_interface.dump_database(os.path.join(temp_folder, 'output'), tables_to_include=[_test_table_name],
+                                      workers=2)
+        # Nested calls are part of the outer call's profile, and dump workers profile each table
+        profile_filenames = sorted(f.split('.')[0] for f in os.listdir(profile_folder))
+        assert profile_filenames == ['dump_database', 'dump_table', 'get_table_json', 'iter_table_json']
+        for profile_filename in os.listdir(profile_folder):
+            stats = pstats.Stats(os.path.join(profile_folder, profile_filename))
+            assert stats.total_calls > 0
+        odata_interface.close()
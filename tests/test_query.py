@@ -0,0 +1,175 @@
+import pytest
+
+from sql_to_odata import query
+
+
+_test_field_names = ('TrackId', 'Name', 'AlbumId', 'Composer', 'UnitPrice', 'InvoiceDate')
+
+_test_filters = [
+    ('TrackId eq 1', '("TrackId" IS ?)', [1]),
+    ("Name ne 'It''s'", '("Name" IS NOT ?)', ["It's"]),
+    ('UnitPrice gt 0.99 and AlbumId le 10', '(("UnitPrice" > ?) AND ("AlbumId" <= ?))', [0.99, 10]),
+    ('TrackId lt 5 or not (AlbumId ge 2)', '(("TrackId" < ?) OR (NOT ("AlbumId" >= ?)))', [5, 2]),
+    ('Composer eq null', '("Composer" IS NULL)', []),
+    ('null ne Composer', '(NULL IS NOT "Composer")', []),
+    ('TrackId add 1 mul 2 eq -3', '(("TrackId" + (? * ?)) IS (-?))', [1, 2, 3]),
+    ('TrackId mod 2 eq 0', '(("TrackId" % ?) IS ?)', [2, 0]),
+    ("AlbumId in (1, 2, 3)", '("AlbumId" IN (?, ?, ?))', [1, 2, 3]),
+    ("contains(Name,'Rock')", 'instr("Name", ?) > 0', ['Rock']),
+    ("startswith(tolower(Name),'a')", 'instr(lower("Name"), ?) = 1', ['a']),
+    ("endswith(Name,'z')", '(length(?) = 0 OR substr("Name", -length(?)) = ?)', ['z', 'z', 'z']),
+    ('length(Name) gt 10', '(length("Name") > ?)', [10]),
+    ('year(InvoiceDate) eq 2009', '''(CAST(strftime('%Y', "InvoiceDate") AS INTEGER) IS ?)''', [2009]),
+    ('InvoiceDate ge 2009-01-02', '("InvoiceDate" >= ?)', ['2009-01-02']),
+    ('InvoiceDate lt 2009-01-02T03:04:05+01:00', '("InvoiceDate" < ?)', ['2009-01-02 02:04:05']),
+    ('UnitPrice eq true', '("UnitPrice" IS ?)', [1]),
+]
+
+_test_invalid_filters = [
+    ('', 'Empty filter expression'),
+    ('Missing eq 1', 'Unknown property: Missing'),
+    ('TrackId eq', 'Unexpected end of expression: TrackId eq'),
+    ('TrackId eq 1 1', 'Unexpected "1": TrackId eq 1 1'),
+    ('(TrackId eq 1', 'Unexpected end of expression: (TrackId eq 1'),
+    ("nope(Name)", 'Unsupported function: nope'),
+    ("contains(Name)", 'Wrong number of arguments for function: contains'),
+    ("TrackId eq 'open", 'Invalid expression at position 11: TrackId eq \'open'),
+    ('TrackId; DROP TABLE tracks', 'Invalid expression at position 7: TrackId; DROP TABLE tracks'),
+]
+
+_test_field_types = {'TrackId': 'Edm.Int64', 'Name': 'Edm.String', 'AlbumId': 'Edm.Int32', 'UnitPrice': 'Edm.Decimal',
+                     'Milliseconds': 'Edm.Double'}
+
+_test_applies = [
+    ('groupby((AlbumId))', 'SELECT "AlbumId" FROM "tracks" GROUP BY "AlbumId"', [], {'AlbumId': 'Edm.Int32'}),
+    ('groupby((AlbumId, Name),aggregate(UnitPrice with sum as Total, $count as Count))',
+     'SELECT "AlbumId", "Name", sum("UnitPrice") AS "Total", count(*) AS "Count" FROM "tracks" GROUP BY "AlbumId", "Name"',  # noqa: E501
+     [], {'AlbumId': 'Edm.Int32', 'Name': 'Edm.String', 'Total': 'Edm.Decimal', 'Count': 'Edm.Int64'}),
+    ('aggregate(AlbumId with sum as A,Milliseconds with average as M,Name with min as N,TrackId with countdistinct as T)',  # noqa: E501
+     'SELECT sum("AlbumId") AS "A", avg("Milliseconds") AS "M", min("Name") AS "N", count(DISTINCT "TrackId") AS "T" FROM "tracks"',  # noqa: E501
+     [], {'A': 'Edm.Int64', 'M': 'Edm.Double', 'N': 'Edm.String', 'T': 'Edm.Int64'}),
+    ('aggregate(UnitPrice mul 2 with max as Most)', 'SELECT max(("UnitPrice" * ?)) AS "Most" FROM "tracks"', [2],
+     {'Most': 'Edm.Decimal'}),
+    ("filter(Name ne 'a/b')/groupby((AlbumId),aggregate(UnitPrice with max as Most))/filter(Most gt 1)",
+     'SELECT "AlbumId", "Most" FROM (SELECT "AlbumId", max("UnitPrice") AS "Most" FROM (SELECT "TrackId", "Name", "AlbumId", "UnitPrice", "Milliseconds" FROM "tracks" WHERE ("Name" IS NOT ?)) AS "_apply1" GROUP BY "AlbumId") AS "_apply2" WHERE ("Most" > ?)',  # noqa: E501
+     ['a/b', 1], {'AlbumId': 'Edm.Int32', 'Most': 'Edm.Decimal'}),
+    ('topcount(5,UnitPrice add 1)',
+     'SELECT "TrackId", "Name", "AlbumId", "UnitPrice", "Milliseconds" FROM "tracks" ORDER BY (("UnitPrice" + ?)) IS NULL, (("UnitPrice" + ?)) DESC LIMIT ?',  # noqa: E501
+     [1, 1, 5], _test_field_types),
+]
+
+_test_invalid_applies = [
+    (' ', 'Empty apply expression'),
+    ('groupby((AlbumId))/', 'Invalid transformation: '),
+    ('expand(Album)', 'Unsupported transformation: expand'),
+    ('groupby(AlbumId)', 'Invalid groupby transformation: groupby(AlbumId)'),
+    ('groupby((AlbumId),filter(AlbumId eq 1))', 'Invalid groupby transformation: groupby((AlbumId),filter(AlbumId eq 1))'),  # noqa: E501
+    ('groupby((Missing))', 'Unknown property: Missing'),
+    ('aggregate(UnitPrice)', 'Invalid aggregate expression: UnitPrice'),
+    ('aggregate(UnitPrice with median as Median)', 'Unsupported aggregation method: median'),
+    ('groupby((Name),aggregate($count as Name))', 'Duplicate property: Name'),
+    ('aggregate($count as Count)/filter(TrackId eq 1)', 'Unknown property: TrackId'),
+    ('topcount(-1,UnitPrice)', 'Invalid value for topcount: -1'),
+    ('topcount(1)', 'Invalid topcount transformation: topcount(1)'),
+]
+
+_test_navigation_names = ('albums', 'genres', 'invoice_items')
+
+_test_expands = [
+    ('albums', {'albums': {}}),
+    (' genres , albums($select=Title;$expand=artists($select=Name))',
+     {'genres': {}, 'albums': {'$select': 'Title', '$expand': 'artists($select=Name)'}}),
+    ("invoice_items($filter=Quantity gt 1 and UnitPrice ne 0.99;$orderby=Quantity desc)",
+     {'invoice_items': {'$filter': 'Quantity gt 1 and UnitPrice ne 0.99', '$orderby': 'Quantity desc'}}),
+    ('genres,*', {'genres': {}, 'albums': {}, 'invoice_items': {}}),
+]
+
+_test_invalid_expands = [
+    ('artists', 'Unknown navigation property: artists'),
+    ('albums,albums', 'Duplicate navigation property: albums'),
+    ('albums($top=1)', 'Unsupported expand option: $top'),
+    ('albums(', 'Invalid expand expression: albums('),
+]
+
+
+def test_compile_filter():
+    for expression, expected_sql, expected_parameters in _test_filters:
+        assert query.compile_filter(expression, _test_field_names) == (expected_sql, expected_parameters)
+    functions = {'contains': {2: 'strpos({0}, {1}) > 0'}}
+    expected_filter = ('(strpos("Name", ?) > 0 AND instr("Composer", ?) = 1)', ['Rock', 'A'])
+    assert query.compile_filter("contains(Name,'Rock') and startswith(Composer,'A')", _test_field_names,
+                                functions) == expected_filter
+
+
+def test_compile_invalid_filter():
+    for expression, expected_message in _test_invalid_filters:
+        with pytest.raises(ValueError) as error:
+            query.compile_filter(expression, _test_field_names)
+        assert error.value.args[0] == expected_message
+
+
+def test_compile_select():
+    assert query.compile_select('Name,TrackId', _test_field_names) == ['Name', 'TrackId']
+    assert query.compile_select(' Name , Name ', _test_field_names) == ['Name']
+    assert query.compile_select('*', _test_field_names) == list(_test_field_names)
+    with pytest.raises(ValueError) as error:
+        query.compile_select('Name,Missing', _test_field_names)
+    assert error.value.args[0] == 'Unknown property: Missing'
+
+
+def test_compile_orderby():
+    assert query.compile_orderby('Name', _test_field_names) == '"Name" ASC'
+    assert query.compile_orderby('UnitPrice desc, Name asc', _test_field_names) == '"UnitPrice" DESC, "Name" ASC'
+    with pytest.raises(ValueError) as error:
+        query.compile_orderby('Name sideways', _test_field_names)
+    assert error.value.args[0] == 'Invalid orderby expression: Name sideways'
+    with pytest.raises(ValueError) as error:
+        query.compile_orderby('Missing desc', _test_field_names)
+    assert error.value.args[0] == 'Unknown property: Missing'
+
+
+def test_compile_count():
+    assert query.compile_count('true') is True
+    assert query.compile_count(False) is False
+    with pytest.raises(ValueError) as error:
+        query.compile_count('yes')
+    assert error.value.args[0] == 'Invalid value for $count: yes'
+
+
+def test_compile_non_negative_integer():
+    assert query.compile_non_negative_integer('$top', '10') == 10
+    assert query.compile_non_negative_integer('$skip', 0) == 0
+    for value in ['-1', 'ten', -5, '1.5', True, None]:
+        with pytest.raises(ValueError) as error:
+            query.compile_non_negative_integer('$top', value)
+        assert error.value.args[0] == f'Invalid value for $top: {value}'
+
+
+def test_quote_identifier():
+    assert query.quote_identifier('Name') == '"Name"'
+    assert query.quote_identifier('Odd"Name') == '"Odd""Name"'
+
+
+def test_compile_expand():
+    for expression, expected_expansions in _test_expands:
+        assert query.compile_expand(expression, _test_navigation_names) == expected_expansions
+
+
+def test_compile_invalid_expand():
+    for expression, expected_message in _test_invalid_expands:
+        with pytest.raises(ValueError) as error:
+            query.compile_expand(expression, _test_navigation_names)
+        assert error.value.args[0] == expected_message
+
+
+def test_compile_apply():
+    for expression, expected_sql, expected_parameters, expected_types in _test_applies:
+        assert query.compile_apply(expression, '"tracks"', _test_field_types) == (expected_sql, expected_parameters,
+                                                                                  expected_types)
+
+
+def test_compile_invalid_apply():
+    for expression, expected_message in _test_invalid_applies:
+        with pytest.raises(ValueError) as error:
+            query.compile_apply(expression, '"tracks"', _test_field_types)
+        assert error.value.args[0] == expected_message
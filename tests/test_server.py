@@ -0,0 +1,124 @@
+import asyncio
+import functools
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+
+import pytest
+import requests
+import ujson
+
+import sql_to_odata
+import sql_to_odata.server
+from tests.test_sql_to_odata import _test_sqlite_filename, _test_table_name
+
+
+@pytest.fixture(scope='module')
+def server_state():
+    with tempfile.TemporaryDirectory() as temp_folder:
+        sqlite_filename = os.path.join(temp_folder, 'test.db')
+        shutil.copyfile(_test_sqlite_filename, sqlite_filename)
+        loop = asyncio.new_event_loop()
+        server = sql_to_odata.server.ODataServer(sqlite_filename=sqlite_filename, port=0, workers=2)
+        loop.run_until_complete(server.start())
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        odata_interface = sql_to_odata.ODataInterface(sqlite_filename=sqlite_filename)
+        yield f'http://127.0.0.1:{server.port}', sqlite_filename, odata_interface
+        asyncio.run_coroutine_threadsafe(server.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+
+
+def test_service_and_metadata(server_state):
+    url, _, odata_interface = server_state
+    for path in ['', '/$service']:
+        response = requests.get(url + path, timeout=10)
+        assert response.status_code == 200
+        assert response.headers['Content-Type'] == 'application/json;odata.metadata=minimal'
+        assert response.headers['OData-Version'] == '4.0'
+        assert response.text == odata_interface.get_database_service_json()
+    response = requests.get(url + '/$metadata', timeout=10)
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == 'application/xml'
+    assert response.text == odata_interface.get_database_schema_xml()
+
+
+def test_entity_sets(server_state):
+    url, _, odata_interface = server_state
+    with requests.Session() as session:
+        for table_name in odata_interface.get_table_names():
+            response = session.get(f'{url}/{table_name}', timeout=10)
+            assert response.status_code == 200
+            assert response.headers['Transfer-Encoding'] == 'chunked'
+            assert response.text == odata_interface.get_table_json(table_name)
+    query_options = {'$filter': 'AlbumId lt 20', '$select': 'Title', '$orderby': 'Title desc', '$count': 'true'}
+    response = requests.get(f'{url}/{_test_table_name}', params=query_options, timeout=10)
+    assert response.status_code == 200
+    assert response.text == odata_interface.query_table_json(_test_table_name, query_options)
+    query_options = {'$top': '2', '$format': 'json', 'debug': 'true'}
+    response = requests.get(f'{url}/{_test_table_name}', params=query_options, timeout=10)
+    assert response.status_code == 200
+    assert response.text == odata_interface.query_table_json(_test_table_name, {'$top': '2'})
+    response = requests.get(f'{url}/{_test_table_name}', params={'debug': 'true'}, timeout=10)
+    assert response.text == odata_interface.get_table_json(_test_table_name)
+    response = requests.head(f'{url}/{_test_table_name}', timeout=10)
+    assert response.status_code == 200
+    assert response.text == ''
+
+
+def test_errors(server_state):
+    url, _, _ = server_state
+    response = requests.get(f'{url}/does-not-exist', timeout=10)
+    assert response.status_code == 404
+    assert ujson.loads(response.text) == {'error': {'code': '404', 'message': 'Resource not found: does-not-exist'}}
+    response = requests.get(f'{url}/{_test_table_name}', params={'$filter': 'Missing eq 1'}, timeout=10)
+    assert response.status_code == 400
+    assert ujson.loads(response.text)['error']['message'] == 'Unknown property: Missing'
+    response = requests.post(f'{url}/{_test_table_name}', timeout=10)
+    assert response.status_code == 405
+
+
+def test_etags(server_state):
+    url, sqlite_filename, odata_interface = server_state
+    response = requests.get(f'{url}/{_test_table_name}', timeout=10)
+    etag = response.headers['ETag']
+    assert requests.get(f'{url}/$metadata', timeout=10).headers['ETag'] == etag
+    response = requests.get(f'{url}/{_test_table_name}', headers={'If-None-Match': etag}, timeout=10)
+    assert response.status_code == 304
+    assert response.text == ''
+    with sqlite3.connect(sqlite_filename) as connection:
+        connection.execute('UPDATE albums SET Title = ? WHERE AlbumId = 1', ['Changed'])
+    connection.close()
+    response = requests.get(f'{url}/{_test_table_name}', headers={'If-None-Match': etag}, timeout=10)
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert ujson.loads(response.text)['value'][0]['Title'] == 'Changed'
+
+
+def test_paging():
+    with tempfile.TemporaryDirectory() as temp_folder:
+        sqlite_filename = os.path.join(temp_folder, 'test.db')
+        shutil.copyfile(_test_sqlite_filename, sqlite_filename)
+        odata_interface = sql_to_odata.ODataInterface(sqlite_filename=sqlite_filename)
+
+        async def fetch_pages():
+            server = sql_to_odata.server.ODataServer(sqlite_filename=sqlite_filename, port=0, page_size=100)
+            await server.start()
+            url = f'http://127.0.0.1:{server.port}/'
+            table_rows = []
+            next_link = _test_table_name
+            while next_link is not None:
+                request = functools.partial(requests.get, url + next_link, timeout=10)
+                response = await asyncio.get_running_loop().run_in_executor(None, request)
+                table_page = ujson.loads(response.text)
+                table_rows.extend(table_page['value'])
+                next_link = table_page.get('@odata.nextLink')
+            await server.close()
+            # Closing the server closes the connections of its readers
+            with pytest.raises(sqlite3.ProgrammingError):
+                server._watcher._interface.get_table_names()
+            return table_rows
+        assert asyncio.run(fetch_pages()) == odata_interface.get_table_rows(_test_table_name)
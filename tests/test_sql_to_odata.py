@@ -1,13 +1,18 @@
+import base64
+import gzip
 import hashlib
 import io
 import os
+import shutil
 import sqlite3
 import tempfile
+import time
 import zipfile
 
 import pytest
 import requests
 import toml
+import ujson
 
 import sql_to_odata
 
@@ -175,6 +180,8 @@ _test_database_subset_schema_xml = '''<?xml version="1.0" encoding="utf-8"?>
 
 _test_table_row_count = 347
 
+_test_invoices_arrow_types = ['int64', 'int64', 'timestamp[us, tz=UTC]', 'string', 'string', 'string', 'string', 'string', 'double']  # noqa: E501
+
 _test_table_json_length = 22353
 _test_table_json_length_formatted = 43191
 
@@ -182,6 +189,63 @@ _test_dump_database_hash = '1bacd895dd83151d1ef3b16c23218da1d1c96b21bdac86bdd88d
 _test_dump_database_subset_hash = '6efe6330b4f62867f8aad48b491b8eeefca121b4e53fc699a12e1fdc9a1be607'
 _test_dump_database_formatted_hash = 'c283182079b8c34ad1782bf42356bbb511c10737d0732d1bfb17fd58b4bbfb28'
 
+_test_table_schema_strict_xml = '''<EntityType Name="albums">
+<Key>
+<PropertyRef Name="AlbumId" />
+</Key>
+<Property Name="AlbumId" Type="Edm.Int64" Nullable="false" />
+<Property Name="Title" Type="Edm.String" Nullable="false" />
+<Property Name="ArtistId" Type="Edm.Int64" Nullable="false" />
+</EntityType>'''
+
+_test_typed_schema_xml = '''<EntityType Name="typed">
+<Key>
+<PropertyRef Name="Code" />
+<PropertyRef Name="Id" />
+</Key>
+<Property Name="Id" Type="Edm.Int64" Nullable="false" />
+<Property Name="Code" Type="Edm.String" Nullable="false" DefaultValue="a&amp;b" />
+<Property Name="Active" Type="Edm.Boolean" DefaultValue="true" />
+<Property Name="Price" Type="Edm.Decimal" />
+<Property Name="Updated" Type="Edm.DateTimeOffset" />
+</EntityType>'''
+
+_test_typed_json = '{"@odata.context":"$metadata#typed","value":[{"Id":1,"Code":"x","Active":false,"Price":0.99,"Updated":"2009-01-01T10:00:00Z"},{"Id":2,"Code":"a&b","Active":true,"Price":null,"Updated":null}]}'  # noqa: E501
+
+_test_aggregations = {
+    'tracks_by_album': ('tracks', 'filter(AlbumId ne null)/groupby((AlbumId),aggregate(Milliseconds with sum as Length,$count as Tracks))'),  # noqa: E501
+    'track_totals': ('tracks', 'aggregate(Bytes with max as Largest,GenreId with countdistinct as Genres)'),
+}
+
+_test_aggregations_schema_xml = '''<EntityType Name="tracks_by_album">
+<Property Name="AlbumId" Type="Edm.Int64" />
+<Property Name="Length" Type="Edm.Int64" />
+<Property Name="Tracks" Type="Edm.Int64" />
+</EntityType>
+<EntityType Name="track_totals">
+<Property Name="Largest" Type="Edm.Int64" />
+<Property Name="Genres" Type="Edm.Int64" />
+</EntityType>
+</Schema>'''
+
+_test_employees_navigation_properties = [
+    ('customers', 'customers', True, ('EmployeeId',), ('SupportRepId',), 'employees'),
+    ('employees_ReportsTo', 'employees', False, ('ReportsTo',), ('EmployeeId',), 'employees_by_ReportsTo'),
+    ('employees_by_ReportsTo', 'employees', True, ('EmployeeId',), ('ReportsTo',), 'employees_ReportsTo'),
+]
+
+_test_table_schema_navigation_xml = '''<EntityType Name="albums">
+<Property Name="AlbumId" Type="Edm.Int64" />
+<Property Name="Title" Type="Edm.String" />
+<Property Name="ArtistId" Type="Edm.Int64" />
+<NavigationProperty Name="artists" Type="DCT.artists" Nullable="false" Partner="albums">
+<ReferentialConstraint Property="ArtistId" ReferencedProperty="ArtistId" />
+</NavigationProperty>
+<NavigationProperty Name="tracks" Type="Collection(DCT.tracks)" Partner="albums" />
+</EntityType>'''
+
+_test_binary_rows = [(1, b'\xfb\xff\x00'), (2, bytes(range(256)) * 4), (3, None), (4, b'photo')]
+
 
 with open('pyproject.toml') as project_file:
     _test_project = toml.load(project_file)
@@ -244,6 +308,21 @@ def test_get_database_schema_xml():
 def test_get_table_rows():
     table_rows = _odata_interface.get_table_rows(_test_table_name)
     assert len(table_rows) == _test_table_row_count
+    with sqlite3.connect(_test_sqlite_filename) as connection:
+        cursor = connection.execute(f'SELECT * FROM {_test_table_name}')  # nosec - constant table name
+        field_names = [d[0] for d in cursor.description]
+        assert table_rows == [dict(zip(field_names, r)) for r in cursor.fetchall()]
+
+
+def test_get_row_builder():
+    rows = [(1, 'a', None), (2, 'b"\'', 2.5)]
+    for field_names in [('a', 'b', 'c'), ('x"', "y'\\", 'é z'), ('a', 'b', 'a')]:
+        build_rows = sql_to_odata._get_row_builder(field_names)
+        assert build_rows(rows) == [dict(zip(field_names, r)) for r in rows]
+        assert ujson.dumps(build_rows(rows)) == ujson.dumps([dict(zip(field_names, r)) for r in rows])
+        assert sql_to_odata._get_row_builder(field_names[1:], 1)(rows) == [dict(zip(field_names[1:], r[1:])) for r in rows]  # noqa: E501
+    assert sql_to_odata._get_row_builder(('a',))([(1,), (2,)]) == [{'a': 1}, {'a': 2}]
+    assert sql_to_odata._get_row_builder(('a',))([]) == []
 
 
 def test_get_table_json():
@@ -253,6 +332,224 @@ def test_get_table_json():
     assert len(table_json) == _test_table_json_length_formatted
 
 
+def test_iter_table_json():
+    for batch_size in [1, 7, 1000]:
+        table_json = ''.join(_odata_interface.iter_table_json(_test_table_name, batch_size=batch_size))
+        assert table_json == _odata_interface.get_table_json(_test_table_name)
+        table_json = ''.join(_odata_interface.iter_table_json(_test_table_name, formatted=True, batch_size=batch_size))
+        assert table_json == _odata_interface.get_table_json(_test_table_name, formatted=True)
+    table_json = ujson.dumps({'@odata.context': f'$metadata#{_test_table_name}', 'value': _odata_interface.get_table_rows(_test_table_name)}, indent=4)  # noqa: E501
+    assert table_json == _odata_interface.get_table_json(_test_table_name, formatted=True)
+
+
+def test_write_table_json():
+    with tempfile.TemporaryFile('w+') as table_file:
+        _odata_interface.write_table_json(_test_table_name, table_file, batch_size=10)
+        table_file.seek(0)
+        assert table_file.read() == _odata_interface.get_table_json(_test_table_name)
+
+
+def test_get_table_key():
+    assert _odata_interface.get_table_key(_test_table_name) == ['AlbumId']
+    assert _odata_interface.get_table_key('playlist_track') == ['PlaylistId', 'TrackId']
+
+
+def test_get_table_json_paged():
+    for table_name in [_test_table_name, 'playlist_track']:
+        for formatted in [False, True]:
+            table_rows = []
+            skip_token = None
+            while True:
+                table_page = ujson.loads(_odata_interface.get_table_json(table_name, formatted, 100, skip_token))
+                assert table_page['@odata.context'] == f'$metadata#{table_name}'
+                assert len(table_page['value']) <= 100
+                table_rows.extend(table_page['value'])
+                if '@odata.nextLink' not in table_page:
+                    break
+                assert len(table_page['value']) == 100
+                next_link_prefix = f'{table_name}?$skiptoken='
+                assert table_page['@odata.nextLink'].startswith(next_link_prefix)
+                skip_token = table_page['@odata.nextLink'][len(next_link_prefix):]
+            key_names = _odata_interface.get_table_key(table_name)
+            expected_rows = _odata_interface.get_table_rows(table_name)
+            assert table_rows == sorted(expected_rows, key=lambda r: [r[k] for k in key_names])
+    table_json = _odata_interface.get_table_json(_test_table_name, page_size=_test_table_row_count)
+    assert table_json == _odata_interface.get_table_json(_test_table_name)
+    # A skip token without a page size continues to the end of the table
+    first_page = ujson.loads(_odata_interface.get_table_json(_test_table_name, page_size=10))
+    skip_token = first_page['@odata.nextLink'].split('$skiptoken=')[1]
+    table_page = ujson.loads(_odata_interface.get_table_json(_test_table_name, skip_token=skip_token))
+    assert table_page['value'] == _odata_interface.get_table_rows(_test_table_name)[10:]
+    assert '@odata.nextLink' not in table_page
+    with pytest.raises(ValueError) as error:
+        _odata_interface.get_table_json(_test_table_name, page_size=0)
+    assert error.value.args[0] == 'Invalid page size: 0'
+    with pytest.raises(ValueError) as error:
+        _odata_interface.iter_table_json(_test_table_name, page_size=0)
+    assert error.value.args[0] == 'Invalid page size: 0'
+    with pytest.raises(ValueError) as error:
+        _odata_interface.get_table_json(_test_table_name, page_size=10, skip_token='not-a-token')  # nosec
+    assert error.value.args[0] == 'Invalid skip token: not-a-token'
+
+
+def test_get_table_json_paged_null_keys():
+    with tempfile.TemporaryDirectory() as temp_folder:
+        sqlite_filename = os.path.join(temp_folder, 'test.db')
+        output_folder = os.path.join(temp_folder, 'output')
+        with sqlite3.connect(sqlite_filename) as connection:
+            # Primary keys of rowid tables may hold NULL values, which no comparison with a key matches
+            connection.execute('CREATE TABLE codes (Code TEXT PRIMARY KEY, Content BLOB)')
+            connection.execute('CREATE TABLE pairs (a INTEGER, b TEXT, PRIMARY KEY (a, b))')
+            connection.execute('CREATE TABLE exact (Code TEXT PRIMARY KEY) WITHOUT ROWID')
+            connection.executemany('INSERT INTO codes VALUES (?, ?)',
+                                   [(None if i % 3 == 1 else f'c{9 - i}', bytes(i * 50)) for i in range(10)])
+            connection.executemany('INSERT INTO pairs VALUES (?, ?)',
+                                   [(i % 2 or None, None if i % 4 < 2 else str(i)) for i in range(20)])
+            connection.executemany('INSERT INTO exact VALUES (?)', [(f'c{9 - i}',) for i in range(10)])
+        connection.close()
+        odata_interface = sql_to_odata.ODataInterface(sqlite_filename=sqlite_filename)
+        for table_name in ['codes', 'pairs', 'exact']:
+            for media_threshold in [None, 100]:
+                shutil.rmtree(output_folder, ignore_errors=True)
+                odata_interface.dump_database(output_folder, tables_to_include=[table_name], page_size=3,
+                                              media_threshold=media_threshold)
+                table_rows = []
+                table_filename = table_name
+                while table_filename is not None:
+                    with open(os.path.join(output_folder, table_filename)) as table_file:
+                        table_page = ujson.loads(table_file.read())
+                    table_rows += table_page['value']
+                    table_filename = table_page.get('@odata.nextLink')
+                assert len(table_rows) == len(odata_interface.get_table_rows(table_name))
+        # Tables without row identifiers are still paged in primary key order
+        assert [r['Code'] for r in table_rows] == [f'c{i}' for i in range(10)]
+        odata_interface.close()
+
+
+def test_query_table_rows():
+    all_rows = _odata_interface.get_table_rows('tracks')
+    query_options = {'$filter': "UnitPrice gt 1 and Composer ne null", '$select': 'TrackId,Name,UnitPrice'}
+    expected_rows = [{k: r[k] for k in ('TrackId', 'Name', 'UnitPrice')} for r in all_rows
+                     if r['UnitPrice'] > 1 and r['Composer'] is not None]
+    assert _odata_interface.query_table_rows('tracks', query_options) == expected_rows
+    # Rows with a null value are not equal to any other value, so they match ne
+    invoice_rows = _odata_interface.get_table_rows('invoices')
+    for operator, expected_ids in [('eq', [r['InvoiceId'] for r in invoice_rows if r['BillingState'] == 'SP']),
+                                   ('ne', [r['InvoiceId'] for r in invoice_rows if r['BillingState'] != 'SP'])]:
+        query_options = {'$filter': f"BillingState {operator} 'SP'", '$select': 'InvoiceId'}
+        assert [r['InvoiceId'] for r in _odata_interface.query_table_rows('invoices', query_options)] == expected_ids
+    query_options = {'$orderby': 'Milliseconds desc,TrackId', '$top': '5', '$skip': '2'}
+    expected_rows = sorted(all_rows, key=lambda r: (-r['Milliseconds'], r['TrackId']))[2:7]
+    assert _odata_interface.query_table_rows('tracks', query_options) == expected_rows
+    assert _odata_interface.query_table_rows('tracks', {'$skip': 3500}) == all_rows[3500:]
+    assert _odata_interface.query_table_rows('tracks', {}) == all_rows
+
+
+def test_query_table_json():
+    query_options = {'$filter': 'AlbumId le 10', '$select': 'AlbumId,Title', '$top': 3, '$count': 'true'}
+    for formatted in [False, True]:
+        table_json = _odata_interface.query_table_json(_test_table_name, query_options, formatted)
+        table_page = ujson.loads(table_json)
+        assert list(table_page) == ['@odata.context', '@odata.count', 'value']
+        assert table_page['@odata.context'] == '$metadata#albums(AlbumId,Title)'
+        assert table_page['@odata.count'] == 10
+        assert table_page['value'] == _odata_interface.query_table_rows(_test_table_name, query_options)
+        if formatted:
+            assert table_json == ujson.dumps(table_page, indent=4)
+        else:
+            assert table_json == ujson.dumps(table_page, separators=(',', ':'))
+    assert _odata_interface.query_table_json(_test_table_name, {}) == _odata_interface.get_table_json(_test_table_name)
+    with pytest.raises(ValueError) as error:
+        _odata_interface.query_table_json(_test_table_name, {'$search': 'artists'})
+    assert error.value.args[0] == 'Unsupported query option: $search'
+    with pytest.raises(ValueError) as error:
+        _odata_interface.query_table_json('does-not-exist', {})
+    assert error.value.args[0] == 'Table not found: does-not-exist'
+
+
+def test_query_table_aggregated():
+    all_rows = _odata_interface.get_table_rows('tracks')
+    album_lengths = {}
+    for row in all_rows:
+        album_lengths[row['AlbumId']] = album_lengths.get(row['AlbumId'], 0) + row['Milliseconds']
+    expected_rows = sorted(({'AlbumId': k, 'Length': v} for k, v in album_lengths.items()),
+                           key=lambda r: (-r['Length'], r['AlbumId']))
+    query_options = {'$apply': 'groupby((AlbumId),aggregate(Milliseconds with sum as Length))',
+                     '$orderby': 'Length desc,AlbumId', '$top': 3, '$count': 'true'}
+    table_page = ujson.loads(_odata_interface.query_table_json('tracks', query_options))
+    assert table_page['@odata.context'] == '$metadata#tracks(AlbumId,Length)'
+    assert table_page['@odata.count'] == len(album_lengths)
+    assert table_page['value'] == expected_rows[:3]
+    query_options = {'$apply': "filter(UnitPrice gt 1)/aggregate($count as Count,UnitPrice with average as Price)"}
+    expensive_prices = [r['UnitPrice'] for r in all_rows if r['UnitPrice'] > 1]
+    assert _odata_interface.query_table_rows('tracks', query_options) == [
+        {'Count': len(expensive_prices), 'Price': pytest.approx(sum(expensive_prices) / len(expensive_prices))}]
+    query_options = {'$apply': 'topcount(2,Milliseconds)', '$select': 'TrackId'}
+    expected_rows = [{'TrackId': r['TrackId']} for r in sorted(all_rows, key=lambda r: -r['Milliseconds'])[:2]]
+    assert _odata_interface.query_table_rows('tracks', query_options) == expected_rows
+    with pytest.raises(ValueError) as error:
+        _odata_interface.query_table_rows('tracks', {'$apply': 'groupby((AlbumId))', '$select': 'Name'})
+    assert error.value.args[0] == 'Unknown property: Name'
+
+
+def test_get_table_navigation_properties():
+    assert _odata_interface.get_table_navigation_properties('employees') == _test_employees_navigation_properties
+    assert _odata_interface.get_table_schema_xml(_test_table_name) == _test_table_schema_xml
+    odata_interface = sql_to_odata.ODataInterface(sqlite_filename=_test_sqlite_filename, navigation_properties=True)
+    assert odata_interface.get_table_schema_xml(_test_table_name) == _test_table_schema_navigation_xml
+    odata_interface.close()
+
+
+def test_query_table_expanded():
+    all_tracks = _odata_interface.get_table_rows('tracks')
+    all_genres = {r['GenreId']: r for r in _odata_interface.get_table_rows('genres')}
+    all_invoice_items = _odata_interface.get_table_rows('invoice_items')
+    query_options = {'$select': 'Title', '$top': 20, '$expand': 'artists,tracks($select=Name;$expand=genres)'}
+    albums = _odata_interface.query_table_rows(_test_table_name, {'$top': 20})
+    expanded_albums = _odata_interface.query_table_rows(_test_table_name, query_options)
+    for album, expanded_album in zip(albums, expanded_albums):
+        assert list(expanded_album) == ['Title', 'artists', 'tracks']
+        assert expanded_album['artists']['ArtistId'] == album['ArtistId']
+        expected_tracks = [{'Name': r['Name'], 'genres': all_genres.get(r['GenreId'])}
+                           for r in all_tracks if r['AlbumId'] == album['AlbumId']]
+        assert expanded_album['tracks'] == expected_tracks
+    table_json = _odata_interface.query_table_json(_test_table_name, query_options)
+    assert table_json.startswith('{"@odata.context":"$metadata#albums(Title)","value":[{')
+    assert ujson.loads(table_json)['value'] == expanded_albums
+    with pytest.raises(ValueError) as error:
+        _odata_interface.query_table_rows(_test_table_name, {'$expand': 'genres'})
+    assert error.value.args[0] == 'Unknown navigation property: genres'
+    with pytest.raises(ValueError) as error:
+        _odata_interface.query_table_rows(_test_table_name, {'$expand': 'tracks', '$apply': 'groupby((ArtistId))'})
+    assert error.value.args[0] == 'Unsupported query option with $apply: $expand'
+    # Keys are matched in chunks within the parameter limit, here that of SQLite before 3.32
+    odata_interface = sql_to_odata.ODataInterface(sqlite_filename=_test_sqlite_filename, arraysize=5000)
+    odata_interface._connection.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+    expanded_tracks = odata_interface.query_table_rows('tracks', {'$expand': 'invoice_items($filter=Quantity ge 1)'})
+    assert sum(len(r['invoice_items']) for r in expanded_tracks) == len(all_invoice_items)
+    odata_interface.close()
+    with tempfile.TemporaryDirectory() as temp_folder:
+        sqlite_filename = os.path.join(temp_folder, 'test.db')
+        with sqlite3.connect(sqlite_filename) as connection:
+            connection.execute('''CREATE TABLE orders (region TEXT, number INTEGER, PRIMARY KEY (region, number))''')
+            connection.execute('''CREATE TABLE lines (id INTEGER PRIMARY KEY, region TEXT, number INTEGER,
+                                  FOREIGN KEY (region, number) REFERENCES orders)''')
+            connection.execute("INSERT INTO orders VALUES ('eu', 1), ('eu', 2), ('us', 1)")
+            connection.execute("INSERT INTO lines VALUES (1, 'eu', 1), (2, 'us', 1), (3, 'eu', 1), (4, NULL, 1)")
+        connection.close()
+        odata_interface = sql_to_odata.ODataInterface(sqlite_filename=sqlite_filename, arraysize=2)
+        statements = []
+        odata_interface._connection.set_trace_callback(statements.append)
+        assert odata_interface.query_table_rows('orders', {'$expand': 'lines($select=id)'}) == [
+            {'region': 'eu', 'number': 1, 'lines': [{'id': 1}, {'id': 3}]}, {'region': 'eu', 'number': 2, 'lines': []},
+            {'region': 'us', 'number': 1, 'lines': [{'id': 2}]}]
+        # The related rows are fetched with a single query for each batch of rows, not one for each row
+        assert len([s for s in statements if s.startswith('SELECT "id"')]) == 2
+        assert [r['orders'] for r in odata_interface.query_table_rows('lines', {'$expand': 'orders'})] == [
+            {'region': 'eu', 'number': 1}, {'region': 'us', 'number': 1}, {'region': 'eu', 'number': 1}, None]
+        odata_interface.close()
+
+
 def test_dump_database():
     with tempfile.TemporaryDirectory() as temp_folder:
         _odata_interface.dump_database(temp_folder)
@@ -286,6 +583,468 @@ def test_dump_database():
         assert output_hash.hexdigest() == _test_dump_database_formatted_hash
 
 
+def test_dump_database_parallel():
+    for formatted in [False, True]:
+        with tempfile.TemporaryDirectory() as serial_folder, tempfile.TemporaryDirectory() as parallel_folder:
+            _odata_interface.dump_database(serial_folder, formatted=formatted)
+            _odata_interface.dump_database(parallel_folder, formatted=formatted, workers=3)
+            output_filenames = sorted(os.listdir(parallel_folder))
+            assert output_filenames == sorted(os.listdir(serial_folder))
+            for output_filename in output_filenames:
+                with open(os.path.join(serial_folder, output_filename), 'rb') as serial_file:
+                    with open(os.path.join(parallel_folder, output_filename), 'rb') as parallel_file:
+                        assert serial_file.read() == parallel_file.read()
+
+
+def test_dump_database_paged():
+    with tempfile.TemporaryDirectory() as temp_folder:
+        _odata_interface.dump_database(temp_folder, tables_to_include=[_test_table_name], page_size=100)
+        output_filenames = sorted(os.listdir(temp_folder))
+        assert output_filenames == ['$metadata', '$service', 'albums', 'albums.2', 'albums.3', 'albums.4']
+        table_rows = []
+        table_filename = _test_table_name
+        while True:
+            with open(os.path.join(temp_folder, table_filename)) as table_file:
+                table_page = ujson.load(table_file)
+            table_rows.extend(table_page['value'])
+            if '@odata.nextLink' not in table_page:
+                break
+            table_filename = table_page['@odata.nextLink']
+        assert table_rows == _odata_interface.get_table_rows(_test_table_name)
+
+
+def test_dump_database_incremental():
+    with tempfile.TemporaryDirectory() as temp_folder:
+        sqlite_filename = os.path.join(temp_folder, 'test.db')
+        shutil.copyfile(_test_sqlite_filename, sqlite_filename)
+        odata_interface = sql_to_odata.ODataInterface(sqlite_filename=sqlite_filename)
+        full_folder = os.path.join(temp_folder, 'full')
+        incremental_folder = os.path.join(temp_folder, 'incremental')
+        odata_interface.dump_database(incremental_folder, incremental=True)
+        output_filenames = sorted(os.listdir(incremental_folder))
+        assert output_filenames == ['$metadata', '$service', '.manifest.json'] + _test_table_names
+        output_mtimes = {f: os.stat(os.path.join(incremental_folder, f)).st_mtime_ns for f in output_filenames}
+        time.sleep(0.01)
+        with sqlite3.connect(sqlite_filename) as connection:
+            connection.execute('UPDATE artists SET Name = ? WHERE ArtistId = 1', ['Changed'])
+        connection.close()
+        odata_interface.dump_database(incremental_folder, incremental=True)
+        odata_interface.dump_database(full_folder)
+        for output_filename in output_filenames:
+            output_mtime = os.stat(os.path.join(incremental_folder, output_filename)).st_mtime_ns
+            changed_filenames = ['artists', '.manifest.json']
+            assert (output_mtime != output_mtimes[output_filename]) == (output_filename in changed_filenames)
+            if output_filename != '.manifest.json':
+                with open(os.path.join(full_folder, output_filename), 'rb') as full_file:
+                    with open(os.path.join(incremental_folder, output_filename), 'rb') as incremental_file:
+                        assert full_file.read() == incremental_file.read()
+        odata_interface.dump_database(incremental_folder, formatted=True, incremental=True, workers=2)
+        odata_interface.dump_database(full_folder, formatted=True)
+        for output_filename in os.listdir(full_folder):
+            with open(os.path.join(full_folder, output_filename), 'rb') as full_file:
+                with open(os.path.join(incremental_folder, output_filename), 'rb') as incremental_file:
+                    assert full_file.read() == incremental_file.read()
+        assert sorted(os.listdir(incremental_folder)) == output_filenames
+
+
+def test_dump_database_incremental_paged():
+    with tempfile.TemporaryDirectory() as temp_folder:
+        sqlite_filename = os.path.join(temp_folder, 'test.db')
+        shutil.copyfile(_test_sqlite_filename, sqlite_filename)
+        odata_interface = sql_to_odata.ODataInterface(sqlite_filename=sqlite_filename)
+        output_folder = os.path.join(temp_folder, 'output')
+        dump_options = {'tables_to_include': [_test_table_name], 'page_size': 100, 'compression': 'gzip',
+                        'incremental': True}
+        odata_interface.dump_database(output_folder, **dump_options)
+        page_filenames = ['albums', 'albums.2', 'albums.3', 'albums.4']
+        output_filenames = sorted(page_filenames + [f + '.gz' for f in page_filenames])
+        assert sorted(f for f in os.listdir(output_folder) if f.startswith('albums')) == output_filenames
+        # A missing page of an unchanged table, or a sidecar of one, is written again
+        os.remove(os.path.join(output_folder, 'albums.3.gz'))
+        odata_interface.dump_database(output_folder, **dump_options)
+        assert sorted(f for f in os.listdir(output_folder) if f.startswith('albums')) == output_filenames
+        # Pages past the last one of a table that shrank are removed
+        with sqlite3.connect(sqlite_filename) as connection:
+            connection.execute('DELETE FROM albums WHERE AlbumId > 150')
+        connection.close()
+        odata_interface.dump_database(output_folder, **dump_options)
+        output_filenames = ['albums', 'albums.2', 'albums.2.gz', 'albums.gz']
+        assert sorted(f for f in os.listdir(output_folder) if f.startswith('albums')) == output_filenames
+        with open(os.path.join(output_folder, 'albums.2')) as table_file:
+            assert '@odata.nextLink' not in ujson.load(table_file)
+        odata_interface.close()
+
+
+def test_get_table_fingerprint():
+    table_fingerprint = _odata_interface.get_table_fingerprint(_test_table_name)
+    assert table_fingerprint['rows'] == _test_table_row_count
+    assert table_fingerprint['schema'] == [list(f) for f in _test_table_schema]
+    assert _odata_interface.get_table_fingerprint(_test_table_name, batch_size=7) == table_fingerprint
+    assert _odata_interface.get_table_fingerprint('artists') != table_fingerprint
+
+
+def test_dump_database_compressed():
+    with tempfile.TemporaryDirectory() as plain_folder, tempfile.TemporaryDirectory() as compressed_folder:
+        _odata_interface.dump_database(plain_folder, page_size=200)
+        _odata_interface.dump_database(compressed_folder, page_size=200, compression='gzip', compression_level=1)
+        plain_filenames = sorted(os.listdir(plain_folder))
+        compressed_filenames = sorted(os.listdir(compressed_folder))
+        assert compressed_filenames == sorted(plain_filenames + [f + '.gz' for f in plain_filenames])
+        for plain_filename in plain_filenames:
+            with open(os.path.join(plain_folder, plain_filename), 'rb') as plain_file:
+                plain_data = plain_file.read()
+            with open(os.path.join(compressed_folder, plain_filename), 'rb') as compressed_file:
+                assert compressed_file.read() == plain_data
+            with gzip.open(os.path.join(compressed_folder, plain_filename + '.gz')) as compressed_file:
+                assert compressed_file.read() == plain_data
+    with tempfile.TemporaryDirectory() as temp_folder:
+        _odata_interface.dump_database(temp_folder, tables_to_include=[_test_table_name], compression=['gzip'],
+                                       incremental=True, workers=2)
+        with open(os.path.join(temp_folder, _test_table_name + '.gz'), 'rb') as compressed_file:
+            compressed_data = compressed_file.read()
+        assert gzip.decompress(compressed_data) == _odata_interface.get_table_json(_test_table_name).encode()
+        _odata_interface.dump_database(temp_folder, tables_to_include=[_test_table_name], compression=['gzip'],
+                                       incremental=True)
+        with open(os.path.join(temp_folder, _test_table_name + '.gz'), 'rb') as compressed_file:
+            assert compressed_file.read() == compressed_data
+        assert not [f for f in os.listdir(temp_folder) if f.endswith('.tmp')]
+    with pytest.raises(ValueError) as error:
+        _odata_interface.dump_database(temp_folder, compression='lzma')
+    assert error.value.args[0] == 'Unknown compression format: lzma'
+
+
+def test_dump_database_compressed_zstd():
+    zstandard = pytest.importorskip('zstandard')
+    with tempfile.TemporaryDirectory() as temp_folder:
+        _odata_interface.dump_database(temp_folder, tables_to_include=[_test_table_name], compression=['gzip', 'zstd'])
+        with open(os.path.join(temp_folder, _test_table_name + '.zst'), 'rb') as compressed_file:
+            table_json = zstandard.ZstdDecompressor().stream_reader(compressed_file).read()
+        assert table_json == _odata_interface.get_table_json(_test_table_name).encode()
+
+
+def test_write_table_columnar():
+    pyarrow = pytest.importorskip('pyarrow')
+    import pyarrow.ipc
+    import pyarrow.parquet
+    arrow_schema = _odata_interface.get_table_arrow_schema('invoices')
+    assert [str(t) for t in arrow_schema.types] == _test_invoices_arrow_types
+    for columnar_format in ['parquet', 'arrow']:
+        with tempfile.TemporaryFile() as columnar_file:
+            _odata_interface.write_table_columnar('invoices', columnar_file, columnar_format, batch_size=100)
+            columnar_file.seek(0)
+            if columnar_format == 'parquet':
+                table = pyarrow.parquet.read_table(columnar_file)
+            else:
+                table = pyarrow.ipc.open_file(columnar_file).read_all()
+        assert table.schema == arrow_schema
+        rows = _odata_interface.get_table_rows('invoices')
+        assert table.num_rows == len(rows)
+        assert table.column('BillingCity').to_pylist() == [r['BillingCity'] for r in rows]
+        assert table.column('Total').to_pylist() == [r['Total'] for r in rows]
+        invoice_dates = [d.strftime('%Y-%m-%d %H:%M:%S') for d in table.column('InvoiceDate').to_pylist()]
+        assert invoice_dates == [r['InvoiceDate'] for r in rows]
+    with pytest.raises(ValueError) as error:
+        _odata_interface.write_table_columnar(_test_table_name, io.BytesIO(), 'orc')
+    assert error.value.args[0] == 'Unknown columnar format: orc'
+
+
+def test_write_table_columnar_mixed_types(caplog):
+    pyarrow = pytest.importorskip('pyarrow')
+    import pyarrow.parquet
+    with tempfile.TemporaryDirectory() as temp_folder:
+        sqlite_filename = os.path.join(temp_folder, 'test.db')
+        with sqlite3.connect(sqlite_filename) as connection:
+            # SQLite columns can hold values of any type, whatever their declared type
+            connection.execute('CREATE TABLE readings (Count INTEGER, Taken DATETIME, Note TEXT)')
+            connection.executemany('INSERT INTO readings VALUES (?, ?, ?)',
+                                   [(1, '2020-01-04 12:00:00', 'a'), ('', 'unknown', 2), ('3', None, None)])
+        connection.close()
+        odata_interface = sql_to_odata.ODataInterface(sqlite_filename=sqlite_filename)
+        parquet_filename = os.path.join(temp_folder, 'readings.parquet')
+        with open(parquet_filename, 'wb') as parquet_file:
+            odata_interface.write_table_columnar('readings', parquet_file)
+        odata_interface.close()
+        table = pyarrow.parquet.read_table(parquet_filename)
+        assert table.column('Count').to_pylist() == [1, None, 3]
+        taken_dates = [d and d.isoformat() for d in table.column('Taken').to_pylist()]
+        assert taken_dates == ['2020-01-04T12:00:00+00:00', None, None]
+        assert table.column('Note').to_pylist() == ['a', '2', None]
+    assert 'Wrote 1 values of column Count of table readings that are not of type int64 as nulls' in caplog.text
+
+
+def test_dump_database_columnar():
+    pytest.importorskip('pyarrow')
+    import pyarrow.parquet
+    with tempfile.TemporaryDirectory() as temp_folder:
+        _odata_interface.dump_database(temp_folder, tables_to_include=_test_table_subset_names, incremental=True,
+                                       columnar_format='parquet')
+        for table_name in _test_table_subset_names:
+            table = pyarrow.parquet.read_table(os.path.join(temp_folder, table_name + '.parquet'))
+            assert table.to_pylist() == _odata_interface.get_table_rows(table_name)
+            assert os.path.exists(os.path.join(temp_folder, table_name))
+        parquet_filename = os.path.join(temp_folder, _test_table_name + '.parquet')
+        modified_time = os.path.getmtime(parquet_filename)
+        time.sleep(0.01)
+        _odata_interface.dump_database(temp_folder, tables_to_include=_test_table_subset_names, incremental=True,
+                                       columnar_format='parquet')
+        assert os.path.getmtime(parquet_filename) == modified_time
+        os.remove(parquet_filename)
+        _odata_interface.dump_database(temp_folder, tables_to_include=_test_table_subset_names, incremental=True,
+                                       columnar_format='parquet')
+        assert os.path.exists(parquet_filename)
+
+
+def test_get_table_delta_json():
+    with tempfile.TemporaryDirectory() as temp_folder:
+        sqlite_filename = os.path.join(temp_folder, 'test.db')
+        state_filename = os.path.join(temp_folder, 'delta.db')
+        shutil.copyfile(_test_sqlite_filename, sqlite_filename)
+        odata_interface = sql_to_odata.ODataInterface(sqlite_filename=sqlite_filename)
+        table_json = ujson.loads(odata_interface.get_table_delta_json('artists', state_filename))
+        assert table_json['value'] == odata_interface.get_table_rows('artists')
+        delta_link = table_json['@odata.deltaLink']
+        delta_token = delta_link.split('$deltatoken=')[1]
+        # Nothing changed, so the response links back to the same token
+        delta_json = ujson.loads(odata_interface.get_table_delta_json('artists', state_filename, delta_token))
+        assert delta_json == {'@odata.context': '$metadata#artists/$delta', 'value': [],
+                              '@odata.deltaLink': delta_link}
+        with sqlite3.connect(sqlite_filename) as connection:
+            connection.execute('UPDATE artists SET Name = ? WHERE ArtistId = 1', ['Changed'])
+            connection.execute('DELETE FROM artists WHERE ArtistId = 2')
+            connection.execute('INSERT INTO artists (ArtistId, Name) VALUES (1000, ?)', ["O'Added"])
+        connection.close()
+        delta_json = ujson.loads(odata_interface.get_table_delta_json('artists', state_filename, delta_token))
+        assert delta_json['value'] == [{'ArtistId': 1, 'Name': 'Changed'}, {'ArtistId': 1000, 'Name': "O'Added"},
+                                       {'@removed': {'reason': 'deleted'}, '@id': 'artists(2)'}]
+        assert delta_json['@odata.deltaLink'] != delta_link
+        # Earlier tokens stay valid, and each response is relative to its own token
+        assert len(ujson.loads(odata_interface.get_table_delta_json('artists', state_filename, delta_token))['value']) == 3  # noqa: E501
+        next_token = delta_json['@odata.deltaLink'].split('$deltatoken=')[1]
+        assert ujson.loads(odata_interface.get_table_delta_json('artists', state_filename, next_token))['value'] == []
+        with pytest.raises(ValueError) as error:
+            odata_interface.get_table_delta_json('artists', state_filename, 'does-not-exist')
+        assert error.value.args[0] == 'Invalid delta token: does-not-exist'
+        with pytest.raises(ValueError) as error:
+            odata_interface.get_table_delta_json('albums', state_filename, delta_token)
+        assert error.value.args[0] == f'Invalid delta token: {delta_token}'
+        odata_interface.close()
+
+
+def test_get_table_delta_json_null_keys():
+    with tempfile.TemporaryDirectory() as temp_folder:
+        sqlite_filename = os.path.join(temp_folder, 'test.db')
+        state_filename = os.path.join(temp_folder, 'delta.db')
+        with sqlite3.connect(sqlite_filename) as connection:
+            # Primary keys of rowid tables may hold NULL values, even several of them
+            connection.execute('CREATE TABLE pairs (a INTEGER, b TEXT, Note TEXT, PRIMARY KEY (a, b))')
+            connection.executemany('INSERT INTO pairs VALUES (?, ?, ?)',
+                                   [(1, None, 'x'), (1, None, 'y'), (None, None, 'z'), (2, 'b', 'w')])
+        connection.close()
+        odata_interface = sql_to_odata.ODataInterface(sqlite_filename=sqlite_filename)
+        table_json = ujson.loads(odata_interface.get_table_delta_json('pairs', state_filename))
+        assert table_json['value'] == odata_interface.get_table_rows('pairs')
+        delta_token = table_json['@odata.deltaLink'].split('$deltatoken=')[1]
+        with sqlite3.connect(sqlite_filename) as connection:
+            connection.execute("UPDATE pairs SET Note = 'changed' WHERE Note = 'y'")
+            connection.execute("DELETE FROM pairs WHERE Note IN ('x', 'w')")
+        connection.close()
+        delta_json = ujson.loads(odata_interface.get_table_delta_json('pairs', state_filename, delta_token))
+        assert delta_json['value'] == [{'a': 1, 'b': None, 'Note': 'changed'},
+                                       {'@removed': {'reason': 'deleted'}, '@id': 'pairs(a=1,b=null)'},
+                                       {'@removed': {'reason': 'deleted'}, '@id': "pairs(a=2,b='b')"}]
+        with tempfile.TemporaryDirectory() as output_folder:
+            odata_interface.dump_database(output_folder, delta=True)
+        odata_interface.close()
+
+
+def test_dump_database_delta():
+    with tempfile.TemporaryDirectory() as temp_folder:
+        sqlite_filename = os.path.join(temp_folder, 'test.db')
+        output_folder = os.path.join(temp_folder, 'output')
+        shutil.copyfile(_test_sqlite_filename, sqlite_filename)
+        odata_interface = sql_to_odata.ODataInterface(sqlite_filename=sqlite_filename)
+        odata_interface.dump_database(output_folder, tables_to_include=['artists', 'playlist_track'], delta=True)
+        with open(os.path.join(output_folder, 'playlist_track')) as table_file:
+            playlist_delta_link = ujson.loads(table_file.read())['@odata.deltaLink']
+        with open(os.path.join(output_folder, 'artists')) as table_file:
+            delta_link = ujson.loads(table_file.read())['@odata.deltaLink']
+        with open(os.path.join(output_folder, delta_link)) as delta_file:
+            assert ujson.loads(delta_file.read()) == {'@odata.context': '$metadata#artists/$delta', 'value': [],
+                                                      '@odata.deltaLink': delta_link}
+        with sqlite3.connect(sqlite_filename) as connection:
+            connection.execute('DELETE FROM artists WHERE ArtistId = 2')
+            playlist_id, track_id = connection.execute('SELECT * FROM playlist_track LIMIT 1').fetchone()
+            connection.execute('DELETE FROM playlist_track WHERE PlaylistId = ? AND TrackId = ?',
+                               [playlist_id, track_id])
+        connection.close()
+        odata_interface.dump_database(output_folder, tables_to_include=['artists', 'playlist_track'], delta=True,
+                                      workers=2)
+        with open(os.path.join(output_folder, delta_link)) as delta_file:
+            delta_json = ujson.loads(delta_file.read())
+        assert delta_json['value'] == [{'@removed': {'reason': 'deleted'}, '@id': 'artists(2)'}]
+        with open(os.path.join(output_folder, 'artists')) as table_file:
+            assert ujson.loads(table_file.read())['@odata.deltaLink'] == delta_json['@odata.deltaLink']
+        assert os.path.exists(os.path.join(output_folder, delta_json['@odata.deltaLink']))
+        with open(os.path.join(output_folder, playlist_delta_link)) as delta_file:
+            delta_json = ujson.loads(delta_file.read())
+        assert delta_json['value'] == [{'@removed': {'reason': 'deleted'},
+                                        '@id': f'playlist_track(PlaylistId={playlist_id},TrackId={track_id})'}]
+        odata_interface.close()
+
+
+def test_dump_database_media():
+    with tempfile.TemporaryDirectory() as temp_folder:
+        sqlite_filename = os.path.join(temp_folder, 'test.db')
+        output_folder = os.path.join(temp_folder, 'output')
+        with sqlite3.connect(sqlite_filename) as connection:
+            connection.execute('CREATE TABLE files (FileId INTEGER PRIMARY KEY, Content BLOB, Name TEXT)')
+            connection.executemany("INSERT INTO files VALUES (?, ?, 'x')", _test_binary_rows)
+        connection.close()
+        odata_interface = sql_to_odata.ODataInterface(sqlite_filename=sqlite_filename)
+        # Binary values are base64url-encoded, rather than passed on as text
+        table_rows = ujson.loads(odata_interface.get_table_json('files'))['value']
+        assert [r['Content'] for r in table_rows] == [None if v is None else base64.urlsafe_b64encode(v).decode()
+                                                      for _, v in _test_binary_rows]
+        assert table_rows[0]['Content'] == '-_8A'
+        for page_size in [None, 1, 2]:
+            shutil.rmtree(output_folder, ignore_errors=True)
+            odata_interface.dump_database(output_folder, page_size=page_size, media_threshold=100)
+            table_rows = []
+            table_filename = 'files'
+            while table_filename is not None:
+                with open(os.path.join(output_folder, table_filename)) as table_file:
+                    table_page = ujson.loads(table_file.read())
+                table_rows += table_page['value']
+                table_filename = table_page.get('@odata.nextLink')
+            media_link = table_rows[1]['Content@odata.mediaReadLink']
+            assert list(table_rows[1]) == ['FileId', 'Content@odata.mediaReadLink', 'Name']
+            assert [r.get('Content') for r in table_rows] == ['-_8A', None, None, 'cGhvdG8=']
+            with open(os.path.join(output_folder, media_link), 'rb') as media_file:
+                assert media_file.read() == _test_binary_rows[1][1]
+        with pytest.raises(ValueError) as error:
+            odata_interface.dump_database(output_folder, media_threshold=-1)
+        assert error.value.args[0] == 'Invalid media threshold: -1'
+        odata_interface.close()
+
+
+def test_strict_types():
+    odata_interface = sql_to_odata.ODataInterface(sqlite_filename=_test_sqlite_filename, strict_types=True)
+    assert odata_interface.get_table_schema_xml(_test_table_name) == _test_table_schema_strict_xml
+    assert odata_interface.get_table_rows('invoices') == _odata_interface.get_table_rows('invoices')
+    invoice_dates = [r['InvoiceDate'] for r in ujson.loads(odata_interface.get_table_json('invoices'))['value']]
+    assert all(d[10] == 'T' and d.endswith('Z') for d in invoice_dates)
+    odata_interface.close()
+    with tempfile.TemporaryDirectory() as temp_folder:
+        sqlite_filename = os.path.join(temp_folder, 'test.db')
+        with sqlite3.connect(sqlite_filename) as connection:
+            connection.execute('''CREATE TABLE typed (Id INTEGER, Code TEXT NOT NULL DEFAULT 'a&b',
+                                  Active BOOLEAN DEFAULT 1, Price NUMERIC(10,2),
+                                  Updated DATETIME DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY (Code, Id))''')
+            connection.execute("INSERT INTO typed VALUES (1, 'x', 0, 0.99, '2009-01-01 10:00:00')")
+            connection.execute('INSERT INTO typed (Id, Price, Updated) VALUES (2, NULL, NULL)')
+        connection.close()
+        odata_interface = sql_to_odata.ODataInterface(sqlite_filename=sqlite_filename, strict_types=True)
+        assert odata_interface.get_table_schema_xml('typed') == _test_typed_schema_xml
+        assert odata_interface.get_table_json('typed') == _test_typed_json
+        assert odata_interface.query_table_json('typed', {'$select': 'Active', '$top': 1}) == '{"@odata.context":"$metadata#typed(Active)","value":[{"Active":false}]}'  # noqa: E501
+        odata_interface.close()
+
+
+def test_dump_database_snapshot(monkeypatch):
+    with tempfile.TemporaryDirectory() as temp_folder:
+        # Snapshots are copied to the temporary folder rather than the output folder
+        snapshot_folder = os.path.join(temp_folder, 'snapshots')
+        os.mkdir(snapshot_folder)
+        monkeypatch.setattr(tempfile, 'tempdir', snapshot_folder)
+        expected_folder = os.path.join(temp_folder, 'expected')
+        _odata_interface.dump_database(expected_folder)
+        for workers, snapshot in [(None, False), (None, True), (2, True)]:
+            sqlite_filename = os.path.join(temp_folder, f'test-{workers}-{snapshot}.db')
+            shutil.copyfile(_test_sqlite_filename, sqlite_filename)
+            connection = sqlite3.connect(sqlite_filename, isolation_level=None)
+            connection.execute('PRAGMA journal_mode = WAL;')
+
+            def write_during_dump(table_name, tables_written, table_count):
+                # Every table changes once the first one has been written
+                if tables_written == 1:
+                    assert len(os.listdir(snapshot_folder)) == int(snapshot)
+                    for table_name in _test_table_names:
+                        connection.execute(f'DELETE FROM {table_name}')  # nosec - constant table names
+            output_folder = os.path.join(temp_folder, f'output-{workers}-{snapshot}')
+            odata_interface = sql_to_odata.ODataInterface(sqlite_filename=sqlite_filename)
+            odata_interface.dump_database(output_folder, workers=workers, progress=write_during_dump,
+                                          snapshot=snapshot)
+            odata_interface.close()
+            connection.close()
+            assert sorted(os.listdir(output_folder)) == sorted(os.listdir(expected_folder))
+            changed_filenames = []
+            for output_filename in os.listdir(expected_folder):
+                with open(os.path.join(expected_folder, output_filename), 'rb') as expected_file:
+                    with open(os.path.join(output_folder, output_filename), 'rb') as output_file:
+                        if expected_file.read() != output_file.read():
+                            changed_filenames.append(output_filename)
+            assert bool(changed_filenames) != snapshot
+            assert os.listdir(snapshot_folder) == []
+
+
+def test_dump_database_aggregations():
+    with tempfile.TemporaryDirectory() as temp_folder:
+        _odata_interface.dump_database(temp_folder, tables_to_include=['tracks'], incremental=True,
+                                       aggregations=_test_aggregations)
+        assert sorted(os.listdir(temp_folder)) == ['$metadata', '$service', '.manifest.json', 'track_totals',
+                                                   'tracks', 'tracks_by_album']
+        with open(os.path.join(temp_folder, '$service')) as service_file:
+            assert [s['url'] for s in ujson.load(service_file)['value']] == ['tracks', *_test_aggregations]
+        with open(os.path.join(temp_folder, '$metadata')) as schema_file:
+            assert _test_aggregations_schema_xml in schema_file.read()
+        for aggregation_name, (table_name, expression) in _test_aggregations.items():
+            with open(os.path.join(temp_folder, aggregation_name)) as aggregation_file:
+                aggregation_page = ujson.load(aggregation_file)
+            assert aggregation_page['@odata.context'] == f'$metadata#{aggregation_name}'
+            assert aggregation_page['value'] == _odata_interface.query_table_rows(table_name, {'$apply': expression})
+        # Aggregations of unchanged tables are not computed again
+        aggregation_filename = os.path.join(temp_folder, 'tracks_by_album')
+        os.utime(aggregation_filename, (0, 0))
+        _odata_interface.dump_database(temp_folder, tables_to_include=['tracks'], incremental=True,
+                                       aggregations=_test_aggregations)
+        assert os.path.getmtime(aggregation_filename) == 0
+    for aggregations, expected_message in [({'tracks': ('tracks', 'aggregate($count as Count)')},
+                                            'Invalid aggregation name: tracks'),
+                                           ({'counts': ('tracks', 'groupby(AlbumId)')},
+                                            'Invalid groupby transformation: groupby(AlbumId)')]:
+        with pytest.raises(ValueError) as error:
+            _odata_interface.dump_database('does-not-exist', aggregations=aggregations)
+        assert error.value.args[0] == expected_message
+    assert not os.path.exists('does-not-exist')
+
+
+def test_get_table_size_estimate():
+    assert _odata_interface.get_table_size_estimate(_test_table_name) == _test_table_row_count
+    with pytest.raises(ValueError) as error:
+        _odata_interface.get_table_size_estimate('does-not-exist')
+    assert error.value.args[0] == 'Table not found: does-not-exist'
+
+
+def test_schema_cache():
+    with tempfile.TemporaryDirectory() as temp_folder:
+        sqlite_filename = os.path.join(temp_folder, 'test.db')
+        shutil.copyfile(_test_sqlite_filename, sqlite_filename)
+        odata_interface = sql_to_odata.ODataInterface(sqlite_filename=sqlite_filename)
+        assert odata_interface.get_table_names() == _test_table_names
+        assert odata_interface.get_table_schema(_test_table_name) == _test_table_schema
+        odata_interface.get_table_names().append('does-not-exist')
+        assert odata_interface.get_table_names() == _test_table_names
+        with sqlite3.connect(sqlite_filename) as connection:
+            connection.execute('ALTER TABLE albums ADD COLUMN Rating REAL')
+            connection.execute('CREATE TABLE zebras (ZebraId INTEGER PRIMARY KEY)')
+        connection.close()
+        assert odata_interface.get_table_names() == _test_table_names + ['zebras']
+        assert odata_interface.get_table_schema(_test_table_name) == _test_table_schema + [('Rating', 'Edm.Double', False, None, False)]  # noqa: E501
+        assert 'Rating' in odata_interface.get_table_rows(_test_table_name)[0]
+        odata_interface.clear_schema_cache()
+        assert odata_interface.get_table_names() == _test_table_names + ['zebras']
+
+
 def test_datatype_mappings():
     datatype_to_odata = sql_to_odata.ODataInterface.datatype_to_odata
     assert datatype_to_odata('INTEGER') == 'Edm.Int64'
@@ -325,3 +1084,12 @@ def test_invalid_table_name():
     with pytest.raises(ValueError) as error:
         _odata_interface.get_table_rows('does-not-exist')
     assert error.value.args[0] == 'Table not found: does-not-exist'
+    # Streamed output is checked before its first chunk is generated
+    with pytest.raises(ValueError) as error:
+        _odata_interface.iter_table_json('does-not-exist')
+    assert error.value.args[0] == 'Table not found: does-not-exist'
+    with tempfile.TemporaryDirectory() as temp_folder:
+        with pytest.raises(ValueError) as error:
+            _odata_interface.dump_database(temp_folder, tables_to_include=[_test_table_name, 'does-not-exist'])
+        assert error.value.args[0] == 'Table not found: does-not-exist'
+        assert os.listdir(temp_folder) == []